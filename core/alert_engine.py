@@ -2,31 +2,99 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import asyncio
+import time
+from contextlib import nullcontext
+from dashboard.core_lib.intel_cache import EnrichmentCache
+from dashboard.core_lib.ioc_feeds import IOCFeeds
 from dashboard.core_lib.threat_intel import ThreatIntel
+from core.enrichment import EnrichmentWorker
+from core.sketches import ScanDetector
 
 class AlertEngine:
-    def __init__(self, abuseipdb_key, otx_key, misp_url, misp_key):
-        self.threat_intel = ThreatIntel(abuseipdb_key, otx_key, misp_url, misp_key)
+    def __init__(self, abuseipdb_key, otx_key, misp_url, misp_key, alert_sink=None, db_path="ids_data.db",
+                 max_pending=10000, max_concurrent_lookups=16, scan_window=60, port_scan_threshold=100,
+                 host_sweep_threshold=100, intel_cache_size=100000, feeds_dir="../rules/feeds",
+                 feeds_refresh_interval=30, suppress_window=60):
+        # One pooled session on the enrichment loop; a connection per lookup slot to each provider.
+        # Provider answers are cached in memory and in the `intel_cache` table (shared with the dashboard),
+        # so hosts seen again are not looked up again until their TTL runs out.
+        self.intel_cache = EnrichmentCache(db_path, max_entries=intel_cache_size)
+        # Offline IOC feeds answer before any provider is asked; reloaded when the directory changes.
+        self.feeds = IOCFeeds(feeds_dir, refresh_interval=feeds_refresh_interval)
+        self.threat_intel = ThreatIntel(abuseipdb_key, otx_key, misp_url, misp_key,
+                                        limit_per_host=max_concurrent_lookups, cache=self.intel_cache,
+                                        feeds=self.feeds)
+        self.alerts_raised = 0
+        # Distinct destination ports/hosts per source in fixed memory; updated on the capture thread.
+        self.scan_detector = ScanDetector(window=scan_window, port_threshold=port_scan_threshold,
+                                          host_threshold=host_sweep_threshold)
+        # Runs enrich_and_alert on its own event loop thread; started by the first submit().
+        # Repeats of a (type, src, dst) alert within `suppress_window` seconds are not stored again.
+        self.worker = EnrichmentWorker(self, alert_sink=alert_sink, db_path=db_path, max_pending=max_pending,
+                                       max_concurrent_lookups=max_concurrent_lookups, suppress_window=suppress_window)
+
+    def submit(self, flow_key, flow_data):
+        """Queue a flow for enrichment without blocking the caller; False if it was dropped."""
+        scan = self.scan_detector.observe(flow_key, flow_data.get("timestamp") or time.time(),
+                                          flow_data.get("packet_size") or flow_data.get("batch_bytes", 0),
+                                          flow_data.get("tcp_flags"))
+        if scan:
+            # Scans are reported straight away instead of queueing behind threat-intel lookups.
+            self.alerts_raised += 1
+            self.worker.publish(self.check_basic_alerts(flow_key, dict(flow_data, scan=scan)), flow_data)
+        if self.threat_intel.local_only:
+            # The feeds cover every reputation provider: decide here, without the enrichment queue.
+            alert = self.intel_alert(None, flow_key, self.threat_intel.local_verdict(flow_key[0]),
+                                     self.threat_intel.local_verdict(flow_key[1]))
+            if alert:
+                self.alerts_raised += 1
+                self.worker.publish(alert, flow_data)
+            return True
+        return self.worker.submit(flow_key, flow_data)
+
+    def close(self, timeout=5.0):
+        self.worker.close(timeout)
+        self.feeds.close()
+        self.intel_cache.close()
 
     def check_basic_alerts(self, flow_key, flow_data):
-        if flow_data.get("packet_count", 0) > 100:
+        # flow_key is the 5-tuple (src_ip, dst_ip, src_port, dst_port, proto number);
+        # `scan` is the scan detector's (type, description) verdict for the flow, if any.
+        scan = flow_data.get("scan")
+        if scan:
+            alert_type, description = scan
             return {
-                "type": "PORT_SCAN",
-                "description": f"High packet count from {flow_key[0]}",
+                "type": alert_type,
+                "description": description,
                 "src_ip": flow_key[0],
                 "dst_ip": flow_key[1],
+                "src_port": flow_key[2],
+                "dst_port": flow_key[3],
+                "proto": flow_key[4],
             }
         return None
 
-    async def enrich_and_alert(self, flow_key, flow_data):
+    async def _enrich_ip(self, ip, lookup_limit):
+        async with lookup_limit or nullcontext():
+            return await self.threat_intel.enrich_ip(ip)
+
+    async def enrich_and_alert(self, flow_key, flow_data, lookup_limit=None):
         # Check for basic alert first
         alert = self.check_basic_alerts(flow_key, flow_data)
 
-        # Perform threat enrichment for both source and destination IPs
-        src_task = self.threat_intel.enrich_ip(flow_key[0])
-        dst_task = self.threat_intel.enrich_ip(flow_key[1])
+        # Perform threat enrichment for both source and destination IPs;
+        # `lookup_limit` (a semaphore) caps concurrent ThreatIntel lookups.
+        src_task = self._enrich_ip(flow_key[0], lookup_limit)
+        dst_task = self._enrich_ip(flow_key[1], lookup_limit)
         src_info, dst_info = await asyncio.gather(src_task, dst_task)
 
+        alert = self.intel_alert(alert, flow_key, src_info, dst_info)
+        if alert:
+            self.alerts_raised += 1
+        return alert
+
+    def intel_alert(self, alert, flow_key, src_info, dst_info):
+        """`alert` (or a new THREAT_INTEL_MATCH) carrying the tags and score of both IPs, if they have any."""
         # Extract tags and scoring
         tags = src_info.get("tags", []) + dst_info.get("tags", [])
         score = src_info.get("score", 0) + dst_info.get("score", 0)
@@ -39,8 +107,10 @@ class AlertEngine:
                     "description": f"Threat intelligence match for flow {flow_key[0]} -> {flow_key[1]}",
                     "src_ip": flow_key[0],
                     "dst_ip": flow_key[1],
+                    "src_port": flow_key[2],
+                    "dst_port": flow_key[3],
+                    "proto": flow_key[4],
                 }
             alert["tags"] = tags
             alert["score"] = score
-
         return alert
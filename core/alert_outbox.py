@@ -0,0 +1,197 @@
+# alert_outbox.py: persistent outbox for alert notifications (Slack, email, HTTP API).
+# Detection code only inserts rows into the `alert_outbox` table, in the same transaction as the
+# alert itself; a background dispatcher drains the table per channel, sends one digest per batch
+# over a pooled HTTP session / SMTP connection and retries failures with exponential backoff.
+import json
+import logging
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from email.mime.text import MIMEText
+import requests
+import core.alerting as config
+
+CHANNELS = ("slack", "email", "api")
+
+def prepare_outbox(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS alert_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT,
+        subject TEXT,
+        body TEXT,
+        payload TEXT,
+        created REAL,
+        attempts INTEGER DEFAULT 0,
+        next_attempt REAL DEFAULT 0,
+        last_error TEXT,
+        status TEXT DEFAULT 'pending'
+    )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_alert_outbox_pending ON alert_outbox (status, channel, next_attempt)')
+
+def enqueue(conn, channel, body, subject=None, payload=None):
+    """Queue one notification; the caller commits (together with the alert row)."""
+    conn.execute('INSERT INTO alert_outbox (channel, subject, body, payload, created) VALUES (?, ?, ?, ?, ?)',
+                 (channel, subject, body, json.dumps(payload, default=str) if payload is not None else None,
+                  time.time()))
+
+def enqueue_notifications(conn, subject, message, payload=None, slack_text=None):
+    """Queue `message` for every configured channel."""
+    enqueue(conn, "slack", slack_text or message)
+    enqueue(conn, "email", message, subject=subject)
+    if config.ENABLE_API_ALERTING:
+        enqueue(conn, "api", message, payload=payload)
+
+class SlackChannel:
+    def __init__(self):
+        self.session = requests.Session()
+
+    def send(self, items):
+        text = items[0]["body"] if len(items) == 1 else (
+            f"🚨 {len(items)} IDS alerts\n" + "\n".join(item["body"] for item in items))
+        r = self.session.post(config.SLACK_WEBHOOK_URL, json={"text": text}, timeout=10)
+        r.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+class EmailChannel:
+    """Keeps one authenticated SMTP connection open and reconnects when the server drops it."""
+
+    def __init__(self):
+        self.server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(config.SMTP_SERVER, config.SMTP_PORT, timeout=30)
+        server.ehlo()
+        server.starttls()
+        server.ehlo()
+        server.login(config.EMAIL_USERNAME, config.EMAIL_PASSWORD)
+        self.server = server
+
+    def send(self, items):
+        if len(items) == 1:
+            subject, body = items[0]["subject"] or "IDS ALERT", items[0]["body"]
+        else:
+            subject = f"IDS digest: {len(items)} alerts"
+            body = "\n\n---\n\n".join(f"{item['subject'] or 'Alert'}\n{item['body']}" for item in items)
+        msg = MIMEText(body)
+        msg['Subject'] = subject
+        msg['From'] = config.EMAIL_FROM
+        msg['To'] = ", ".join(config.EMAIL_TO)
+        for attempt in range(2):
+            if self.server is None:
+                self._connect()
+            try:
+                self.server.sendmail(config.EMAIL_FROM, config.EMAIL_TO, msg.as_string())
+                return
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self.server = None  # stale connection; reconnect once
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+class ApiChannel:
+    def __init__(self):
+        self.session = requests.Session()
+
+    def send(self, items):
+        payloads = [json.loads(item["payload"]) if item["payload"] else {"message": item["body"]} for item in items]
+        r = self.session.post(config.API_ALERT_ENDPOINT,
+                              json=payloads[0] if len(payloads) == 1 else {"alerts": payloads}, timeout=10)
+        r.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+class OutboxDispatcher:
+    """Background thread that delivers queued notifications in per-channel digests."""
+
+    def __init__(self, db_path="ids_data.db", interval=5.0, batch_size=50, max_attempts=8,
+                 base_delay=2.0, max_delay=600.0):
+        self.db_path = db_path
+        self.interval = interval          # seconds between drains; also the digest window
+        self.batch_size = batch_size      # most notifications folded into one digest
+        self.max_attempts = max_attempts  # after this many failures a row is marked failed and left alone
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.channels = {"slack": SlackChannel(), "email": EmailChannel(), "api": ApiChannel()}
+        self.stats = {"sent": 0, "digests": 0, "failures": 0, "failed": 0}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="alert-outbox", daemon=True)
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            prepare_outbox(conn)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        while not self.stop_event.wait(self.interval):
+            self.drain(conn)
+        self.drain(conn)
+        conn.close()
+        for channel in self.channels.values():
+            channel.close()
+
+    def drain(self, conn):
+        """Send every due notification once, one digest per channel and batch."""
+        for name, channel in self.channels.items():
+            while True:
+                rows = conn.execute('''SELECT id, subject, body, payload, attempts FROM alert_outbox
+                                       WHERE status='pending' AND channel=? AND next_attempt <= ?
+                                       ORDER BY id LIMIT ?''', (name, time.time(), self.batch_size)).fetchall()
+                if not rows:
+                    break
+                ids = [(row["id"],) for row in rows]
+                try:
+                    channel.send(rows)
+                except Exception as e:
+                    self._backoff(conn, rows, e)
+                    break  # the channel is unhealthy; leave the rest for the next drain
+                conn.executemany('DELETE FROM alert_outbox WHERE id=?', ids)
+                conn.commit()
+                self.stats["sent"] += len(rows)
+                self.stats["digests"] += 1
+                if len(rows) < self.batch_size:
+                    break
+
+    def _backoff(self, conn, rows, error):
+        self.stats["failures"] += 1
+        now = time.time()
+        updates, failed = [], 0
+        for row in rows:
+            attempts = row["attempts"] + 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            status = "failed" if attempts >= self.max_attempts else "pending"
+            failed += status == "failed"
+            updates.append((attempts, now + delay, str(error)[:500], status, row["id"]))
+        conn.executemany('UPDATE alert_outbox SET attempts=?, next_attempt=?, last_error=?, status=? WHERE id=?',
+                         updates)
+        conn.commit()
+        self.stats["failed"] += failed
+        logging.warning(f"⚠️ Alert delivery failed ({error}); retrying {len(rows) - failed} notifications later.")
+
+    def queue_depth(self):
+        """Pending notifications per channel."""
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            depth = dict(conn.execute("SELECT channel, COUNT(*) FROM alert_outbox WHERE status='pending' "
+                                      "GROUP BY channel").fetchall())
+        return {name: depth.get(name, 0) for name in CHANNELS}
+
+    def get_stats(self):
+        return dict(self.stats, queue_depth=self.queue_depth())
+
+    def close(self, timeout=10):
+        self.stop_event.set()
+        self.thread.join(timeout)
@@ -0,0 +1,59 @@
+# alert_suppression.py: hold-down windows that collapse repeated alerts into summaries.
+# The first firing of a key is passed through; further firings within `hold_down` seconds are
+# only counted, and when the window ends one summary covering all of them is returned.
+
+class AlertSuppressor:
+    def __init__(self, hold_down=60, sweep_interval=1.0):
+        self.hold_down = hold_down            # seconds; 0 disables suppression
+        self.sweep_interval = sweep_interval  # how often expired windows are looked for
+        self.windows = {}  # key -> [window start, hold-down, firings, latest context, latest firing time]
+        self.last_sweep = 0.0
+        self.pending = []  # summaries of windows closed by a new firing of the same key
+        self.suppressed = 0
+
+    def suppress(self, key, timestamp, context, hold_down=None):
+        """
+        Record one firing of `key`. Returns False if it should be emitted (first in its window)
+        and True if it was folded into the window's summary. `context` (e.g. the rule and flow)
+        is kept so the summary can describe the latest firing.
+        """
+        hold_down = self.hold_down if hold_down is None else hold_down
+        if hold_down <= 0:
+            return False
+        window = self.windows.get(key)
+        if window is not None and timestamp - window[0] >= window[1]:
+            summary = self._close(key)
+            if summary:
+                self.pending.append(summary)
+            window = None
+        if window is None:
+            self.windows[key] = [timestamp, hold_down, 1, context, timestamp]
+            return False
+        window[2] += 1
+        window[3] = context
+        window[4] = timestamp
+        self.suppressed += 1
+        return True
+
+    def expire(self, now):
+        """Close windows whose hold-down has passed; returns (key, firings, span in seconds, context) summaries."""
+        summaries, self.pending = self.pending, []
+        if now - self.last_sweep >= self.sweep_interval:
+            self.last_sweep = now
+            expired = [key for key, window in self.windows.items() if now - window[0] >= window[1]]
+            summaries.extend(summary for summary in map(self._close, expired) if summary)
+        return summaries
+
+    def expire_all(self):
+        summaries, self.pending = self.pending, []
+        summaries.extend(summary for summary in map(self._close, list(self.windows)) if summary)
+        return summaries
+
+    def _close(self, key):
+        start, hold_down, firings, context, last = self.windows.pop(key)
+        if firings <= 1:
+            return None  # the single firing was already emitted as a normal alert
+        return key, firings, last - start, context
+
+    def __len__(self):
+        return len(self.windows)
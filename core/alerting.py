@@ -3,7 +3,10 @@ import requests #  Used for HTTP POST (to Slack and API endpoint).
 import smtplib # Sends email using an SMTP server.
 from email.mime.text import MIMEText # Formats the email message body.
 import json #Formats payloads for Slack/API as JSON.
+import sqlite3 # Outbox table that queues notifications for the background dispatcher.
+import threading
 import time
+import core.alert_outbox as outbox # imported as a module: alert_outbox reads this one's settings
 
 ENABLE_API_ALERTING = False
 # Customize
@@ -52,8 +55,23 @@ def send_api_alert(data):
     except Exception as e:
         print(f"API alert error: {e}")
 
+# One outbox connection per database, opened on first use and shared by every alert() call.
+_outbox_conns = {}
+_outbox_lock = threading.Lock()
+
+def _outbox_conn(db_path):
+    conn = _outbox_conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        outbox.prepare_outbox(conn)
+        conn.commit()
+        _outbox_conns[db_path] = conn
+    return conn
+
 # 🚨 Main Alert Dispatcher
-def alert(flow):
+# Queues the notifications in the outbox; core.alert_outbox.OutboxDispatcher delivers them.
+# With `conn`, they join the caller's transaction and the caller commits.
+def alert(flow, db_path="ids_data.db", conn=None):
     # Build message
     message = (
     f"🚨 Suspicious Flow Detected 🚨\n"
@@ -64,7 +82,14 @@ def alert(flow):
     f"Total Size: {flow['total_size']} bytes\n"
     f"Timestamp: {time.ctime(flow['timestamp'])}"
     )    
-   # Slack & Email -- Enable later on ----------------------------------------------   
-    send_slack_alert(message)
-    send_email_alert("IDS ALERT: Suspicious Flow", message)
-    send_api_alert(flow)
+    if conn is not None:
+        outbox.enqueue_notifications(conn, "IDS ALERT: Suspicious Flow", message, payload=flow)
+        return
+    with _outbox_lock:
+        shared = _outbox_conn(db_path)
+        try:
+            outbox.enqueue_notifications(shared, "IDS ALERT: Suspicious Flow", message, payload=flow)
+            shared.commit()
+        except sqlite3.Error:
+            shared.rollback()
+            raise
@@ -0,0 +1,211 @@
+# batch_decoder.py: decode a whole batch of raw frames at once with NumPy.
+# Frames are copied (or received) into one contiguous (N x snaplen) buffer and every
+# header field is extracted for all rows with vectorized gathers; nothing is done per packet
+# in Python except the copy into the buffer.
+import socket
+import numpy as np
+from core.header_parser import (LINKTYPE_ETHERNET, LINKTYPE_LINUX_SLL, LINKTYPE_RAW,
+                                ETH_P_IP, ETH_P_IPV6, VLAN_ETHERTYPES, IPV6_EXT_HEADERS, IPV6_FRAGMENT)
+from core.protocols import IPPROTO_TCP, IPPROTO_UDP, make_flow_key, protocol_name
+
+SNAPLEN = 128  # enough for Ethernet + VLAN + IPv6 + one extension header + TCP flags
+
+# Packed 5-tuple used to group packets of a batch into flows
+FLOW_KEY_DTYPE = np.dtype([("src_addr", "V16"), ("dst_addr", "V16"),
+                           ("src_port", "u2"), ("dst_port", "u2"), ("proto", "u1")])
+_IPV4_MAPPED_PREFIX = bytes(10) + b"\xff\xff"
+
+def _link_dtype(snaplen):
+    """Structured view over one buffer row: the Ethernet header plus a possible 802.1Q tag."""
+    return np.dtype({"names": ["ethertype", "vlan_ethertype"],
+                     "formats": [">u2", ">u2"],
+                     "offsets": [12, 16],
+                     "itemsize": snaplen})
+
+class FrameBatch:
+    """Preallocated, contiguous buffer of up to `capacity` frames truncated to `snaplen` bytes."""
+
+    def __init__(self, capacity=1024, snaplen=SNAPLEN, linktype=LINKTYPE_ETHERNET):
+        self.capacity = capacity
+        self.snaplen = snaplen
+        self.linktype = linktype
+        self.data = np.zeros((capacity, snaplen), dtype=np.uint8)
+        self.view = memoryview(self.data).cast("B")
+        self.lengths = np.zeros(capacity, dtype=np.int64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def slot(self):
+        """Writable view of the next free row, e.g. for socket.recv_into."""
+        start = self.count * self.snaplen
+        return self.view[start:start + self.snaplen]
+
+    def commit(self, length, timestamp):
+        """Record the row filled through `slot()`; `length` is the original frame length."""
+        self.lengths[self.count] = length
+        self.timestamps[self.count] = timestamp
+        self.count += 1
+
+    def append(self, frame, timestamp):
+        n = min(len(frame), self.snaplen)
+        start = self.count * self.snaplen
+        self.view[start:start + n] = frame[:n]
+        self.commit(len(frame), timestamp)
+
+    def reset(self):
+        # Rows are zeroed so bytes of a longer previous frame never leak into a shorter one.
+        self.data[:self.count].fill(0)
+        self.count = 0
+
+def decode_batch(batch):
+    """
+    Decode every frame in `batch` and return a dict of column arrays for the IP packets:
+    timestamp, length, proto, src_port, dst_port, tcp_flags, src_addr, dst_addr
+    (16-byte addresses, IPv4 stored IPv4-mapped) and the packed `key` column.
+    """
+    n = batch.count
+    data = batch.data[:n]
+    snap = batch.snaplen
+    rows = np.arange(n)
+    caplen = np.minimum(batch.lengths[:n], snap)
+
+    def u8(off):
+        return data[rows, np.minimum(off, snap - 1)].astype(np.uint32)
+
+    def u16(off):
+        return (u8(off) << 8) | u8(off + 1)
+
+    def gather(off, width):
+        cols = np.minimum(off[:, None] + np.arange(width), snap - 1)
+        return data[rows[:, None], cols]
+
+    if batch.linktype == LINKTYPE_ETHERNET:
+        link = data.view(_link_dtype(snap))[:, 0]
+        ethertype = link["ethertype"].astype(np.uint32)
+        tagged = np.isin(ethertype, VLAN_ETHERTYPES)
+        ethertype = np.where(tagged, link["vlan_ethertype"], ethertype)
+        l3 = np.where(tagged, 18, 14)
+    elif batch.linktype == LINKTYPE_LINUX_SLL:
+        l3 = np.full(n, 16)
+        ethertype = u16(np.full(n, 14))
+    elif batch.linktype == LINKTYPE_RAW:
+        l3 = np.zeros(n, dtype=np.int64)
+        version = data[:, 0] >> 4
+        ethertype = np.where(version == 4, ETH_P_IP, np.where(version == 6, ETH_P_IPV6, 0))
+    else:
+        raise ValueError(f"Unsupported link type {batch.linktype}")
+
+    is4 = (ethertype == ETH_P_IP) & (caplen >= l3 + 20)
+    is6 = (ethertype == ETH_P_IPV6) & (caplen >= l3 + 40)
+
+    # IPv4: variable header length, only first fragments carry ports
+    l4 = np.where(is4, l3 + (u8(l3) & 0x0F) * 4, l3 + 40)
+    proto = np.where(is4, u8(l3 + 9), u8(l3 + 6))
+    first_fragment = np.where(is4, (u16(l3 + 6) & 0x1FFF) == 0, True)
+
+    # IPv6: skip up to two extension headers, then an optional fragment header
+    for _ in range(2):
+        ext = is6 & np.isin(proto, IPV6_EXT_HEADERS)
+        l4, proto = np.where(ext, l4 + (u8(l4 + 1) + 1) * 8, l4), np.where(ext, u8(l4), proto)
+    frag6 = is6 & (proto == IPV6_FRAGMENT)
+    first_fragment &= ~frag6 | ((u16(l4 + 2) & 0xFFF8) == 0)
+    proto, l4 = np.where(frag6, u8(l4), proto), np.where(frag6, l4 + 8, l4)
+
+    has_ports = first_fragment & ((proto == IPPROTO_TCP) | (proto == IPPROTO_UDP)) & (caplen >= l4 + 4)
+    has_flags = has_ports & (proto == IPPROTO_TCP) & (caplen >= l4 + 14)
+
+    src_addr = np.zeros((n, 16), dtype=np.uint8)
+    dst_addr = np.zeros((n, 16), dtype=np.uint8)
+    src_addr[is6] = gather(l3 + 8, 16)[is6]
+    dst_addr[is6] = gather(l3 + 24, 16)[is6]
+    src_addr[is4, 10:12] = dst_addr[is4, 10:12] = 0xFF
+    src_addr[is4, 12:] = gather(l3 + 12, 4)[is4]
+    dst_addr[is4, 12:] = gather(l3 + 16, 4)[is4]
+
+    valid = is4 | is6
+    key = np.zeros(int(valid.sum()), dtype=FLOW_KEY_DTYPE)
+    key["src_addr"] = src_addr[valid].view("V16")[:, 0]
+    key["dst_addr"] = dst_addr[valid].view("V16")[:, 0]
+    key["src_port"] = np.where(has_ports, u16(l4), 0)[valid]
+    key["dst_port"] = np.where(has_ports, u16(l4 + 2), 0)[valid]
+    key["proto"] = proto[valid]
+    return {
+        "key": key,
+        "src_addr": key["src_addr"],
+        "dst_addr": key["dst_addr"],
+        "src_port": key["src_port"],
+        "dst_port": key["dst_port"],
+        "proto": key["proto"],
+        "tcp_flags": np.where(has_flags, u8(l4 + 13), 0).astype(np.uint8)[valid],
+        "length": batch.lengths[:n][valid].copy(),
+        "timestamp": batch.timestamps[:n][valid].copy(),
+    }
+
+def addr_to_str(addr, _cache={}):
+    """Format a 16-byte address column value; IPv4-mapped addresses print as dotted quads."""
+    raw = bytes(addr)
+    text = _cache.get(raw)
+    if text is None:
+        if raw.startswith(_IPV4_MAPPED_PREFIX):
+            text = socket.inet_ntoa(raw[12:])
+        else:
+            text = socket.inet_ntop(socket.AF_INET6, raw)
+        if len(_cache) < 65536:
+            _cache[raw] = text
+    return text
+
+def aggregate_flows(columns):
+    """
+    Group the packets of a decoded batch by 5-tuple. Returns a dict of per-flow columns
+    (packet_count, total_size, tcp_flags, first_seen, last_seen) plus `flow_keys`, the
+    matching list of (src_ip, dst_ip, src_port, dst_port, proto) tuples.
+    """
+    if not len(columns["key"]):
+        return {"flow_keys": [], "packet_count": np.zeros(0, np.int64), "total_size": np.zeros(0, np.int64),
+                "tcp_flags": np.zeros(0, np.uint8), "first_seen": np.zeros(0), "last_seen": np.zeros(0)}
+    keys, inverse = np.unique(columns["key"], return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind="stable")
+    starts = np.searchsorted(inverse[order], np.arange(len(keys)))
+    timestamps = columns["timestamp"][order]
+    flow_keys = [
+        make_flow_key(addr_to_str(k["src_addr"]), addr_to_str(k["dst_addr"]),
+                      int(k["src_port"]), int(k["dst_port"]), int(k["proto"]))
+        for k in keys
+    ]
+    return {
+        "flow_keys": flow_keys,
+        "packet_count": np.bincount(inverse, minlength=len(keys)),
+        "total_size": np.bincount(inverse, weights=columns["length"], minlength=len(keys)).astype(np.int64),
+        "tcp_flags": np.bitwise_or.reduceat(columns["tcp_flags"][order], starts),
+        "first_seen": np.minimum.reduceat(timestamps, starts),
+        "last_seen": np.maximum.reduceat(timestamps, starts),
+    }
+
+def flow_dicts(flows):
+    """Expand aggregated flow columns into the per-flow dicts the rest of the pipeline uses."""
+    result = []
+    for i, key in enumerate(flows["flow_keys"]):
+        src_ip, dst_ip, src_port, dst_port, proto = key
+        result.append({
+            'flow_key': key,
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'proto': proto,
+            'protocol': protocol_name(proto),
+            'tcp_flags': int(flows["tcp_flags"][i]),
+            'timestamp': float(flows["last_seen"][i]),
+            'first_seen': float(flows["first_seen"][i]),
+            'batch_packets': int(flows["packet_count"][i]),
+            'batch_bytes': int(flows["total_size"][i]),
+        })
+    return result
@@ -0,0 +1,123 @@
+# content_matcher.py: scan a payload once for every `content` pattern of every rule.
+# Patterns are compiled into one Aho-Corasick automaton. pyahocorasick (C) is used when it is
+# installed; otherwise a pure-Python automaton with the same interface is built.
+try:
+    import ahocorasick
+except ImportError:  # optional accelerator
+    ahocorasick = None
+
+def encode_pattern(pattern):
+    """Rule patterns are text (UTF-8) or raw bytes."""
+    return pattern if isinstance(pattern, bytes) else str(pattern).encode("utf-8")
+
+class _PythonAutomaton:
+    """Aho-Corasick over bytes: goto dicts, failure links and merged outputs per state."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+
+    def add(self, pattern, value):
+        state = 0
+        for byte in pattern:
+            nxt = self.goto[state].get(byte)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][byte] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            state = nxt
+        self.out[state] += (value,)
+
+    def build(self):
+        goto, fail, out = self.goto, self.fail, self.out
+        queue = list(goto[0].values())
+        for state in queue:
+            for byte, nxt in goto[state].items():
+                f = fail[state]
+                while f and byte not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(byte, 0)
+                fail[nxt] = target if target != nxt else 0
+                out[nxt] += out[fail[nxt]]
+                queue.append(nxt)
+
+    def search(self, data):
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        state = 0
+        for byte in data:
+            nxt = goto[state].get(byte)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(byte)
+            state = nxt or 0
+            if out[state]:
+                found.update(out[state])
+        return found
+
+class _CAutomaton:
+    """pyahocorasick backend; bytes are mapped 1:1 to code points with latin-1."""
+
+    def __init__(self):
+        self.automaton = ahocorasick.Automaton()
+        self.values = {}
+
+    def add(self, pattern, value):
+        key = pattern.decode("latin-1")
+        self.values.setdefault(key, []).append(value)
+
+    def build(self):
+        for key, values in self.values.items():
+            self.automaton.add_word(key, tuple(values))
+        self.automaton.make_automaton()
+
+    def search(self, data):
+        found = set()
+        for _, values in self.automaton.iter(bytes(data).decode("latin-1")):
+            found.update(values)
+        return found
+
+class ContentMatcher:
+    """
+    Multi-pattern matcher: `add(pattern, value, nocase)` for every pattern, `build()` once,
+    then `search(payload)` returns the set of values whose pattern occurs in the payload.
+    Case-insensitive patterns live in a second automaton that scans the lower-cased payload.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or ("pyahocorasick" if ahocorasick is not None else "python")
+        automaton = _CAutomaton if self.backend == "pyahocorasick" else _PythonAutomaton
+        self.exact = automaton()
+        self.nocase = automaton()
+        self.patterns = 0
+        self.nocase_patterns = 0
+
+    def add(self, pattern, value, nocase=False):
+        pattern = encode_pattern(pattern)
+        if not pattern:
+            raise ValueError("empty content pattern")
+        if nocase:
+            self.nocase.add(pattern.lower(), value)
+            self.nocase_patterns += 1
+        else:
+            self.exact.add(pattern, value)
+        self.patterns += 1
+
+    def build(self):
+        self.exact.build()
+        self.nocase.build()
+        return self
+
+    def search(self, payload):
+        if not payload or not self.patterns:
+            return set()
+        found = self.exact.search(payload) if self.patterns > self.nocase_patterns else set()
+        if self.nocase_patterns:
+            found |= self.nocase.search(bytes(payload).lower())
+        return found
+
+    def __len__(self):
+        return self.patterns
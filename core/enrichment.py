@@ -0,0 +1,163 @@
+# enrichment.py: threat-intel enrichment on a dedicated asyncio thread.
+# The capture thread hands flows over through a bounded intake queue; a fixed pool of consumer
+# tasks runs AlertEngine.enrich_and_alert, with a semaphore capping concurrent ThreatIntel lookups.
+# Finished alerts go through a results channel to a storage thread, so nothing blocks capture.
+# Every alert passes one hold-down keyed on (type, src, dst) first, so a listed or scanning host
+# stores one alert (and one set of notifications) per window instead of one per packet.
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from core.alert_suppression import AlertSuppressor
+from core.signature_engine import alert_label, record_alert
+from dashboard.utils.alert_formatter import format_alert_payload
+
+class EnrichmentWorker:
+    def __init__(self, alert_engine, alert_sink=None, db_path="ids_data.db",
+                 max_pending=10000, max_concurrent_lookups=16, results_capacity=10000, suppress_window=60):
+        self.alert_engine = alert_engine
+        # Where finished alerts go; defaults to the alerts table via signature_engine.record_alert.
+        self.alert_sink = alert_sink
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self.max_concurrent_lookups = max_concurrent_lookups
+        self.results = queue.Queue(maxsize=results_capacity)
+        # Alerts are published from the loop thread and (scans, feed matches) the capture thread.
+        self.suppressor = AlertSuppressor(hold_down=suppress_window)
+        self.suppress_lock = threading.Lock()
+        self.loop = asyncio.new_event_loop()
+        self.intake = None      # asyncio.Queue, created on the loop thread
+        self.lookup_limit = None
+        self.consumers = []
+        self.ready = threading.Event()
+        self.stats = {"queued": 0, "dropped": 0, "enriched": 0, "failed": 0, "alerts": 0, "alerts_dropped": 0,
+                      "suppressed": 0}
+        self.loop_thread = threading.Thread(target=self._run_loop, name="enrichment-loop", daemon=True)
+        self.store_thread = threading.Thread(target=self._store_results, name="enrichment-store", daemon=True)
+        self.started = False
+        self.closed = False
+
+    def start(self):
+        if self.started or self.closed:
+            return
+        self.started = True
+        self.loop_thread.start()
+        self.store_thread.start()
+        self.ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.intake = asyncio.Queue(maxsize=self.max_pending)
+        self.lookup_limit = asyncio.Semaphore(self.max_concurrent_lookups)
+        # One consumer per lookup slot; each flow needs two lookups (src and dst).
+        self.consumers = [self.loop.create_task(self._consume()) for _ in range(self.max_concurrent_lookups)]
+        self.loop.call_soon(self.ready.set)
+        self.loop.run_forever()
+        for task in self.consumers:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*self.consumers, return_exceptions=True))
+        # The shared ThreatIntel session belongs to this loop; close it before the loop goes.
+        self.loop.run_until_complete(self.alert_engine.threat_intel.close())
+        self.loop.close()
+
+    def submit(self, flow_key, flow):
+        """Queue a flow for enrichment from any thread; returns False if the intake is full."""
+        if not self.started:
+            self.start()
+        if self.closed or self.intake.qsize() >= self.max_pending:
+            self.stats["dropped"] += 1
+            return False
+        self.loop.call_soon_threadsafe(self._offer, flow_key, flow)
+        return True
+
+    def _offer(self, flow_key, flow):
+        try:
+            self.intake.put_nowait((flow_key, flow))
+            self.stats["queued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    async def _consume(self):
+        while True:
+            flow_key, flow = await self.intake.get()
+            try:
+                alert = await self.alert_engine.enrich_and_alert(flow_key, flow, lookup_limit=self.lookup_limit)
+                self.stats["enriched"] += 1
+                if alert:
+                    self._publish(alert, flow)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logging.error(f"❌ Enrichment failed for {flow_key}: {e}")
+            finally:
+                self.intake.task_done()
+
+    def publish(self, alert, flow):
+        """Hand a finished alert straight to the storage thread, from any thread."""
+        if not self.started:
+            self.start()
+        self._publish(alert, flow)
+
+    def _publish(self, alert, flow):
+        """Queue `alert` for storage unless an alert of the same (type, src, dst) went out within the hold-down."""
+        timestamp = flow.get("timestamp") or time.time()
+        with self.suppress_lock:
+            self.suppressor.expire(timestamp)  # summaries dropped: the first alert carries the tags and score
+            if self.suppressor.suppress((alert["type"], alert.get("src_ip"), alert.get("dst_ip")), timestamp, None):
+                self.stats["suppressed"] += 1
+                return
+        score = alert.get("score", 0)
+        severity = "high" if score >= 70 else "medium" if score >= 30 or alert["type"] in ("PORT_SCAN", "HOST_SWEEP") else "low"
+        alert_payload = format_alert_payload(alert["type"], alert["description"], flow, timestamp, severity)
+        alert_payload.update({"tags": alert.get("tags", []), "score": score})
+        try:
+            self.results.put_nowait(alert_payload)
+            self.stats["alerts"] += 1
+        except queue.Full:
+            self.stats["alerts_dropped"] += 1
+
+    def _store_results(self):
+        sink, conn = self.alert_sink, None
+        if sink is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            sink = lambda alert_payload: record_alert(conn, alert_payload, alert_label(alert_payload["type"]))
+        while True:
+            alert_payload = self.results.get()
+            if alert_payload is None:
+                break
+            try:
+                sink(alert_payload)
+            except Exception as e:
+                logging.error(f"❌ Failed to store enrichment alert: {e}")
+        if conn is not None:
+            conn.close()
+
+    def drain(self, timeout=None):
+        """Wait until every queued flow has been enriched; returns False on timeout."""
+        if not self.started:
+            return True
+        future = asyncio.run_coroutine_threadsafe(self.intake.join(), self.loop)
+        try:
+            future.result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return False
+
+    def close(self, timeout=5.0):
+        """Give pending lookups up to `timeout` seconds, then stop the loop and flush stored alerts."""
+        if not self.started or self.closed:
+            return
+        self.closed = True
+        if not self.drain(timeout):
+            logging.warning(f"⚠️ Stopping enrichment with {self.intake.qsize()} flows still queued.")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=5)
+        self.results.put(None)
+        self.store_thread.join(timeout=5)
+
+    def get_stats(self):
+        pending = self.intake.qsize() if self.intake is not None else 0
+        return dict(self.stats, pending=pending)
@@ -2,18 +2,51 @@ import sqlite3
 import time
 import threading
 import queue
+import logging
 import os
 import sys
 from ml.anomaly_detector import AnomalyDetector
+from core.timer_wheel import TimerWheel
+from core.ring_buffer import RingBuffer
+from core.protocols import protocol_name
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 class FlowBuilder:
-    def __init__(self, db_path="ids_data.db"):
+    def __init__(self, db_path="ids_data.db", flush_interval=1.0, flush_rows=500,
+                 idle_timeout=15, active_timeout=1800, on_flow_closed=None, packet_clock=False,
+                 queue_capacity=65536, overflow_policy="drop_newest"):
         self.db_path = db_path
+        self.flush_interval = flush_interval   # seconds between flushes of dirty flows
+        self.flush_rows = flush_rows           # flush early once this many flows are dirty
+        self.idle_timeout = idle_timeout       # close a flow after this many seconds without packets
+        self.active_timeout = active_timeout   # close a flow this many seconds after it started
+        # Offline replay drives timeouts from packet timestamps instead of the wall clock.
+        self.packet_clock = packet_clock
+        self.packet_time = 0.0
         self.anomaly_detector = AnomalyDetector(db_path=db_path)
-        self.flow_queue = queue.Queue()
+        # Called with each list of closed flow records; defaults to scoring them with the anomaly detector.
+        self.closed_flow_handlers = [on_flow_closed or self._score_closed_flows]
+        # Bounded hand-off from the capture thread; see RingBuffer for the overflow policies.
+        self.flow_queue = RingBuffer(capacity=queue_capacity, policy=overflow_policy)
+        # Live flow table: flow key -> counters. Only touched by the db worker thread.
+        self.flows = {}
+        self.dirty = set()
+        self.closing = []  # closed flows whose final counters are not written yet
+        self.timers = TimerWheel(tick=1.0)
+        self.last_flush = time.time()
+        self.stats = {
+            "flows_created": 0,
+            "flows_estimated": 0,   # flows_created scaled up by the capture sampling rate
+            "flows_closed": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
         self.stop_event = threading.Event()
+        self.expire_on_close = False
         self.db_thread = threading.Thread(target=self._db_worker, daemon=True)
         self._prepare_db()
         self.db_thread.start()
@@ -33,9 +66,17 @@ class FlowBuilder:
                     protocol TEXT,
                     packet_count INTEGER DEFAULT 0,
                     total_size INTEGER DEFAULT 0,
-                    timestamp REAL
+                    timestamp REAL,
+                    src_port INTEGER DEFAULT 0,
+                    dst_port INTEGER DEFAULT 0,
+                    tcp_flags INTEGER DEFAULT 0
                 )
             ''')
+            # Databases created before 5-tuple flows lack the port/flag columns.
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(flows)")}
+            for column in ("src_port", "dst_port", "tcp_flags"):
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE flows ADD COLUMN {column} INTEGER DEFAULT 0")
 
     def _safe_commit(self, conn, max_retries=3, delay=0.2):
         for _ in range(max_retries):
@@ -53,58 +94,207 @@ class FlowBuilder:
         conn = self._get_conn()
         while not self.stop_event.is_set():
             try:
-                flow = self.flow_queue.get(timeout=1)
-                self._process_flow(flow, conn)
+                item = self.flow_queue.get(timeout=self.flush_interval)
+                if "flow_keys" in item:
+                    self._process_batch(item)
+                else:
+                    self._process_flow(item)
                 self.flow_queue.task_done()
             except queue.Empty:
-                continue
+                pass
+            self._expire_flows(self._clock())
+            if len(self.dirty) >= self.flush_rows or time.time() - self.last_flush >= self.flush_interval:
+                self._flush(conn)
+        if self.expire_on_close:
+            self._expire_all("end_of_capture")
+        self._flush(conn)
         conn.close()
 
-    def _process_flow(self, flow, conn):
-        now = time.time()
+    def _clock(self):
+        return self.packet_time if self.packet_clock else time.time()
+
+    @staticmethod
+    def flow_key(flow):
+        return flow["flow_key"]
+
+    def _get_record(self, key, start_time, sample_rate=1):
+        record = self.flows.get(key)
+        if record is None:
+            src_ip, dst_ip, src_port, dst_port, proto = key
+            record = {
+                "id": None,  # assigned on first flush
+                "src_ip": src_ip,
+                "dst_ip": dst_ip,
+                "src_port": src_port,
+                "dst_port": dst_port,
+                "proto": proto,
+                "protocol": protocol_name(proto),
+                "tcp_flags": 0,
+                "packet_count": 0,
+                "total_size": 0,
+                "start_time": start_time,
+                # Whole flows are sampled, so the counters above stay exact; this flow stands for `sample_rate`.
+                "sample_rate": sample_rate,
+            }
+            self.flows[key] = record
+            self.stats["flows_created"] += 1
+            self.stats["flows_estimated"] += sample_rate
+            self.timers.schedule((key, record), start_time + min(self.idle_timeout, self.active_timeout))
+        return record
+
+    def _process_flow(self, flow):
+        now = flow.get("timestamp") or time.time()
+        self.packet_time = max(self.packet_time, now)
+        key = self.flow_key(flow)
+        record = self._get_record(key, now, flow.get("sample_rate", 1))
+
+        record["packet_count"] += 1
+        record["total_size"] += flow["packet_size"]
+        record["tcp_flags"] |= flow.get("tcp_flags", 0)
+        record["timestamp"] = now
+        self.dirty.add(key)
+
+        flow.update({
+            "packet_count": record["packet_count"],
+            "total_size": record["total_size"],
+            "timestamp": now,
+            "start_time": record["start_time"]
+        })
+
+    def _process_batch(self, flows):
+        """Apply one batch of per-flow columns from `batch_decoder.aggregate_flows`."""
+        counts = flows["packet_count"].tolist()
+        sizes = flows["total_size"].tolist()
+        flags = flows["tcp_flags"].tolist()
+        first_seen = flows["first_seen"].tolist()
+        last_seen = flows["last_seen"].tolist()
+        sample_rate = flows.get("sample_rate", 1)
+        for i, key in enumerate(flows["flow_keys"]):
+            record = self._get_record(key, first_seen[i], sample_rate)
+            record["packet_count"] += counts[i]
+            record["total_size"] += sizes[i]
+            record["tcp_flags"] |= flags[i]
+            record["timestamp"] = max(record.get("timestamp", 0), last_seen[i])
+            self.dirty.add(key)
+        if last_seen:
+            self.packet_time = max(self.packet_time, max(last_seen))
+
+    def _expire_flows(self, now):
+        """Close flows whose idle or active timeout has passed."""
+        closed = []
+        for key, record in self.timers.advance(now):
+            if self.flows.get(key) is not record:
+                continue
+            idle_deadline = record["timestamp"] + self.idle_timeout
+            active_deadline = record["start_time"] + self.active_timeout
+            deadline = min(idle_deadline, active_deadline)
+            if deadline > now:
+                # Flow saw packets since this timer was set; check again at its new deadline.
+                self.timers.schedule((key, record), deadline)
+                continue
+            reason = "active_timeout" if active_deadline <= now else "idle_timeout"
+            closed.append(self._close_flow(key, record, reason, now))
+
+        self._emit_closed(closed)
+
+    def _expire_all(self, reason):
+        now = self._clock()
+        self._emit_closed([self._close_flow(key, record, reason, now) for key, record in list(self.flows.items())])
+
+    def _emit_closed(self, closed):
+        if not closed:
+            return
+        for handler in self.closed_flow_handlers:
+            try:
+                handler(closed)
+            except Exception as e:
+                logging.error(f"❌ Closed-flow handler failed: {e}")
+
+    def _close_flow(self, key, record, reason, now):
+        del self.flows[key]
+        if key in self.dirty:
+            self.dirty.discard(key)
+            self.closing.append(record)
+        self.stats["flows_closed"] += 1
+
+        closed = {k: v for k, v in record.items() if k != "id"}
+        closed.update({"end_time": record["timestamp"], "close_reason": reason, "closed_at": now})
+        return closed
+
+    def _score_closed_flows(self, closed):
+        self.anomaly_detector.score_batch({
+            "src_ip": [f["src_ip"] for f in closed],
+            "dst_ip": [f["dst_ip"] for f in closed],
+            "protocol": [f["protocol"] for f in closed],
+            "packet_count": [f["packet_count"] for f in closed],
+            "total_size": [f["total_size"] for f in closed],
+            "start_time": [f["start_time"] for f in closed],
+            "end_time": [f["end_time"] for f in closed],
+        })
+
+    def _flush(self, conn):
+        """Write all dirty and just-closed flows to the `flows` table in a single transaction."""
+        self.last_flush = time.time()
+        if not self.dirty and not self.closing:
+            return
+        started = time.perf_counter()
+        batch = [self.flows[key] for key in self.dirty] + self.closing
+        new = [r for r in batch if r["id"] is None]
+        known = [r for r in batch if r["id"] is not None]
+
         cur = conn.cursor()
-        cur.execute("""
-            SELECT id, packet_count, total_size, timestamp FROM flows
-            WHERE src_ip=? AND dst_ip=? AND protocol=?
-        """, (flow["src_ip"], flow["dst_ip"], flow["protocol"]))
-        row = cur.fetchone()
-
-        if row:
-            fid, pkt_cnt, total_sz, start_ts = row
-            pkt_cnt = pkt_cnt or 0
-            total_sz = total_sz or 0
-            pkt_cnt += 1
-            total_sz += flow["packet_size"]
-            flow.update({
-                "packet_count": pkt_cnt,
-                "total_size": total_sz,
-                "timestamp": now,
-                "start_time": start_ts
-            })
-            cur.execute("""
-                UPDATE flows SET packet_count=?, total_size=?, timestamp=? WHERE id=?
-            """, (pkt_cnt, total_sz, now, fid))
-        else:
-            pkt_cnt, total_sz = 1, flow["packet_size"]
-            flow.update({
-                "packet_count": pkt_cnt,
-                "total_size": total_sz,
-                "timestamp": now,
-                "start_time": now
-            })
-            cur.execute("""
-                INSERT INTO flows (src_ip, dst_ip, protocol, packet_count, total_size, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (flow["src_ip"], flow["dst_ip"], flow["protocol"], pkt_cnt, total_sz, now))
-
-        self._safe_commit(conn)
-
-        # ✅ Call Anomaly Detector
-        self.anomaly_detector.score_flow(flow)
+        try:
+            for record in new:
+                # lastrowid is this statement's own row, whatever else writes to `flows` (triggers included).
+                cur.execute("""
+                    INSERT INTO flows (src_ip, dst_ip, src_port, dst_port, protocol,
+                                       packet_count, total_size, tcp_flags, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (record["src_ip"], record["dst_ip"], record["src_port"], record["dst_port"], record["protocol"],
+                      record["packet_count"], record["total_size"], record["tcp_flags"], record["timestamp"]))
+                record["id"] = cur.lastrowid
+            if known:
+                cur.executemany("""
+                    UPDATE flows SET packet_count=?, total_size=?, tcp_flags=?, timestamp=? WHERE id=?
+                """, [(r["packet_count"], r["total_size"], r["tcp_flags"], r["timestamp"], r["id"]) for r in known])
+            self._safe_commit(conn)
+        except sqlite3.Error as e:
+            conn.rollback()
+            for record in new:
+                record["id"] = None
+            logging.error(f"❌ Flow flush failed, keeping {len(batch)} dirty flows: {e}")
+            return
+
+        self.dirty.clear()
+        self.closing = []
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += len(batch)
+        self.stats["last_batch_size"] = len(batch)
+        self.stats["last_flush_ms"] = elapsed_ms
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+        logging.debug(f"Flushed {len(batch)} flows in {elapsed_ms:.1f} ms")
+
+    def add_closed_flow_handler(self, handler):
+        self.closed_flow_handlers.append(handler)
+
+    def get_stats(self):
+        queue_stats = {f"queue_{name}": value for name, value in self.flow_queue.get_stats().items()}
+        return dict(self.stats, live_flows=len(self.flows), dirty_flows=len(self.dirty), **queue_stats)
 
     def update_flow(self, flow):
         self.flow_queue.put(flow)
 
-    def close(self):
+    def update_batch(self, flows):
+        """Queue per-flow column arrays produced by `batch_decoder.aggregate_flows`."""
+        self.flow_queue.put(flows)
+
+    def drain(self):
+        """Block until every queued flow has been applied to the flow table."""
+        self.flow_queue.join()
+
+    def close(self, expire_all=False):
+        """Stop the worker; with `expire_all`, close every live flow first (e.g. at the end of a replay)."""
+        self.expire_on_close = expire_all
         self.stop_event.set()
         self.db_thread.join()
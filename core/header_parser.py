@@ -0,0 +1,107 @@
+# header_parser.py: decode only the L2/L3/L4 header fields the IDS needs straight from raw frame bytes.
+# Used by the raw capture backend instead of scapy's full per-packet dissection.
+import socket
+import struct
+import time
+from core.protocols import IPPROTO_TCP, IPPROTO_UDP, make_flow_key, protocol_name
+
+# pcap/DLT link types we can decode
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8)
+IPV6_EXT_HEADERS = (0, 43, 60)  # hop-by-hop, routing, destination options
+IPV6_FRAGMENT = 44
+
+_U16 = struct.Struct("!H")
+_IPV4 = struct.Struct("!B5xHxB2x4s4s")     # ver/ihl, flags/frag offset, proto, src, dst
+_IPV6 = struct.Struct("!4x2xBx16s16s")     # next header, src, dst
+_PORTS = struct.Struct("!HH")
+
+_inet_ntoa = socket.inet_ntoa
+_inet_ntop = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+def l3_offset(frame, linktype=LINKTYPE_ETHERNET):
+    """Return (ethertype, offset of the IP header) for a frame, or (None, 0)."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None, 0
+        ethertype = _U16.unpack_from(frame, 12)[0]
+        off = 14
+        while ethertype in VLAN_ETHERTYPES and len(frame) >= off + 4:
+            ethertype = _U16.unpack_from(frame, off + 2)[0]
+            off += 4
+        return ethertype, off
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(frame) < 16:
+            return None, 0
+        return _U16.unpack_from(frame, 14)[0], 16
+    if linktype == LINKTYPE_RAW:
+        if not frame:
+            return None, 0
+        version = frame[0] >> 4
+        return (ETH_P_IP if version == 4 else ETH_P_IPV6 if version == 6 else None), 0
+    return None, 0
+
+def parse_frame(frame, timestamp=None, linktype=LINKTYPE_ETHERNET):
+    """
+    Decode an Ethernet/IPv4/IPv6/TCP/UDP frame into the flow dict produced by
+    `packet_sniffer.extract_flow`. Returns None for non-IP or truncated frames.
+    `payload` is a zero-copy slice of the TCP/UDP payload, only valid while `frame` is.
+    """
+    ethertype, off = l3_offset(frame, linktype)
+    n = len(frame)
+    src_port = dst_port = tcp_flags = 0
+
+    if ethertype == ETH_P_IP:
+        if n < off + 20:
+            return None
+        ver_ihl, frag, proto, src, dst = _IPV4.unpack_from(frame, off)
+        src_ip, dst_ip = _inet_ntoa(src), _inet_ntoa(dst)
+        l4 = off + (ver_ihl & 0x0F) * 4
+        total_length = _U16.unpack_from(frame, off + 2)[0]
+        end = off + total_length if total_length else n  # drops Ethernet padding; 0 with TSO
+        has_ports = not frag & 0x1FFF  # only the first fragment carries the L4 header
+    elif ethertype == ETH_P_IPV6:
+        if n < off + 40:
+            return None
+        proto, src, dst = _IPV6.unpack_from(frame, off)
+        src_ip, dst_ip = _inet_ntop(_AF_INET6, src), _inet_ntop(_AF_INET6, dst)
+        l4 = off + 40
+        payload_length = _U16.unpack_from(frame, off + 4)[0]
+        end = l4 + payload_length if payload_length else n  # 0 for jumbograms
+        has_ports = True
+        while proto in IPV6_EXT_HEADERS and n >= l4 + 2:
+            proto, l4 = frame[l4], l4 + (frame[l4 + 1] + 1) * 8
+        if proto == IPV6_FRAGMENT and n >= l4 + 8:
+            has_ports = not _U16.unpack_from(frame, l4 + 2)[0] & 0xFFF8
+            proto, l4 = frame[l4], l4 + 8
+    else:
+        return None
+
+    payload_start = end
+    if has_ports and (proto == IPPROTO_TCP or proto == IPPROTO_UDP) and n >= l4 + 4:
+        src_port, dst_port = _PORTS.unpack_from(frame, l4)
+        if proto == IPPROTO_UDP:
+            payload_start = l4 + 8
+        elif n >= l4 + 14:
+            tcp_flags = frame[l4 + 13]
+            payload_start = l4 + (frame[l4 + 12] >> 4) * 4
+
+    return {
+        'flow_key': make_flow_key(src_ip, dst_ip, src_port, dst_port, proto),
+        'src_ip': src_ip,
+        'dst_ip': dst_ip,
+        'src_port': src_port,
+        'dst_port': dst_port,
+        'proto': proto,
+        'protocol': protocol_name(proto),
+        'tcp_flags': tcp_flags,
+        'timestamp': time.time() if timestamp is None else timestamp,
+        'packet_size': n,
+        'payload': frame[payload_start:min(end, n)]
+    }
@@ -0,0 +1,195 @@
+# ip_trie.py: longest-prefix-match trie over integer IPv4/IPv6 addresses, and the address filters
+# (src_cidr / dst_cidr / named IP sets) of signature rules built on it.
+# The trie is multibit: every level consumes one address byte, and a prefix whose length is not a
+# multiple of 8 is expanded over the byte values it covers, so a lookup takes at most 4 (IPv4) or
+# 16 (IPv6) steps however many prefixes are loaded.
+import ipaddress
+import os
+import socket
+from functools import lru_cache
+import yaml
+
+@lru_cache(maxsize=65536)
+def ip_to_int(ip):
+    """(version, integer value) of an address string; (0, 0) if it does not parse."""
+    try:
+        if ":" in ip:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+        return 4, int.from_bytes(socket.inet_aton(ip), "big")
+    except (OSError, TypeError):
+        return 0, 0
+
+def parse_prefix(text):
+    """(version, network int, prefix length) of a CIDR or a bare address; raises ValueError."""
+    net = ipaddress.ip_network(str(text).strip(), strict=False)
+    return net.version, int(net.network_address), net.prefixlen
+
+class _Node:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children = {}  # byte -> _Node
+        self.entries = {}   # byte -> (prefix length, value) of the longest prefix ending in this byte
+
+class PrefixTrie:
+    """Maps prefixes to values; lookup() returns the value of the longest prefix containing an address."""
+
+    def __init__(self):
+        self.roots = {4: _Node(), 6: _Node()}
+        self.defaults = {4: None, 6: None}  # values of /0 prefixes
+        self.prefixes = 0
+
+    def insert(self, version, network, prefix_len, value):
+        self.prefixes += 1
+        if prefix_len == 0:
+            self.defaults[version] = value
+            return
+        bits = 32 if version == 4 else 128
+        node = self.roots[version]
+        full = (prefix_len - 1) // 8  # whole bytes above the byte the prefix ends in
+        for level in range(full):
+            byte = (network >> (bits - 8 * (level + 1))) & 0xFF
+            child = node.children.get(byte)
+            if child is None:
+                child = node.children[byte] = _Node()
+            node = child
+        last = (network >> (bits - 8 * (full + 1))) & 0xFF
+        span = 1 << (8 * (full + 1) - prefix_len)  # byte values covered by the remaining prefix bits
+        for byte in range(last & ~(span - 1) & 0xFF, (last & ~(span - 1) & 0xFF) + span):
+            entry = node.entries.get(byte)
+            if entry is None or entry[0] <= prefix_len:
+                node.entries[byte] = (prefix_len, value)
+
+    def lookup(self, version, value):
+        """Value of the longest matching prefix, or None; at most bits / 8 steps."""
+        node = self.roots.get(version)
+        if node is None:
+            return None
+        best = self.defaults[version]
+        shift = 24 if version == 4 else 120
+        while node is not None and shift >= 0:
+            byte = (value >> shift) & 0xFF
+            entry = node.entries.get(byte)
+            if entry is not None:
+                best = entry[1]
+            node = node.children.get(byte)
+            shift -= 8
+        return best
+
+    def __len__(self):
+        return self.prefixes
+
+def read_prefix_file(path):
+    """Prefixes from a text file, one per line; '#' starts a comment."""
+    with open(path, "r") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+def read_ip_sets(path):
+    """
+    Named IP sets from a YAML mapping of name -> list of prefixes, or name -> path of a text file
+    of prefixes (relative to the YAML file). Raises ValueError for anything malformed.
+    """
+    with open(path, "r") as f:
+        try:
+            raw = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"YAML error: {e}")
+    if not isinstance(raw, dict):
+        raise ValueError("expected a mapping of set name -> prefixes")
+    ip_sets = {}
+    for name, prefixes in raw.items():
+        if isinstance(prefixes, str):
+            try:
+                prefixes = read_prefix_file(os.path.join(os.path.dirname(path), prefixes))
+            except OSError as e:
+                raise ValueError(f"IP set {name!r}: {e}")
+        if not isinstance(prefixes, list):
+            raise ValueError(f"IP set {name!r}: expected a list of prefixes or a file name")
+        try:
+            ip_sets[str(name)] = tuple(parse_prefix(prefix) for prefix in prefixes)
+        except ValueError as e:
+            raise ValueError(f"IP set {name!r}: {e}")
+    return ip_sets
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def address_filter(conditions, side, ip_sets):
+    """
+    Normalised address conditions of one side ("src" or "dst") of a rule, or None if it has none:
+    (CIDRs, IP sets the address must be in, IP sets it must not be in). Raises ValueError for a
+    malformed CIDR or an unknown set name.
+    """
+    cidrs = tuple(sorted({parse_prefix(cidr) for cidr in _as_list(conditions.get(f"{side}_cidr"))}))
+    names = tuple(sorted({str(n) for n in _as_list(conditions.get(f"{side}_set"))}))
+    excluded = tuple(sorted({str(n) for n in _as_list(conditions.get(f"{side}_not_set"))}))
+    for name in names + excluded:
+        if name not in ip_sets:
+            raise ValueError(f"unknown IP set {name!r}")
+    if not (cidrs or names or excluded):
+        return None
+    return cidrs, names, excluded
+
+class AddressFilters:
+    """
+    All address filters of a rule set compiled into one trie. Each distinct prefix list (a rule's
+    CIDRs, a group of named sets) gets a label; the trie maps an address to the labels of every
+    prefix containing it, so one O(address bits) lookup answers all filters for that address.
+    """
+
+    def __init__(self, ip_sets=None):
+        self.ip_sets = ip_sets or {}
+        self.labels = {}   # prefix list key -> label
+        self.pending = {}  # (version, network, prefix length) -> set of labels
+        self.trie = PrefixTrie()
+        self.cache = {}    # address string -> frozenset of labels
+
+    def _label(self, key, prefixes):
+        label = self.labels.get(key)
+        if label is None:
+            label = self.labels[key] = len(self.labels)
+            for prefix in prefixes:
+                self.pending.setdefault(prefix, set()).add(label)
+        return label
+
+    def compile(self, spec):
+        """Compiled form of an address_filter() result: (required labels, excluded label or None)."""
+        if spec is None:
+            return None
+        cidrs, names, excluded = spec
+        required = []
+        if cidrs:
+            required.append(self._label(("cidr", cidrs), cidrs))
+        if names:
+            required.append(self._label(("set", names), [p for name in names for p in self.ip_sets[name]]))
+        exclude = self._label(("set", excluded), [p for name in excluded for p in self.ip_sets[name]]) \
+            if excluded else None
+        return tuple(required), exclude
+
+    def build(self):
+        """Insert every prefix, shortest first, each carrying the labels of all prefixes that contain it."""
+        for (version, network, prefix_len), labels in sorted(self.pending.items(), key=lambda item: item[0][2]):
+            inherited = self.trie.lookup(version, network) or frozenset()
+            self.trie.insert(version, network, prefix_len, inherited | frozenset(labels))
+        self.pending = {}
+        return self
+
+    def lookup(self, ip):
+        """Labels of every prefix containing `ip` (a string), memoized per address."""
+        labels = self.cache.get(ip)
+        if labels is None:
+            labels = self.trie.lookup(*ip_to_int(ip)) or frozenset()
+            if len(self.cache) >= 65536:
+                self.cache.clear()
+            self.cache[ip] = labels
+        return labels
+
+    @staticmethod
+    def accepts(compiled, labels):
+        required, exclude = compiled
+        for label in required:
+            if label not in labels:
+                return False
+        return exclude is None or exclude not in labels
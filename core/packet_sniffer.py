@@ -1,45 +1,146 @@
-from scapy.all import sniff, IP, TCP, UDP
-import asyncio
+import logging
 import time
+from core.protocols import make_flow_key, protocol_name
+from core.header_parser import parse_frame
+from core.raw_capture import RawSocketCapture
+from core.batch_decoder import FrameBatch, decode_batch, aggregate_flows, flow_dicts
+from core.sampling import AdaptiveSampler
+
+try:
+    from scapy.all import sniff, IP, TCP, UDP
+except ImportError:  # scapy is only needed for the "scapy" capture backend
+    sniff = None
+
+CAPTURE_BACKENDS = ("raw", "scapy")
 
 def extract_flow(pkt):
     if IP in pkt:
-        proto = 'TCP' if TCP in pkt else 'UDP' if UDP in pkt else 'OTHER'
+        ip = pkt[IP]
+        proto = ip.proto
+        src_port = dst_port = tcp_flags = 0
+        payload = b""
+        if TCP in pkt:
+            src_port, dst_port = pkt[TCP].sport, pkt[TCP].dport
+            tcp_flags = int(pkt[TCP].flags)
+            payload = bytes(pkt[TCP].payload)
+        elif UDP in pkt:
+            src_port, dst_port = pkt[UDP].sport, pkt[UDP].dport
+            payload = bytes(pkt[UDP].payload)
         return {
-            'src_ip': pkt[IP].src,
-            'dst_ip': pkt[IP].dst,
-            'protocol': proto,
+            'flow_key': make_flow_key(ip.src, ip.dst, src_port, dst_port, proto),
+            'src_ip': ip.src,
+            'dst_ip': ip.dst,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'proto': proto,
+            'protocol': protocol_name(proto),
+            'tcp_flags': tcp_flags,
             'timestamp': time.time(),
-            'packet_size': len(pkt)
+            'packet_size': len(pkt),
+            'payload': payload
         }
     return None
 
-def packet_handler(flow_builder, signature_engine, alert_engine):
-    loop = asyncio.get_event_loop()
+def flow_handler(flow_builder, signature_engine, alert_engine, sampler=None):
+
+    def handle_flow(flow):
+        if sampler is not None:
+            flow = sampler.sample_flow(flow)
+            if flow is None:
+                return
+            started = time.perf_counter()
+        # The payload may be a view into a reused capture buffer: only the synchronous
+        # signature check sees it, it never travels with the flow to other threads.
+        payload = flow.pop("payload", None)
+        flow_builder.update_flow(flow)
+        signature_engine.check_rules(flow, payload)
+        alert_engine.submit(flow["flow_key"], flow)
+        if sampler is not None:
+            sampler.observe(time.perf_counter() - started)
 
+    return handle_flow
+
+def packet_handler_for(handle_flow):
+    """Wrap a flow callback as a scapy `prn` callback."""
     def handle(pkt):
         flow = extract_flow(pkt)
         if not flow:
             return
+        handle_flow(flow)
 
-        flow_builder.update_flow(flow)
-        signature_engine.check_rules(flow)
+    return handle
 
-        flow_key = (flow["src_ip"], flow["dst_ip"])
-        asyncio.run_coroutine_threadsafe(
-            alert_engine.enrich_and_alert(flow_key, flow),
-            loop
-        )
+def packet_handler(flow_builder, signature_engine, alert_engine):
+    return packet_handler_for(flow_handler(flow_builder, signature_engine, alert_engine))
 
-    return handle
+def batch_handler(flow_builder, signature_engine, alert_engine, sampler=None):
+
+    def handle_batch(columns):
+        started = time.perf_counter()
+        flows = aggregate_flows(columns)
+        if sampler is not None:
+            flows = sampler.sample_batch(flows)
+        flow_builder.update_batch(flows)
+        signature_engine.check_batch(flows)
+
+        for flow in flow_dicts(flows):
+            alert_engine.submit(flow["flow_key"], flow)
+        if sampler is not None:
+            # Budget per packet, so batch and per-flow mode share one latency target.
+            sampler.observe((time.perf_counter() - started) / max(len(columns["key"]), 1))
+
+    return handle_batch
 
-def start_sniffing(flow_builder, signature_engine, alert_engine):
-    print("[*] Starting packet capture...")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def sniff_raw_batched(handle_batch, iface=None, batch_size=1024, fanout_group=None):
+    """Batch mode: frames land in one contiguous buffer and are decoded with NumPy per batch."""
+    capture = RawSocketCapture(iface=iface, fanout_group=fanout_group)
+    batch = FrameBatch(capacity=batch_size)
+    try:
+        while True:
+            if capture.fill_batch(batch):
+                handle_batch(decode_batch(batch))
+                batch.reset()
+    finally:
+        capture.close()
+
+def sniff_raw(handle_flow, iface=None, fanout_group=None):
+    """Fast path: AF_PACKET frames decoded by the header parser, no scapy objects."""
+    capture = RawSocketCapture(iface=iface, fanout_group=fanout_group)
+    try:
+        for timestamp, frame in capture.frames():
+            flow = parse_frame(frame, timestamp)
+            if flow:
+                handle_flow(flow)
+    finally:
+        capture.close()
+
+def start_sniffing(flow_builder, signature_engine, alert_engine, backend="raw", iface=None, batch_size=0,
+                   adaptive_sampling=False, max_sample_rate=64):
+    if backend not in CAPTURE_BACKENDS:
+        raise ValueError(f"Unknown capture backend {backend!r}, expected one of {CAPTURE_BACKENDS}")
+    print(f"[*] Starting packet capture ({backend} backend)...")
+    # Under overload analyse 1-in-N flows instead of letting the flow queue overflow.
+    sampler = AdaptiveSampler(flow_builder.flow_queue, max_rate=max_sample_rate) if adaptive_sampling else None
+    handle_flow = flow_handler(flow_builder, signature_engine, alert_engine, sampler)
+
+    if backend == "raw":
+        try:
+            if batch_size:
+                sniff_raw_batched(batch_handler(flow_builder, signature_engine, alert_engine, sampler),
+                                  iface=iface, batch_size=batch_size)
+            else:
+                sniff_raw(handle_flow, iface=iface)
+            return
+        except OSError as e:
+            if sniff is None:
+                raise
+            logging.warning(f"⚠️ Raw capture unavailable ({e}), falling back to scapy.")
 
+    if sniff is None:
+        raise RuntimeError("scapy is not installed; use the raw capture backend")
     sniff(
-        prn=packet_handler(flow_builder, signature_engine, alert_engine),
+        prn=packet_handler_for(handle_flow),
         store=0,
-        filter="ip"
+        filter="ip",
+        iface=iface
     )
@@ -0,0 +1,154 @@
+# pcap_reader.py: memory-mapped readers for libpcap (.pcap) and pcapng capture files.
+# Frames are yielded as memoryview slices of the mapping, so a capture is never loaded whole
+# and no bytes are copied until a decoder reads the header fields it needs.
+import mmap
+import os
+import struct
+
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_IDB = 0x00000001
+PCAPNG_PB = 0x00000002   # obsolete packet block
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_OPT_IF_TSRESOL = 9
+
+CAPTURE_EXTENSIONS = (".pcap", ".pcapng", ".cap")
+
+class _MappedCapture:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.size = len(self.map)
+        self.linktype = None
+
+    def __iter__(self):
+        for ts, frame, _ in self.records():
+            yield ts, frame
+
+    def close(self):
+        try:
+            self.view.release()
+            self.map.close()
+        except BufferError:
+            pass  # a caller still holds a frame view; the mapping goes away with it
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PcapReader(_MappedCapture):
+    """Iterate over (timestamp, frame) records of a classic .pcap file."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        header = self.map[:24]
+        if len(header) < 24:
+            raise ValueError(f"{path}: not a pcap file (short header)")
+        for endian in ("<", ">"):
+            magic = struct.unpack(endian + "I", header[:4])[0]
+            if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+                break
+        else:
+            raise ValueError(f"{path}: unsupported capture format (magic {header[:4].hex()})")
+        self.ts_scale = 1e-9 if magic == PCAP_MAGIC_NSEC else 1e-6
+        self.snaplen, self.linktype = struct.unpack(endian + "II", header[16:24])
+        self.record = struct.Struct(endian + "IIII")
+
+    def records(self):
+        """Yield (timestamp, frame view, linktype) for every packet."""
+        view, size, unpack_from = self.view, self.size, self.record.unpack_from
+        scale, linktype = self.ts_scale, self.linktype
+        off = 24
+        while off + 16 <= size:
+            ts_sec, ts_frac, caplen, _ = unpack_from(view, off)
+            off += 16
+            if off + caplen > size:
+                return
+            yield ts_sec + ts_frac * scale, view[off:off + caplen], linktype
+            off += caplen
+
+class PcapNgReader(_MappedCapture):
+    """Iterate over the packets of a pcapng file (EPB, SPB and obsolete PB blocks)."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        if self.size < 12 or struct.unpack("<I", self.map[:4])[0] != PCAPNG_SHB:
+            raise ValueError(f"{path}: not a pcapng file")
+        self.endian = "<" if struct.unpack("<I", self.map[8:12])[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+        self.interfaces = []  # (linktype, ts_scale, snaplen) per interface id of the current section
+        next(self.records(first_interface_only=True), None)  # read the first IDB for `linktype`
+
+    def _parse_idb(self, body):
+        linktype, _, snaplen = struct.unpack_from(self.endian + "HHI", body, 0)
+        scale = 1e-6
+        off = 8
+        while off + 4 <= len(body):
+            code, length = struct.unpack_from(self.endian + "HH", body, off)
+            if code == 0:
+                break
+            if code == PCAPNG_OPT_IF_TSRESOL and length >= 1:
+                value = body[off + 4]
+                scale = 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+            off += 4 + ((length + 3) & ~3)
+        self.interfaces.append((linktype, scale, snaplen))
+        if self.linktype is None:
+            self.linktype = linktype
+
+    def records(self, first_interface_only=False):
+        """Yield (timestamp, frame view, linktype) for every packet."""
+        view, size = self.view, self.size
+        off, ts = 0, 0.0
+        while off + 12 <= size:
+            block_type = struct.unpack_from("<I", view, off)[0]
+            if block_type == PCAPNG_SHB:
+                self.endian = "<" if struct.unpack_from("<I", view, off + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                self.interfaces = []
+            endian = self.endian
+            block_type, block_len = struct.unpack_from(endian + "II", view, off)
+            if block_len < 12 or off + block_len > size:
+                return
+            body = view[off + 8:off + block_len - 4]
+            off += block_len
+
+            if block_type == PCAPNG_IDB:
+                self._parse_idb(body)
+                if first_interface_only:
+                    return
+            elif block_type == PCAPNG_EPB:
+                iface, ts_high, ts_low, caplen, _ = struct.unpack_from(endian + "IIIII", body, 0)
+                linktype, scale, _ = self.interfaces[iface]
+                ts = ((ts_high << 32) | ts_low) * scale
+                yield ts, body[20:20 + caplen], linktype
+            elif block_type == PCAPNG_SPB and self.interfaces:
+                linktype, _, snaplen = self.interfaces[0]
+                orig_len = struct.unpack_from(endian + "I", body, 0)[0]
+                caplen = min(orig_len, snaplen or orig_len, len(body) - 4)
+                yield ts, body[4:4 + caplen], linktype  # SPBs carry no timestamp; reuse the last one
+            elif block_type == PCAPNG_PB:
+                iface, _, ts_high, ts_low, caplen, _ = struct.unpack_from(endian + "HHIIII", body, 0)
+                linktype, scale, _ = self.interfaces[iface]
+                ts = ((ts_high << 32) | ts_low) * scale
+                yield ts, body[20:20 + caplen], linktype
+
+def open_capture(path):
+    """Open a .pcap or .pcapng file, detected from its magic number."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if len(magic) == 4 and struct.unpack("<I", magic)[0] == PCAPNG_SHB:
+        return PcapNgReader(path)
+    return PcapReader(path)
+
+def capture_files(path):
+    """A capture file, or every capture file in a directory, in name order."""
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.lower().endswith(CAPTURE_EXTENSIONS))
+    return [path]
@@ -0,0 +1,46 @@
+# IP protocol numbers and helpers shared by the capture path and the engines.
+import zlib
+
+IPPROTO_ICMP = 1
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_ICMPV6 = 58
+
+PROTOCOL_NAMES = {
+    IPPROTO_ICMP: "ICMP",
+    IPPROTO_TCP: "TCP",
+    IPPROTO_UDP: "UDP",
+    IPPROTO_ICMPV6: "ICMPV6",
+}
+PROTOCOL_NUMBERS = {name: num for num, name in PROTOCOL_NAMES.items()}
+
+# TCP flag bits as they appear in the TCP header
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+TCP_URG = 0x20
+
+def protocol_name(proto):
+    return PROTOCOL_NAMES.get(proto, "OTHER")
+
+def protocol_number(name):
+    """Map a rule protocol ("TCP", "udp", 6) to its IP protocol number, or None."""
+    if isinstance(name, int):
+        return name
+    if not name:
+        return None
+    return PROTOCOL_NUMBERS.get(str(name).upper())
+
+def make_flow_key(src_ip, dst_ip, src_port, dst_port, proto):
+    """Compact 5-tuple flow key: (src_ip, dst_ip, src_port, dst_port, proto number)."""
+    return (src_ip, dst_ip, src_port, dst_port, proto)
+
+def symmetric_flow_hash(flow_key):
+    """Stable hash of a 5-tuple that is identical for both directions of the flow."""
+    src_ip, dst_ip, src_port, dst_port, proto = flow_key
+    a, b = (src_ip, src_port), (dst_ip, dst_port)
+    if b < a:
+        a, b = b, a
+    return zlib.crc32(f"{a[0]}|{a[1]}|{b[0]}|{b[1]}|{proto}".encode())
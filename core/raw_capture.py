@@ -0,0 +1,61 @@
+# raw_capture.py: capture raw frames from a Linux AF_PACKET socket without scapy.
+import socket
+import time
+
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_FANOUT = 18
+PACKET_FANOUT_HASH = 0          # kernel flow hash; symmetric, so both directions share a socket
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+
+class RawSocketCapture:
+    """
+    Read raw Ethernet frames from an AF_PACKET socket into one reusable buffer.
+    Frames are yielded as memoryview slices of that buffer, so they are only
+    valid until the next frame is read.
+    """
+
+    def __init__(self, iface=None, snaplen=65535, fanout_group=None):
+        if not hasattr(socket, "AF_PACKET"):
+            raise OSError("AF_PACKET raw sockets are only available on Linux")
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.ntohs(ETH_P_ALL))
+        if iface:
+            self.sock.bind((iface, 0))
+        if fanout_group is not None:
+            # Sockets joining the same group split the traffic between them by flow hash.
+            mode = PACKET_FANOUT_HASH | PACKET_FANOUT_FLAG_DEFRAG
+            self.sock.setsockopt(SOL_PACKET, PACKET_FANOUT, (fanout_group & 0xFFFF) | (mode << 16))
+        self.buffer = bytearray(snaplen)
+        self.view = memoryview(self.buffer)
+
+    def frames(self):
+        self.sock.settimeout(None)
+        recv_into, view, now = self.sock.recv_into, self.view, time.time
+        while True:
+            n = recv_into(view)
+            yield now(), view[:n]
+
+    def fill_batch(self, batch, timeout=0.05):
+        """
+        Receive frames straight into the rows of a `FrameBatch` until it is full or
+        `timeout` seconds have passed since the first frame. MSG_TRUNC makes recv_into
+        return the full frame length even though only `batch.snaplen` bytes are kept.
+        """
+        recv_into, now = self.sock.recv_into, time.time
+        deadline = None
+        try:
+            while not batch.full:
+                self.sock.settimeout(None if deadline is None else max(deadline - now(), 1e-3))
+                n = recv_into(batch.slot(), batch.snaplen, socket.MSG_TRUNC)
+                ts = now()
+                batch.commit(n, ts)
+                if deadline is None:
+                    deadline = ts + timeout
+                elif ts >= deadline:
+                    break
+        except socket.timeout:
+            pass
+        return len(batch)
+
+    def close(self):
+        self.sock.close()
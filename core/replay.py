@@ -0,0 +1,107 @@
+# replay.py: stream pcap/pcapng files through the live pipeline for reproducible runs and benchmarks.
+import time
+from core.pcap_reader import open_capture, capture_files
+from core.header_parser import parse_frame
+from core.batch_decoder import FrameBatch, decode_batch
+from core.packet_sniffer import flow_handler, batch_handler
+
+def replay(path, flow_builder, signature_engine, alert_engine, speed=0, batch_size=0):
+    """
+    Feed every packet of `path` (a capture file or a directory of them) through
+    FlowBuilder -> SignatureEngine -> AlertEngine using the packet timestamps.
+    speed=0 replays as fast as possible; speed=N keeps the original inter-packet
+    gaps divided by N (1 = real time). Returns the summary statistics.
+    """
+    handle_flow = flow_handler(flow_builder, signature_engine, alert_engine)
+    handle_batch = batch_handler(flow_builder, signature_engine, alert_engine)
+    files = capture_files(path)
+    stats = {"files": len(files), "packets": 0, "ip_packets": 0, "first_ts": None, "last_ts": None}
+    started = time.perf_counter()
+
+    for file_path in files:
+        with open_capture(file_path) as reader:
+            batch = FrameBatch(capacity=batch_size, linktype=reader.linktype) if batch_size else None
+            for ts, frame, linktype in reader.records():
+                stats["packets"] += 1
+                if stats["first_ts"] is None:
+                    stats["first_ts"] = ts
+                stats["last_ts"] = ts
+                if speed:
+                    delay = (ts - stats["first_ts"]) / speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                if batch is None:
+                    flow = parse_frame(frame, ts, linktype)
+                    if flow:
+                        stats["ip_packets"] += 1
+                        handle_flow(flow)
+                    continue
+                batch.append(frame, ts)
+                if batch.full:
+                    stats["ip_packets"] += _replay_batch(batch, handle_batch)
+            if batch is not None and len(batch):
+                stats["ip_packets"] += _replay_batch(batch, handle_batch)
+
+    # Let the flow table catch up, then close every flow so the anomaly detector scores it.
+    flow_builder.drain()
+    flow_builder.close(expire_all=True)
+    alert_engine.close()
+    signature_engine.close()
+    stats["elapsed"] = time.perf_counter() - started
+    stats["flows"] = flow_builder.stats["flows_created"]
+    stats["flows_closed"] = flow_builder.stats["flows_closed"]
+    stats["queue"] = flow_builder.flow_queue.get_stats()
+    stats["signature_alerts"] = signature_engine.alerts_fired
+    stats["ml_anomalies"] = flow_builder.anomaly_detector.anomalies
+    stats["intel_alerts"] = alert_engine.alerts_raised
+    stats["enrichment"] = alert_engine.worker.get_stats()
+    stats["intel_cache"] = alert_engine.intel_cache.get_stats()
+    stats["intel_lookups"] = alert_engine.threat_intel.get_stats()
+    stats["ioc_feeds"] = alert_engine.feeds.get_stats()
+    stats["scans"] = alert_engine.scan_detector.get_stats()
+    return stats
+
+def _replay_batch(batch, handle_batch):
+    columns = decode_batch(batch)
+    handle_batch(columns)
+    batch.reset()
+    return len(columns["key"])
+
+def print_summary(stats):
+    elapsed = max(stats["elapsed"], 1e-9)
+    span = (stats["last_ts"] - stats["first_ts"]) if stats["first_ts"] is not None else 0.0
+    print("📼 Replay summary")
+    print(f"  capture files      : {stats['files']}")
+    print(f"  packets read       : {stats['packets']:,} ({stats['packets'] / elapsed:,.0f} pkt/s)")
+    print(f"  IP packets decoded : {stats['ip_packets']:,}")
+    print(f"  flows              : {stats['flows']:,} ({stats['flows'] / elapsed:,.0f} flows/s), "
+          f"{stats['flows_closed']:,} closed")
+    print(f"  flow queue         : {stats['queue']['dropped']:,} dropped, "
+          f"high water {stats['queue']['high_water']:,}/{stats['queue']['capacity']:,}")
+    print(f"  signature alerts   : {stats['signature_alerts']:,}")
+    print(f"  ML anomalies       : {stats['ml_anomalies']:,}")
+    print(f"  threat-intel alerts: {stats['intel_alerts']:,} "
+          f"({stats['enrichment']['enriched']:,} flows enriched, {stats['enrichment']['dropped']:,} dropped, "
+          f"{stats['enrichment']['suppressed']:,} suppressed)")
+    print(f"  intel lookups      : {stats['intel_lookups']['lookups']:,} "
+          f"({stats['intel_lookups']['flights']:,} run, {stats['intel_lookups']['coalesced']:,} coalesced, "
+          f"{stats['intel_lookups']['recent_hits']:,} recent)")
+    troubled = [f"{name} {provider['state']} ({provider['timeouts'] + provider['failures']:,} failed, "
+                f"{provider['short_circuited'] + provider['rate_limited']:,} skipped)"
+                for name, provider in stats["intel_lookups"]["providers"].items()
+                if provider["state"] != "closed" or provider["timeouts"] + provider["failures"]]
+    if troubled:
+        print("  intel providers    : " + ", ".join(troubled))
+    print(f"  intel cache        : {stats['intel_cache']['hit_rate']:.1%} hit rate "
+          f"({stats['intel_cache']['hits']:,} memory, {stats['intel_cache']['disk_hits']:,} disk, "
+          f"{stats['intel_cache']['misses']:,} misses, {stats['intel_cache']['evictions']:,} evicted)")
+    if stats["ioc_feeds"]["feeds"]:
+        print(f"  IOC feeds          : {stats['ioc_feeds']['feeds']:,} files, "
+              f"{stats['ioc_feeds']['addresses']:,} addresses, {stats['ioc_feeds']['networks']:,} networks, "
+              f"{stats['ioc_feeds']['hits']:,}/{stats['ioc_feeds']['lookups']:,} lookups listed")
+    print(f"  scans detected     : {stats['scans']['port_scans']:,} port scans, "
+          f"{stats['scans']['host_sweeps']:,} host sweeps")
+    if stats["scans"]["top_talkers"]:
+        print("  top talkers        : " + ", ".join(f"{ip} ({size:,} B)" for ip, size in stats["scans"]["top_talkers"]))
+    print(f"  elapsed            : {elapsed:.2f}s for {span:.2f}s of capture")
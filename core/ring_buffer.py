@@ -0,0 +1,100 @@
+# ring_buffer.py: bounded, preallocated queue between capture and analysis.
+import queue
+import threading
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest", "sample")
+
+class RingBuffer:
+    """
+    Fixed-capacity FIFO with an explicit overflow policy. Drop-in for the parts of
+    `queue.Queue` the pipeline uses (put/get/task_done/join/qsize).
+
+    Overflow policies:
+      block        put() waits for space (backpressure onto the capture thread)
+      drop_newest  the incoming item is discarded
+      drop_oldest  the oldest queued item is overwritten
+      sample       above `sample_threshold` of capacity only every `sample_every`-th
+                   item is admitted; when completely full the incoming item is discarded
+    """
+
+    def __init__(self, capacity=65536, policy="drop_newest", sample_threshold=0.5, sample_every=8):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}, expected one of {OVERFLOW_POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self.sample_mark = int(capacity * sample_threshold)
+        self.sample_every = sample_every
+        self.slots = [None] * capacity
+        self.head = 0       # next slot to read
+        self.size = 0
+        self.unfinished = 0
+        self.sample_tick = 0
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.all_done = threading.Condition(self.lock)
+        self.stats = {"enqueued": 0, "dropped": 0, "high_water": 0}
+
+    def qsize(self):
+        return self.size
+
+    def put(self, item, timeout=None):
+        """Queue `item`; returns False if the overflow policy discarded it."""
+        with self.lock:
+            if self.policy == "sample" and self.size >= self.sample_mark:
+                self.sample_tick += 1
+                if self.sample_tick % self.sample_every:
+                    self.stats["dropped"] += 1
+                    return False
+            if self.size >= self.capacity:
+                if self.policy == "block":
+                    if not self.not_full.wait_for(lambda: self.size < self.capacity, timeout):
+                        self.stats["dropped"] += 1
+                        return False
+                elif self.policy == "drop_oldest":
+                    self.slots[self.head] = None
+                    self.head = (self.head + 1) % self.capacity
+                    self.size -= 1
+                    self._finish(1)
+                    self.stats["dropped"] += 1
+                else:
+                    self.stats["dropped"] += 1
+                    return False
+
+            self.slots[(self.head + self.size) % self.capacity] = item
+            self.size += 1
+            self.unfinished += 1
+            self.stats["enqueued"] += 1
+            if self.size > self.stats["high_water"]:
+                self.stats["high_water"] = self.size
+            self.not_empty.notify()
+            return True
+
+    def get(self, timeout=None):
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: self.size, timeout):
+                raise queue.Empty
+            item = self.slots[self.head]
+            self.slots[self.head] = None
+            self.head = (self.head + 1) % self.capacity
+            self.size -= 1
+            self.not_full.notify()
+            return item
+
+    def _finish(self, count):
+        self.unfinished -= count
+        if self.unfinished <= 0:
+            self.unfinished = 0
+            self.all_done.notify_all()
+
+    def task_done(self):
+        with self.lock:
+            self._finish(1)
+
+    def join(self):
+        with self.lock:
+            self.all_done.wait_for(lambda: not self.unfinished)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, depth=self.size, capacity=self.capacity, policy=self.policy)
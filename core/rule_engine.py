@@ -1,32 +1,258 @@
-import yaml
+import os
+import sqlite3
 import time
 from collections import defaultdict
+import numpy as np
+from core.protocols import protocol_number
+from core.ip_trie import AddressFilters, read_ip_sets
+from core.rule_index import ANY, compile_conditions
+from core.rule_watcher import read_rules
+from dashboard.utils.alert_formatter import format_alert_payload
 
 rules = []
 rule_cache = defaultdict(list)
 
+# Columns understood by evaluate_batch; protocol, dst_port and packet_count are required.
+BATCH_COLUMNS = ("src_ip", "dst_ip", "protocol", "src_port", "dst_port", "packet_count", "total_size",
+                 "timestamp", "sample_rate")
+
 def load_rules(filepath="../rules/rules.yaml"):
     global rules
-    with open(filepath, 'r') as f:
-        loaded = yaml.safe_load(f)
-        if loaded is None:
-            loaded = []  # avoid None
-        rules = loaded
+    # Same parsing and defaults as the SignatureEngine, so both engines see identical rules.
+    rules = read_rules(filepath)
     return rules
 
+class RuleGroup:
+    """Rules that count the same packets over the same window (cf. rule_index.CounterGroup)."""
+
+    __slots__ = ("protocols", "ports", "protocol_set", "port_set", "src_filter", "dst_filter", "window", "rules")
+
+    def __init__(self, protocols, ports, src_filter, dst_filter, window):
+        self.protocol_set = None if protocols == (ANY,) else frozenset(protocols)
+        self.port_set = None if ports == (ANY,) else frozenset(ports)
+        self.protocols = None if self.protocol_set is None else np.array(protocols)
+        self.ports = None if self.port_set is None else np.array(ports)
+        self.src_filter = src_filter  # AddressFilters.compile() result or None
+        self.dst_filter = dst_filter
+        self.window = window
+        self.rules = []  # (position in the rules list, packet_threshold, rule)
+
+    def mask(self, proto, dst_port, net_mask):
+        """Boolean mask of the rows whose protocol, port and addresses satisfy the group."""
+        mask = np.ones(len(proto), dtype=bool) if self.protocols is None else np.isin(proto, self.protocols)
+        if self.ports is not None:
+            mask &= np.isin(dst_port, self.ports)
+        if self.src_filter:
+            mask &= net_mask("src_ip", self.src_filter)
+        if self.dst_filter:
+            mask &= net_mask("dst_ip", self.dst_filter)
+        return mask
+
+    def matches(self, proto, dst_port, src_ip, dst_ip, addresses):
+        """Scalar form of mask() for a single flow; `addresses` is the owning AddressFilters."""
+        if self.protocol_set is not None and proto not in self.protocol_set:
+            return False
+        if self.port_set is not None and dst_port not in self.port_set:
+            return False
+        if self.src_filter and not AddressFilters.accepts(self.src_filter, addresses.lookup(src_ip)):
+            return False
+        if self.dst_filter and not AddressFilters.accepts(self.dst_filter, addresses.lookup(dst_ip)):
+            return False
+        return True
+
+class BatchRules:
+    """
+    A rules list compiled for column-wise evaluation. Rules are grouped exactly like the
+    counter groups of RuleIndex, so every group costs one set of boolean masks per batch
+    however many rules (thresholds) share it.
+    """
+
+    def __init__(self, rules, ip_sets=None):
+        self.rules = rules
+        self.ip_sets = ip_sets or {}
+        self.groups = {}  # signature -> RuleGroup
+        self.errors = []
+        self.addresses = AddressFilters(self.ip_sets)
+        for position, rule in enumerate(rules):
+            try:
+                signature, src_filter, dst_filter, contents, protocols, ports = compile_conditions(rule, self.ip_sets)
+            except (ValueError, TypeError) as e:
+                self.errors.append(f"{rule.get('name', '<unnamed>')}: {e}")
+                continue
+            if contents or signature[-2]:
+                # Columns carry no payloads, and sketch conditions are streaming estimates:
+                # both only run on the live SignatureEngine.
+                continue
+            group = self.groups.get(signature)
+            if group is None:
+                group = self.groups[signature] = RuleGroup(protocols, ports, self.addresses.compile(src_filter),
+                                                           self.addresses.compile(dst_filter), signature[-1])
+            group.rules.append((position, (rule.get("conditions") or {}).get("packet_threshold", 0) or 0, rule))
+        self.addresses.build()
+
+_compiled = None
+ip_sets = {}
+
+def load_ip_sets(filepath="../rules/ip_sets.yaml"):
+    """Named IP sets for src_set / dst_set conditions; a missing file means no sets."""
+    global ip_sets
+    ip_sets = read_ip_sets(filepath) if os.path.exists(filepath) else {}
+    return ip_sets
+
+def compile_rules(rule_list=None):
+    """Compile `rule_list` (default: the loaded rules) for evaluate_batch; reused while the list is unchanged."""
+    global _compiled
+    rule_list = rules if rule_list is None else rule_list
+    if _compiled is None or _compiled.rules is not rule_list or _compiled.ip_sets is not ip_sets:
+        _compiled = BatchRules(rule_list, ip_sets)
+    return _compiled
+
+def _protocol_column(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values
+    # Stored flows carry protocol names ("TCP"); map each distinct value once.
+    names, inverse = np.unique(values.astype(str), return_inverse=True)
+    numbers = np.array([protocol_number(name) or -1 for name in names], dtype=np.int64)
+    return numbers[inverse.ravel()]
+
+def _address_masks(columns, addresses):
+    """net_mask(column, filter) for RuleGroup.mask; each distinct address is looked up in the trie once."""
+    cache = {}
+
+    def net_mask(name, compiled):
+        if name not in cache:
+            unique, inverse = np.unique(np.asarray(columns[name]).astype(str), return_inverse=True)
+            cache[name] = {"labels": ([addresses.lookup(ip) for ip in unique], inverse.ravel())}
+        if compiled not in cache[name]:
+            labels, inverse = cache[name]["labels"]
+            member = np.fromiter((AddressFilters.accepts(compiled, found) for found in labels), dtype=bool,
+                                 count=len(labels))
+            cache[name][compiled] = member[inverse]
+        return cache[name][compiled]
+    return net_mask
+
+def _window_order(columns, proto, timestamps):
+    """
+    Sort rows by (src_ip, dst_ip, protocol) and time, and return (order, sorted position key):
+    rows of one conversation are contiguous and ascending in time, and successive conversations
+    are spaced further apart than any window, so a searchsorted on the key never crosses them.
+    """
+    _, src = np.unique(np.asarray(columns["src_ip"]).astype(str), return_inverse=True)
+    _, dst = np.unique(np.asarray(columns["dst_ip"]).astype(str), return_inverse=True)
+    _, conversation = np.unique(np.stack([src.ravel(), dst.ravel(), proto]), axis=1, return_inverse=True)
+    conversation = conversation.ravel()
+    order = np.lexsort((timestamps, conversation))
+    offset = timestamps - timestamps.min()
+    return order, conversation[order], offset[order]
+
+def evaluate_batch(columns, rule_list=None):
+    """
+    Evaluate the signature rules over column arrays describing many flows at once (e.g. a
+    decoded capture batch, a replay or the stored `flows` table). `columns` maps the names in
+    BATCH_COLUMNS to equal-length sequences; protocol may be numbers or names.
+
+    With a `timestamp` column each row is counted like the live SignatureEngine counts packets:
+    against the sum of matching packets of the same (src_ip, dst_ip, protocol) within the rule's
+    `time_window` up to that row (src_ip and dst_ip are then required). Without timestamps every
+    row is judged on its own packet_count. Rules with `content` or sketch conditions are skipped
+    (no payloads; sketches are streaming). `rule_list` may be a rules list or a BatchRules.
+    Returns [(rule, row indices)] for every rule that fired, in rule order.
+    """
+    compiled = rule_list if isinstance(rule_list, BatchRules) else compile_rules(rule_list)
+    proto = _protocol_column(columns["protocol"])
+    n = len(proto)
+    if not n or not compiled.groups:
+        return []
+    dst_port = np.asarray(columns["dst_port"])
+    packets = np.asarray(columns["packet_count"], dtype=np.float64)
+    if columns.get("sample_rate") is not None:
+        packets = packets * np.asarray(columns["sample_rate"])  # each sampled flow stands for N flows
+    timestamps = columns.get("timestamp")
+    windows = None
+    if timestamps is not None:
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        order, conversation, offset = _window_order(columns, proto, timestamps)
+        spacing = offset.max() + max(group.window or 0 for group in compiled.groups.values()) + 1.0
+        position = conversation * spacing + offset
+        windows = {}  # time_window -> index of the first row inside each row's window
+    net_mask = _address_masks(columns, compiled.addresses)
+
+    fired = []
+    for group in compiled.groups.values():
+        mask = group.mask(proto, dst_port, net_mask)
+        if not mask.any():
+            continue
+        counts = np.where(mask, packets, 0.0)
+        if windows is not None:
+            window = group.window
+            if window not in windows:
+                windows[window] = np.searchsorted(position, position - max(window or 0, 1e-6), side="right")
+            running = np.concatenate(([0.0], np.cumsum(counts[order])))
+            in_window = np.empty(n)
+            in_window[order] = running[1:] - running[windows[window]]
+            counts = in_window
+        for position_in_rules, threshold, rule in group.rules:
+            rows = np.flatnonzero(mask & (counts >= threshold))
+            if len(rows):
+                fired.append((position_in_rules, rule, rows))
+    fired.sort(key=lambda item: item[0])
+    return [(rule, rows) for _, rule, rows in fired]
+
 def apply_rules(flow_key, flow_data):
+    """Rules firing for one flow; same compiled groups and semantics as evaluate_batch without timestamps."""
     alerts = []
     if not rules:
         print("⚠️ No rules loaded or empty rules list")
         return alerts
-    for rule in rules:
-        cond = rule['conditions']
-        if cond['protocol'] == 'TCP' and flow_key[4] == 6:  # IP proto 6 = TCP
-            if cond.get('packet_threshold') and flow_data['packet_count'] > cond['packet_threshold']:
-                alerts.append({
-                    "type": rule["name"],
-                    "description": rule["description"],
-                    "src_ip": flow_key[0],
-                    "dst_ip": flow_key[1]
-                })
+    # flow_key is the 5-tuple (src_ip, dst_ip, src_port, dst_port, proto number)
+    src_ip, dst_ip, _, dst_port, proto = flow_key
+    packets = flow_data['packet_count'] * flow_data.get('sample_rate', 1)
+    fired = []
+    compiled = compile_rules()
+    for group in compiled.groups.values():
+        if group.matches(protocol_number(proto), dst_port, src_ip, dst_ip, compiled.addresses):
+            fired.extend(item for item in group.rules if packets >= item[1])
+    for _, _, rule in sorted(fired, key=lambda item: item[0]):
+        alerts.append({
+            "type": rule["name"],
+            "description": rule["description"],
+            "src_ip": src_ip,
+            "dst_ip": dst_ip
+        })
+    return alerts
+
+def load_flow_columns(db_path="ids_data.db", since=None):
+    """Read the stored `flows` table (optionally only rows newer than `since`) into column arrays."""
+    query = ("SELECT src_ip, dst_ip, protocol, src_port, dst_port, packet_count, total_size, timestamp "
+             "FROM flows")
+    params = ()
+    if since is not None:
+        query += " WHERE timestamp >= ?"
+        params = (since,)
+    with sqlite3.connect(db_path, timeout=10) as conn:
+        rows = conn.execute(query + " ORDER BY id", params).fetchall()
+    names = ("src_ip", "dst_ip", "protocol", "src_port", "dst_port", "packet_count", "total_size", "timestamp")
+    if not rows:
+        return {name: np.zeros(0) for name in names}
+    values = list(zip(*rows))
+    columns = {name: np.array(column, dtype=object) for name, column in zip(names[:3], values[:3])}
+    columns.update({name: np.array(column, dtype=np.int64) for name, column in zip(names[3:7], values[3:7])})
+    columns["timestamp"] = np.array(values[7], dtype=np.float64)
+    return columns
+
+def rescore_flows(db_path="ids_data.db", rule_list=None, since=None):
+    """
+    Re-run the signature rules over every stored flow (e.g. after editing rules) and return the
+    alert payloads they would have produced. Nothing is written to the database.
+    """
+    columns = load_flow_columns(db_path, since)
+    fields = {name: columns[name].tolist() for name in ("src_ip", "dst_ip", "protocol", "src_port", "dst_port",
+                                                         "timestamp")}
+    alerts = []
+    for rule, rows in evaluate_batch(columns, rule_list):
+        for i in rows.tolist():
+            flow = {name: values[i] for name, values in fields.items()}
+            alerts.append(format_alert_payload(rule["name"], rule.get("description", ""), flow,
+                                               flow["timestamp"] or time.time(), rule.get("severity", "medium")))
     return alerts
@@ -0,0 +1,229 @@
+# rule_index.py: compile signature rules into dispatch tables at load time.
+# Rules are grouped by everything that decides which packets they count (protocol, destination
+# ports, source/destination CIDRs and IP sets, time window). Each group owns one set of sliding-window
+# counters shared by all its rules, and groups are indexed by (protocol, dst_port) so a packet
+# only touches the groups that can match it. `content` patterns of all groups share one
+# multi-pattern matcher, run at most once per packet and only if a candidate group needs it.
+# Sketch conditions (distinct destinations, byte volume, top talkers) replace the packet count
+# of their group with a fixed-memory streaming estimate from core.sketches. Address conditions of
+# all groups share one longest-prefix-match trie (core.ip_trie), looked up once per address.
+from time import perf_counter
+from core.protocols import protocol_number
+from core.sliding_window import WindowCounters
+from core.content_matcher import ContentMatcher, encode_pattern
+from core.ip_trie import AddressFilters, address_filter
+from core.sketches import DistinctCounters, VolumeCounters, TopTalkers, initiates
+
+# Conditions measured with a sketch instead of a packet count; a rule may use at most one.
+SKETCH_CONDITIONS = ("distinct_dst_ips", "distinct_dst_ports", "byte_threshold", "top_talkers")
+
+ANY = None  # wildcard slot in the dispatch table
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def compile_conditions(rule, ip_sets=None):
+    """
+    Parse a rule's conditions into (signature, src_filter, dst_filter, contents, protocols, ports);
+    the filters are ip_trie.address_filter() specs resolved against the named `ip_sets`.
+    Rules with equal signatures count exactly the same packets; raises ValueError/TypeError
+    for conditions that cannot be compiled. Shared with the batch evaluator in rule_engine.
+    """
+    conditions = rule.get("conditions") or {}
+    protocols = {protocol_number(p) for p in _as_list(conditions.get("protocol")) if p}
+    if None in protocols:
+        raise ValueError(f"unknown protocol {conditions.get('protocol')!r}")
+    protocols = tuple(sorted(protocols)) or (ANY,)
+    ports = tuple(sorted({int(p) for p in _as_list(conditions.get("dst_port"))})) or (ANY,)
+    src_filter = address_filter(conditions, "src", ip_sets or {})
+    dst_filter = address_filter(conditions, "dst", ip_sets or {})
+    patterns = tuple(sorted({encode_pattern(p) for p in _as_list(conditions.get("content"))}))
+    if b"" in patterns:
+        raise ValueError("empty content pattern")
+    contents = (patterns, bool(conditions.get("content_nocase"))) if patterns else None
+    measures = [name for name in SKETCH_CONDITIONS if conditions.get(name) is not None]
+    if len(measures) > 1:
+        raise ValueError(f"only one of {', '.join(measures)} per rule")
+    measure = None
+    if measures:
+        # (condition, error bound or None for the sketch default, top_talkers' N)
+        measure = (measures[0], conditions.get("sketch_error"),
+                   int(conditions["top_talkers"]) if measures[0] == "top_talkers" else None)
+    signature = (protocols, ports, src_filter, dst_filter, contents, measure, conditions.get("time_window", 60))
+    return signature, src_filter, dst_filter, contents, protocols, ports
+
+def rule_key(rule):
+    """Stable identity of a rule for statistics: its rule_id, else its name."""
+    return rule.get("rule_id") or rule.get("name", "<unnamed>")
+
+def rule_threshold(rule):
+    """The value a rule's group count is compared with: its sketch condition, else packet_threshold."""
+    conditions = rule.get("conditions") or {}
+    for name in SKETCH_CONDITIONS:
+        if conditions.get(name) is not None:
+            return 1 if name == "top_talkers" else conditions[name]
+    return conditions.get("packet_threshold", 0) or 0
+
+def make_counters(signature, window_buckets=10):
+    """Counter set of a group: sliding packet windows, or the sketch its measure asks for."""
+    measure, window = signature[-2], signature[-1]
+    if measure is None:
+        return WindowCounters(window, window_buckets)
+    name, error = measure[0], measure[1]
+    kwargs = {"error": float(error)} if error else {}
+    if name in ("distinct_dst_ips", "distinct_dst_ports"):
+        return DistinctCounters(window, **kwargs)
+    if name == "byte_threshold":
+        return VolumeCounters(window, **kwargs)
+    return TopTalkers(window, **kwargs)
+
+class CounterGroup:
+    """Rules that count exactly the same packets over the same window share one counter set."""
+
+    __slots__ = ("number", "signature", "src_filter", "dst_filter", "contents", "measure", "counters", "stats",
+                 "rules")
+
+    def __init__(self, number, signature, src_filter, dst_filter, contents, counters, stats=None):
+        self.number = number      # position in RuleIndex.groups; the content matcher reports these
+        self.signature = signature
+        self.src_filter = src_filter  # AddressFilters.compile() result or None
+        self.dst_filter = dst_filter
+        self.contents = contents  # (patterns, nocase) or None; only packets containing one are counted
+        self.measure = signature[-2]  # sketch condition or None for a packet count
+        self.counters = counters
+        # [evaluations, matches, seconds spent evaluating]; shared by the group's rules
+        self.stats = stats if stats is not None else [0, 0, 0.0]
+        self.rules = []  # (threshold, rule), ascending by threshold
+
+    def matches(self, src_labels, dst_labels):
+        """Address filters against the trie labels of the packet's source and destination."""
+        if self.src_filter and not AddressFilters.accepts(self.src_filter, src_labels):
+            return False
+        if self.dst_filter and not AddressFilters.accepts(self.dst_filter, dst_labels):
+            return False
+        return True
+
+    def sketch_count(self, flow_key, timestamp, size, tcp_flags):
+        """The group's sketch estimate after counting this packet; None if the packet does not count."""
+        name = self.measure[0]
+        src_ip, dst_ip, _, dst_port, proto = flow_key
+        if name == "distinct_dst_ips":
+            return self.counters.add(src_ip, dst_ip, timestamp) if initiates(flow_key, tcp_flags) else None
+        if name == "distinct_dst_ports":
+            return self.counters.add((src_ip, dst_ip), dst_port, timestamp) if initiates(flow_key, tcp_flags) else None
+        if name == "byte_threshold":
+            return self.counters.add((src_ip, dst_ip, proto), timestamp, size)
+        return int(self.counters.in_top(self.counters.add(src_ip, timestamp, size), self.measure[2]))
+
+class RuleIndex:
+    """
+    Compiled form of a rules list. Supported conditions: protocol, dst_port (int or list),
+    src_cidr / dst_cidr (CIDR string or list), src_set / dst_set and src_not_set / dst_not_set
+    (names of `ip_sets`, see ip_trie.read_ip_sets), content (string or list; content_nocase for
+    case-insensitive matching), packet_threshold and time_window. Instead of packet_threshold a
+    rule may use one sketch condition: distinct_dst_ips (hosts a source opened connections to),
+    distinct_dst_ports (ports of one host a source probed), byte_threshold (bytes per src/dst/proto)
+    or top_talkers (N: the source is among the N heaviest by bytes); sketch_error sets the bound.
+    `previous` is the index being replaced; groups that did not change keep their counts and stats.
+    Every group records how often it was evaluated, how often a packet matched it and the time
+    spent (see rule_stats).
+    """
+
+    def __init__(self, rules, window_buckets=10, previous=None, ip_sets=None):
+        self.rules = rules
+        self.ip_sets = ip_sets or {}
+        self.window_buckets = window_buckets
+        self.groups = []
+        self.table = {}       # (proto, dst_port), either may be ANY -> [CounterGroup]
+        self.candidates = {}  # memoized per (proto, dst_port) lookups
+        self.errors = []
+        self.matcher = ContentMatcher()
+        # Every CIDR and IP-set condition in one longest-prefix-match trie.
+        self.addresses = AddressFilters(self.ip_sets)
+        carried = {group.signature: group for group in previous.groups} if previous else {}
+        groups = {}
+        for rule in rules:
+            try:
+                signature, src_filter, dst_filter, contents, protocols, ports = compile_conditions(rule, self.ip_sets)
+            except (ValueError, TypeError) as e:
+                self.errors.append(f"{rule.get('name', '<unnamed>')}: {e}")
+                continue
+            group = groups.get(signature)
+            if group is None:
+                kept = carried.get(signature)
+                counters = kept.counters if kept is not None else make_counters(signature, window_buckets)
+                group = CounterGroup(len(self.groups), signature, self.addresses.compile(src_filter),
+                                     self.addresses.compile(dst_filter), contents, counters,
+                                     kept.stats if kept is not None else None)
+                groups[signature] = group
+                if contents:
+                    for pattern in contents[0]:
+                        self.matcher.add(pattern, group.number, nocase=contents[1])
+                self.groups.append(group)
+                for proto in protocols:
+                    for port in ports:
+                        self.table.setdefault((proto, port), []).append(group)
+            group.rules.append((rule_threshold(rule), rule))
+        for group in self.groups:
+            group.rules.sort(key=lambda item: item[0])
+        self.matcher.build()
+        self.addresses.build()
+
+    def lookup(self, proto, dst_port):
+        """Counter groups whose protocol and port conditions accept this packet."""
+        key = (proto, dst_port)
+        groups = self.candidates.get(key)
+        if groups is None:
+            groups = []
+            for slot in ((proto, dst_port), (proto, ANY), (ANY, dst_port), (ANY, ANY)):
+                groups.extend(self.table.get(slot, ()))
+            if len(self.candidates) < 65536:
+                self.candidates[key] = groups
+        return groups
+
+    def match(self, flow_key, timestamp, packets=1, payload=None, size=0, tcp_flags=None):
+        """
+        Count the packets against every matching group; yields the rules over threshold.
+        Content groups only match when `payload` is given (per-packet paths, not batches).
+        `size` (bytes) and `tcp_flags` feed the sketch conditions.
+        """
+        src_ip, dst_ip, _, dst_port, proto = flow_key
+        window_key = (src_ip, dst_ip, proto)
+        found = labels = None
+        clock = perf_counter
+        for group in self.lookup(proto, dst_port):
+            started = clock()
+            count = None
+            if group.src_filter or group.dst_filter:
+                if labels is None:
+                    labels = self.addresses.lookup(src_ip), self.addresses.lookup(dst_ip)
+                address_ok = group.matches(*labels)
+            else:
+                address_ok = True
+            if address_ok:
+                if group.contents and found is None:
+                    found = self.matcher.search(payload) if payload else ()
+                if not group.contents or group.number in found:
+                    if group.measure is None:
+                        count = group.counters.add(window_key, timestamp, packets)
+                    else:
+                        count = group.sketch_count(flow_key, timestamp, size, tcp_flags)
+            stats = group.stats
+            stats[0] += 1
+            stats[2] += clock() - started
+            if count is None:
+                continue
+            stats[1] += 1
+            for threshold, rule in group.rules:
+                if count < threshold:
+                    break
+                yield rule
+
+    def rule_stats(self):
+        """(rule, evaluations, matches, seconds) per compiled rule; rules sharing a group share its figures."""
+        return [(rule, *group.stats) for group in self.groups for _, rule in group.rules]
+
+    def __len__(self):
+        return len(self.rules)
@@ -0,0 +1,91 @@
+# rule_watcher.py: reload signature rules in the background when rules.yaml (or ip_sets.yaml) changes.
+# The file is polled with os.stat (mtime, inode, size), so nothing is parsed unless it changed;
+# parsing, validation and index compilation all happen on the watcher thread.
+import logging
+import os
+import threading
+import yaml
+from dashboard.utils.rule_defaults import apply_rule_defaults
+
+def read_rules(path):
+    """Parse and validate a rules file; raises ValueError for anything that is not a rule list."""
+    with open(path, "r") as f:
+        try:
+            rules = yaml.safe_load(f) or []
+        except yaml.YAMLError as e:
+            raise ValueError(f"YAML error: {e}")
+    if not isinstance(rules, list):
+        raise ValueError("expected a list of rules")
+    # Same defaults as the dashboard's repair_signature_rules, without rewriting the file. A
+    # mistyped rule is skipped on its own, like RuleIndex skips uncompilable ones.
+    valid = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            continue
+        try:
+            valid.append(apply_rule_defaults(rule, assign_id=False))
+        except ValueError as e:
+            logging.error(f"❌ Skipping invalid rule in {path}: {e}")
+    return valid
+
+class RuleWatcher:
+    """
+    Calls `on_change(rules)` from a daemon thread whenever the rules file changes. `reader`
+    parses the file (read_rules by default; ip_trie.read_ip_sets for the IP sets file) and must
+    raise ValueError for invalid content; `kind` names what is reloaded in log messages.
+    """
+
+    def __init__(self, path, on_change, interval=2.0, reader=read_rules, kind="rules"):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.reader = reader
+        self.kind = kind
+        self.fingerprint = self._fingerprint()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="rule-watcher", daemon=True)
+
+    def _fingerprint(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_ino, st.st_size
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Anything check() did not anticipate (a reader or on_change bug) must not end hot reload.
+                self.fingerprint = self._fingerprint()
+                logging.exception(f"❌ Reloading {self.kind} from {self.path} failed; keeping the active {self.kind}: {e}")
+
+    def check(self):
+        """Reload if the file changed since the last check; returns True if rules were swapped."""
+        fingerprint = self._fingerprint()
+        if fingerprint == self.fingerprint:
+            return False
+        if fingerprint is None:
+            self.fingerprint = None
+            logging.warning(f"⚠️ {self.kind.capitalize()} file {self.path} disappeared; keeping the active {self.kind}.")
+            return False
+        try:
+            rules = self.reader(self.path)
+        except (OSError, ValueError) as e:
+            self.fingerprint = fingerprint
+            logging.error(f"❌ Ignoring invalid {self.kind} file {self.path}: {e}")
+            return False
+        if self._fingerprint() != fingerprint:
+            return False  # still being written; pick it up on the next poll
+        self.fingerprint = fingerprint
+        self.on_change(rules)
+        logging.info(f"🔁 Reloaded {len(rules)} {self.kind} from {self.path}")
+        return True
+
+    def stop(self):
+        self.stop_event.set()
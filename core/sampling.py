@@ -0,0 +1,83 @@
+# sampling.py: deterministic flow sampling that kicks in when analysis falls behind.
+# Whole flows are kept or dropped (1-in-N by a symmetric flow hash), so the counters of every
+# kept flow stay exact; totals and rule thresholds are scaled by N by the consumers.
+import logging
+import time
+import numpy as np
+from core.protocols import symmetric_flow_hash
+
+class AdaptiveSampler:
+    """
+    Tracks load on the analysis stages and picks the sampling rate N (a power of two,
+    1 = full rate). `flow_queue` is the FlowBuilder ring buffer whose depth is watched;
+    processing latency is fed in through `observe()`.
+    """
+
+    def __init__(self, flow_queue, max_rate=64, high_water=0.5, low_water=0.1,
+                 latency_target=0.002, adjust_interval=0.5):
+        self.flow_queue = flow_queue
+        self.max_rate = max_rate
+        self.high_water = high_water        # queue fill ratio that doubles N
+        self.low_water = low_water          # queue fill ratio below which N is halved
+        self.latency_target = latency_target  # seconds per packet/batch the pipeline may take
+        self.adjust_interval = adjust_interval
+        self.rate = 1
+        self.latency = 0.0                  # EWMA of the observed processing time
+        self.next_adjust = time.monotonic() + adjust_interval
+        self.stats = {"seen": 0, "kept": 0, "rate_changes": 0}
+
+    def observe(self, elapsed):
+        self.latency += 0.1 * (elapsed - self.latency)
+        now = time.monotonic()
+        if now >= self.next_adjust:
+            self.next_adjust = now + self.adjust_interval
+            self._adjust()
+
+    def _adjust(self):
+        fill = self.flow_queue.qsize() / self.flow_queue.capacity
+        rate = self.rate
+        if fill >= self.high_water or self.latency > self.latency_target:
+            rate = min(rate * 2, self.max_rate)
+        elif fill <= self.low_water and self.latency <= self.latency_target / 2:
+            rate = max(rate // 2, 1)
+        if rate != self.rate:
+            logging.warning(f"⚖️ Sampling rate 1/{self.rate} -> 1/{rate} "
+                            f"(queue {fill:.0%}, latency {self.latency * 1000:.2f} ms)")
+            self.rate = rate
+            self.stats["rate_changes"] += 1
+
+    def keep(self, flow_key):
+        """True if the flow is analysed at the current rate; both directions agree."""
+        self.stats["seen"] += 1
+        if self.rate == 1:
+            self.stats["kept"] += 1
+            return True
+        # High bits: the shard of a flow is picked from the low bits of the same hash.
+        keep = not (symmetric_flow_hash(flow_key) >> 16) % self.rate
+        self.stats["kept"] += keep
+        return keep
+
+    def sample_flow(self, flow):
+        """Return the flow tagged with its sampling rate, or None if it is sampled out."""
+        if not self.keep(flow["flow_key"]):
+            return None
+        flow["sample_rate"] = self.rate
+        return flow
+
+    def sample_batch(self, flows):
+        """Drop the sampled-out flows from `batch_decoder.aggregate_flows` columns."""
+        rate = self.rate
+        if rate == 1:
+            self.stats["seen"] += len(flows["flow_keys"])
+            self.stats["kept"] += len(flows["flow_keys"])
+            flows["sample_rate"] = 1
+            return flows
+        mask = np.fromiter((self.keep(key) for key in flows["flow_keys"]), dtype=bool,
+                           count=len(flows["flow_keys"]))
+        sampled = {name: column[mask] for name, column in flows.items() if name != "flow_keys"}
+        sampled["flow_keys"] = [key for key, kept in zip(flows["flow_keys"], mask) if kept]
+        sampled["sample_rate"] = rate
+        return sampled
+
+    def get_stats(self):
+        return dict(self.stats, rate=self.rate, latency_ms=self.latency * 1000)
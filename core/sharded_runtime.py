@@ -0,0 +1,237 @@
+# sharded_runtime.py: spread packet analysis over K worker processes, sharded by flow.
+#
+# Every packet of a flow (in both directions) is handled by the same worker, so each
+# worker can own a private FlowBuilder / SignatureEngine without any cross-process state.
+# Two ways of getting packets to the workers:
+#   fanout   - each worker opens its own AF_PACKET socket in one PACKET_FANOUT group and the
+#              kernel splits traffic by its (symmetric) flow hash; no dispatcher process.
+#   dispatch - the parent captures (raw or scapy), hashes each symmetric 5-tuple and ships
+#              flows to the owning worker over a multiprocessing queue in small batches.
+# Signature alerts from all workers are merged into one alert sink in the parent process.
+import logging
+import multiprocessing as mp
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.protocols import symmetric_flow_hash
+from core.signature_engine import alert_label, record_alert
+
+SHARD_MODES = ("fanout", "dispatch")
+
+def shard_for(flow_key, workers):
+    return symmetric_flow_hash(flow_key) % workers
+
+def _init_worker_process():
+    # Let the parent decide when workers stop; SIGTERM unwinds through the finally blocks.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+def _counted(handler, counters, shard, size=lambda item: 1):
+    def handle(item):
+        handler(item)
+        counters[shard] += size(item)
+    return handle
+
+def _worker_main(shard, mode, inbox, alert_queue, counters, engine_factory, capture_opts):
+    from core.packet_sniffer import flow_handler, batch_handler, sniff_raw, sniff_raw_batched
+    from core.sampling import AdaptiveSampler
+
+    _init_worker_process()
+    flow_builder, signature_engine, alert_engine = engine_factory(alert_sink=alert_queue.put)
+    sampler = None
+    if capture_opts.get("max_sample_rate"):
+        sampler = AdaptiveSampler(flow_builder.flow_queue, max_rate=capture_opts["max_sample_rate"])
+    try:
+        if mode == "fanout":
+            if capture_opts.get("batch_size"):
+                sniff_raw_batched(
+                    _counted(batch_handler(flow_builder, signature_engine, alert_engine, sampler),
+                             counters, shard, size=lambda columns: len(columns["key"])),
+                    iface=capture_opts.get("iface"), batch_size=capture_opts["batch_size"],
+                    fanout_group=capture_opts["fanout_group"])
+            else:
+                sniff_raw(_counted(flow_handler(flow_builder, signature_engine, alert_engine, sampler),
+                                   counters, shard),
+                          iface=capture_opts.get("iface"), fanout_group=capture_opts["fanout_group"])
+        else:
+            handle_flow = flow_handler(flow_builder, signature_engine, alert_engine, sampler)
+            while True:
+                flows = inbox.get()
+                if flows is None:
+                    break
+                for flow in flows:
+                    handle_flow(flow)
+                counters[shard] += len(flows)
+    finally:
+        flow_builder.close()
+        alert_engine.close()
+        signature_engine.close()
+
+class AlertSink:
+    """Parent-side consumer that stores and notifies the signature alerts of every shard."""
+
+    def __init__(self, alert_queue, db_path="ids_data.db"):
+        self.alert_queue = alert_queue
+        self.db_path = db_path
+        self.alerts = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        while True:
+            alert_payload = self.alert_queue.get()
+            if alert_payload is None:
+                break
+            try:
+                # Shards send signature, scan and threat-intel alerts through the same queue.
+                record_alert(conn, alert_payload, alert_label(alert_payload["type"]))
+                self.alerts += 1
+            except Exception as e:
+                logging.error(f"❌ Failed to record shard alert: {e}")
+        conn.close()
+
+    def close(self):
+        self.alert_queue.put(None)
+        self.thread.join(timeout=5)
+
+class Dispatcher:
+    """Buffers flows per shard and ships them to the workers in small batches."""
+
+    def __init__(self, inboxes, batch=256, max_delay=0.05):
+        self.inboxes = inboxes
+        self.workers = len(inboxes)
+        self.batch = batch
+        self.max_delay = max_delay
+        self.buffers = [[] for _ in inboxes]
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def __call__(self, flow):
+        shard = shard_for(flow["flow_key"], self.workers)
+        if flow.get("payload") is not None:
+            flow["payload"] = bytes(flow["payload"])  # the capture buffer is reused; ship a copy
+        with self.lock:
+            buffer = self.buffers[shard]
+            buffer.append(flow)
+            if len(buffer) >= self.batch:
+                self.inboxes[shard].put(buffer)
+                self.buffers[shard] = []
+
+    def flush(self):
+        with self.lock:
+            for shard, buffer in enumerate(self.buffers):
+                if buffer:
+                    self.inboxes[shard].put(buffer)
+                    self.buffers[shard] = []
+
+    def _flush_periodically(self):
+        while not self.stop_event.wait(self.max_delay):
+            self.flush()
+
+    def close(self):
+        self.stop_event.set()
+        self.flush()
+
+class ShardedRuntime:
+    """
+    Run the capture pipeline in `workers` processes. `engine_factory(alert_sink=...)` must be a
+    picklable top-level function returning (flow_builder, signature_engine, alert_engine); it is
+    called inside each worker so every shard owns its own state.
+    """
+
+    def __init__(self, engine_factory, workers, mode="fanout", backend="raw", iface=None,
+                 batch_size=0, db_path="ids_data.db", stats_interval=10, max_sample_rate=0):
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode {mode!r}, expected one of {SHARD_MODES}")
+        if mode == "fanout" and backend != "raw":
+            raise ValueError("fanout sharding needs the raw capture backend")
+        self.engine_factory = engine_factory
+        self.workers = workers
+        self.mode = mode
+        self.backend = backend
+        self.iface = iface
+        self.batch_size = batch_size
+        self.max_sample_rate = max_sample_rate  # 0 disables adaptive sampling in the workers
+        self.stats_interval = stats_interval
+        self.counters = mp.RawArray("Q", workers)  # packets handled per shard, single writer each
+        self.alert_queue = mp.Queue()
+        self.alert_sink = AlertSink(self.alert_queue, db_path=db_path)
+        self.inboxes = [mp.Queue(maxsize=1024) for _ in range(workers)] if mode == "dispatch" else [None] * workers
+        self.processes = []
+        self.stop_event = threading.Event()
+
+    def start(self):
+        capture_opts = {"iface": self.iface, "batch_size": self.batch_size, "fanout_group": os.getpid() & 0xFFFF,
+                        "max_sample_rate": self.max_sample_rate}
+        for shard in range(self.workers):
+            proc = mp.Process(
+                target=_worker_main,
+                args=(shard, self.mode, self.inboxes[shard], self.alert_queue, self.counters,
+                      self.engine_factory, capture_opts),
+                name=f"ids-shard-{shard}",
+                daemon=True,
+            )
+            proc.start()
+            self.processes.append(proc)
+        threading.Thread(target=self._report_stats, daemon=True).start()
+        logging.info(f"🧩 Started {self.workers} {self.mode} workers")
+
+    def shard_stats(self):
+        return list(self.counters)
+
+    def _report_stats(self):
+        previous = self.shard_stats()
+        last = time.time()
+        while not self.stop_event.wait(self.stats_interval):
+            current, now = self.shard_stats(), time.time()
+            rates = [(c - p) / (now - last) for c, p in zip(current, previous)]
+            logging.info("📊 Shard throughput (pkt/s): " + ", ".join(
+                f"#{i} {rate:,.0f} ({total:,} total)" for i, (rate, total) in enumerate(zip(rates, current))))
+            previous, last = current, now
+
+    def run(self):
+        """Start the workers and block until capture ends or the user interrupts."""
+        self.start()
+        try:
+            if self.mode == "fanout":
+                for proc in self.processes:
+                    proc.join()
+            else:
+                self._dispatch()
+        finally:
+            self.stop()
+
+    def _dispatch(self):
+        from core.packet_sniffer import packet_handler_for, sniff_raw
+        dispatcher = Dispatcher(self.inboxes)
+        try:
+            if self.backend == "raw":
+                sniff_raw(dispatcher, iface=self.iface)
+            else:
+                from scapy.all import sniff
+                sniff(prn=packet_handler_for(dispatcher), store=0, filter="ip", iface=self.iface)
+        finally:
+            dispatcher.close()
+
+    def stop(self):
+        self.stop_event.set()
+        for inbox, proc in zip(self.inboxes, self.processes):
+            if inbox is not None:
+                inbox.put(None)
+            else:
+                proc.terminate()  # fanout workers block in recv; SIGTERM lets them flush and exit
+        for proc in self.processes:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=5)
+        self.alert_sink.close()
+        logging.info(f"🧩 Shard totals: {self.shard_stats()}, alerts merged: {self.alert_sink.alerts}")
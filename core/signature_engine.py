@@ -1,90 +1,268 @@
-import yaml, os, sqlite3, time , sys
+import os, sqlite3, threading, time , sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from core.alerting import send_api_alert, send_email_alert, send_slack_alert
+from core.alert_outbox import enqueue_notifications, prepare_outbox
+from core.protocols import protocol_name
+from core.ip_trie import read_ip_sets
+from core.rule_index import RuleIndex, rule_key
+from core.rule_watcher import RuleWatcher, read_rules
+from core.alert_suppression import AlertSuppressor
 from dashboard.utils.alert_formatter import format_alert_payload
-  
+
+# Notification title per alert type raised outside the signature engine (alert_engine / enrichment).
+ALERT_LABELS = {"THREAT_INTEL_MATCH": "Threat Intel Alert", "PORT_SCAN": "Scan Alert", "HOST_SWEEP": "Scan Alert"}
+
+def alert_label(alert_type):
+    """Label of an alert type in notifications; anything else is a signature rule's alert."""
+    return ALERT_LABELS.get(alert_type, "Signature Alert")
+
+def record_alert(conn, alert_payload, label="Signature Alert"):
+    """Store an alert in the `alerts` table and queue its notifications, titled `label`, in the outbox."""
+    conn.execute('''INSERT INTO alerts (type, description, source_ip, destination_ip, protocol, timestamp, severity)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                 (alert_payload['type'], alert_payload['description'], alert_payload['src_ip'],
+                  alert_payload['dst_ip'], alert_payload['protocol'], alert_payload['timestamp'],
+                  alert_payload['severity']))
+    # Delivery happens on the outbox dispatcher thread, never on the capture path.
+    enqueue_notifications(conn, f"{label}: {alert_payload['type']}", str(alert_payload),
+                          payload=alert_payload, slack_text=f"[{label}] {alert_payload}")
+    conn.commit()
+    print(f"✅ {label} Triggered: {alert_payload}")
+
+def prepare_alerts(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT,
+        description TEXT,
+        source_ip TEXT,
+        destination_ip TEXT,
+        protocol TEXT,
+        timestamp REAL,
+        severity TEXT
+    )''')
+
+def prepare_rule_stats(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS rule_stats (
+        rule_key TEXT PRIMARY KEY,
+        name TEXT,
+        evaluations INTEGER DEFAULT 0,
+        matches INTEGER DEFAULT 0,
+        alerts INTEGER DEFAULT 0,
+        suppressed INTEGER DEFAULT 0,
+        eval_time REAL DEFAULT 0,
+        updated REAL
+    )''')
+
 class SignatureEngine:
-    def __init__(self, db_path="ids_data.db", rules_path="../rules/rules.yaml", reload_interval=30):
+    def __init__(self, db_path="ids_data.db", rules_path="../rules/rules.yaml", reload_interval=2, alert_sink=None,
+                 suppress_window=60, stats_interval=30, ip_sets_path="../rules/ip_sets.yaml"):
         self.db_path = db_path
         self.rules_path = rules_path
-        self.reload_interval = reload_interval
-        self.last_reload_time = 0
+        self.ip_sets_path = ip_sets_path  # named prefix lists for src_set / dst_set conditions
+        self.reload_interval = reload_interval  # seconds between checks of the rules file for changes
+        self.stats_interval = stats_interval    # seconds between writes of per-rule stats to `rule_stats`
+        self.alerts_fired = 0
+        self.rule_alerts = {}  # rule key -> [alerts emitted, alerts suppressed]
+        self.persisted = {}    # rule key -> figures already added to `rule_stats`
+        # Repeats of a (rule, src, dst) alert within the hold-down are folded into one summary;
+        # a rule can override the period with its own `suppress_window`.
+        self.suppressor = AlertSuppressor(hold_down=suppress_window)
+        self.window_buckets = 10
+        self.index = None  # active RuleIndex, replaced wholesale on reload
+        self.swap_lock = threading.RLock()  # rules and IP sets reload on separate watcher threads
+        self.ip_sets = self.load_ip_sets()
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Where fired alerts go; sharded workers pass a queue's put() to merge alerts in one process.
+        self.alert_sink = alert_sink or (lambda alert_payload: record_alert(self.conn, alert_payload))
         self._init_db()
-        self.rules = self.load_rules()
+        self.swap_rules(self.load_rules())
+        self.watcher = RuleWatcher(rules_path, self.swap_rules, interval=reload_interval).start()
+        self.ip_sets_watcher = RuleWatcher(ip_sets_path, self.swap_ip_sets, interval=reload_interval,
+                                           reader=read_ip_sets, kind="IP sets").start()
+        self.stats_stop = threading.Event()
+        self.stats_thread = threading.Thread(target=self._persist_stats_loop, name="rule-stats", daemon=True)
+        self.stats_thread.start()
 
     def _init_db(self):
-        self.conn.execute('''CREATE TABLE IF NOT EXISTS alerts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT,
-            description TEXT,
-            source_ip TEXT,
-            destination_ip TEXT,
-            protocol TEXT,
-            timestamp REAL,
-            severity TEXT
-        )''')
-        self.conn.execute('''CREATE TABLE IF NOT EXISTS flows (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            src_ip TEXT,
-            dst_ip TEXT,
-            protocol TEXT,
-            timestamp REAL
-        )''')
+        prepare_alerts(self.conn)
+        prepare_outbox(self.conn)
+        prepare_rule_stats(self.conn)
+        self.conn.commit()
 
     def load_rules(self):
         if os.path.exists(self.rules_path):
-            with open(self.rules_path, 'r') as f:
-                try:
-                    return yaml.safe_load(f) or []
-                except yaml.YAMLError as e:
-                    print("Error parsing rules:", e)
+            try:
+                return read_rules(self.rules_path)
+            except ValueError as e:
+                print("Error parsing rules:", e)
         return []
 
-    def maybe_reload_rules(self):
-        if time.time() - self.last_reload_time > self.reload_interval:
-            self.rules = self.load_rules()
-            self.last_reload_time = time.time()
+    def load_ip_sets(self):
+        if os.path.exists(self.ip_sets_path):
+            try:
+                return read_ip_sets(self.ip_sets_path)
+            except ValueError as e:
+                print("Error parsing IP sets:", e)
+        return {}
 
-    def check_rules(self, flow):
-        self.maybe_reload_rules()
-        timestamp = time.time()
+    @property
+    def rules(self):
+        return self.index.rules
 
-        self.conn.execute('INSERT INTO flows (src_ip, dst_ip, protocol, timestamp) VALUES (?, ?, ?, ?)',
-                          (flow['src_ip'], flow['dst_ip'], flow['protocol'], timestamp))
-        self.conn.commit()
+    def swap_rules(self, rules):
+        """
+        Compile `rules` and make them active with a single attribute assignment, so the packet
+        path never sees a half-built index. Counter groups that survive the change keep their counts.
+        """
+        with self.swap_lock:
+            index = RuleIndex(rules, window_buckets=self.window_buckets, previous=self.index, ip_sets=self.ip_sets)
+            for error in index.errors:
+                print("Skipping invalid rule:", error)
+            self.index = index
 
-        for rule in self.rules:
-            conditions = rule.get("conditions", {})
-            proto = conditions.get("protocol")
-            threshold = conditions.get("packet_threshold", 0)
-            time_window = conditions.get("time_window", 60)           
+    def swap_ip_sets(self, ip_sets):
+        """Recompile the active rules against new IP sets; groups whose conditions are unchanged keep their counts."""
+        with self.swap_lock:
+            self.ip_sets = ip_sets
+            self.swap_rules(self.index.rules)
 
-            if proto and flow["protocol"] != proto:
-                continue
+    def check_rules(self, flow, payload=None):
+        """Match one packet; `payload` (L4 payload bytes) enables `content` rules."""
+        timestamp = flow.get('timestamp') or time.time()
+        self._match_rules(flow, timestamp, payload=payload)
+        self._emit_summaries(self.suppressor.expire(timestamp))
 
-            cursor = self.conn.execute('''
-                SELECT COUNT(*) FROM flows 
-                WHERE src_ip=? AND dst_ip=? AND protocol=? AND timestamp > ?
-            ''', (flow['src_ip'], flow['dst_ip'], flow['protocol'], timestamp - time_window))
-            count = cursor.fetchone()[0]
+    def check_batch(self, flows):
+        """
+        Batch variant of check_rules over the per-flow columns of `batch_decoder.aggregate_flows`.
+        Batches carry no payloads, so `content` rules only fire on the per-packet paths.
+        """
+        sample_rate = flows.get("sample_rate", 1)
+        match = self.index.match
+        for key, count, size, tcp_flags, last_seen in zip(flows["flow_keys"], flows["packet_count"].tolist(),
+                                                          flows["total_size"].tolist(), flows["tcp_flags"].tolist(),
+                                                          flows["last_seen"].tolist()):
+            # The columns go to the index as they are; a flow dict is only built for a rule that fires.
+            for rule in match(key, last_seen, count * sample_rate, size=size * sample_rate, tcp_flags=tcp_flags):
+                self.generate_alert(rule, self._batch_flow(key, tcp_flags, last_seen, sample_rate))
+        if flows["flow_keys"]:
+            self._emit_summaries(self.suppressor.expire(float(flows["last_seen"].max())))
 
-            if count >= threshold:
-                self.generate_alert(rule, flow)
+    @staticmethod
+    def _batch_flow(key, tcp_flags, last_seen, sample_rate):
+        src_ip, dst_ip, src_port, dst_port, proto = key
+        return {
+            'flow_key': key,
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'protocol': protocol_name(proto),
+            'tcp_flags': tcp_flags,
+            'timestamp': last_seen,
+            'sample_rate': sample_rate,
+        }
+
+    def _match_rules(self, flow, timestamp, packets=1, payload=None, size=None):
+        # Under capture sampling each seen packet stands for `sample_rate` packets.
+        sample_rate = flow.get('sample_rate', 1)
+        size = flow.get('packet_size', 0) if size is None else size
+        for rule in self.index.match(flow['flow_key'], timestamp, packets * sample_rate, payload,
+                                     size=size * sample_rate, tcp_flags=flow.get('tcp_flags')):
+            self.generate_alert(rule, flow)
+
+    def _rule_alerts(self, rule):
+        key = rule_key(rule)
+        counts = self.rule_alerts.get(key)
+        if counts is None:
+            counts = self.rule_alerts[key] = [0, 0]
+        return counts
 
     def generate_alert(self, rule, flow):
-        timestamp = time.time() 
+        timestamp = flow.get('timestamp') or time.time()
+        counts = self._rule_alerts(rule)
+        if self.suppressor.suppress((rule['name'], flow['src_ip'], flow['dst_ip']), timestamp,
+                                    (rule, flow), rule.get("suppress_window")):
+            counts[1] += 1
+            return
+        counts[0] += 1
+        self.alerts_fired += 1
         severity = rule.get("severity", "medium")     
         alert_payload = format_alert_payload(rule['name'], rule['description'], flow, timestamp ,severity)
+        self.alert_sink(alert_payload)
 
-        self.conn.execute('''INSERT INTO alerts (type, description, source_ip, destination_ip, protocol, timestamp, severity)
-                             VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                          (alert_payload['type'], alert_payload['description'], alert_payload['src_ip'],
-                           alert_payload['dst_ip'], alert_payload['protocol'], alert_payload['timestamp'],
-                           alert_payload['severity']))
-        self.conn.commit()
-        print(f"✅ Signature Alert Triggered: {alert_payload}")
-        # Enable ...........................
-        send_api_alert(alert_payload)
-        send_slack_alert(f"[Signature Alert] {alert_payload}")
-        send_email_alert(f"Signature Alert: {alert_payload['type']}", str(alert_payload))
+    def _emit_summaries(self, summaries):
+        for _, firings, span, (rule, flow) in summaries:
+            self.alerts_fired += 1
+            self._rule_alerts(rule)[0] += 1
+            description = f"{rule['description']} (fired {firings:,} times in {span:.0f}s)"
+            alert_payload = format_alert_payload(rule['name'], description, flow,
+                                                 flow.get('timestamp') or time.time(), rule.get("severity", "medium"))
+            alert_payload["occurrences"] = firings
+            self.alert_sink(alert_payload)
+
+    def get_rule_stats(self):
+        """
+        Per-rule evaluations (packets that reached the rule's protocol/port slot), matches (packets
+        counted towards it), alerts emitted and suppressed, and evaluation time since start-up.
+        Rules with identical match conditions are evaluated together and report the same cost.
+        """
+        stats = []
+        for rule, evaluations, matches, seconds in self.index.rule_stats():
+            alerts, suppressed = self.rule_alerts.get(rule_key(rule), (0, 0))
+            stats.append({
+                "rule_key": rule_key(rule),
+                "name": rule.get("name"),
+                "evaluations": evaluations,
+                "matches": matches,
+                "alerts": alerts,
+                "suppressed": suppressed,
+                "eval_time_ms": seconds * 1000,
+                "avg_eval_us": seconds * 1e6 / evaluations if evaluations else 0.0,
+            })
+        return stats
+
+    def persist_stats(self, conn):
+        """Add what changed since the last call to `rule_stats`; totals there span restarts and workers."""
+        rows, seen, now = [], set(), time.time()
+        for item in self.get_rule_stats():
+            if item["rule_key"] in seen:
+                continue  # unnamed duplicates share one row
+            seen.add(item["rule_key"])
+            figures = (item["evaluations"], item["matches"], item["alerts"], item["suppressed"],
+                       item["eval_time_ms"] / 1000)
+            before = self.persisted.get(item["rule_key"], (0,) * len(figures))
+            # A reloaded rule whose conditions changed starts counting from zero again.
+            delta = tuple(value - old if value >= old else value for value, old in zip(figures, before))
+            self.persisted[item["rule_key"]] = figures
+            if any(delta):
+                rows.append((item["rule_key"], item["name"], *delta, now))
+        if rows:
+            conn.executemany('''INSERT INTO rule_stats (rule_key, name, evaluations, matches, alerts, suppressed,
+                                                       eval_time, updated)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                  ON CONFLICT(rule_key) DO UPDATE SET
+                                      name=excluded.name,
+                                      evaluations=evaluations + excluded.evaluations,
+                                      matches=matches + excluded.matches,
+                                      alerts=alerts + excluded.alerts,
+                                      suppressed=suppressed + excluded.suppressed,
+                                      eval_time=eval_time + excluded.eval_time,
+                                      updated=excluded.updated''', rows)
+            conn.commit()
+
+    def _persist_stats_loop(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        while not self.stats_stop.wait(self.stats_interval):
+            try:
+                self.persist_stats(conn)
+            except sqlite3.Error as e:
+                print("Failed to save rule stats:", e)
+        self.persist_stats(conn)
+        conn.close()
+
+    def close(self):
+        self.watcher.stop()
+        self.ip_sets_watcher.stop()
+        self._emit_summaries(self.suppressor.expire_all())
+        self.stats_stop.set()
+        self.stats_thread.join(timeout=10)
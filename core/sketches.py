@@ -0,0 +1,336 @@
+# sketches.py: fixed-memory streaming summaries for scan and heavy-hitter detection.
+# HyperLogLog estimates distinct counts (destinations per source), Count-Min estimates per-key
+# volume and Space-Saving keeps the top talkers. Each is sized from an error bound instead of
+# from the number of hosts seen. The windowed wrappers split a window into two half-window
+# generations, so a value always covers between half and all of the last `window` seconds.
+import heapq
+import math
+from collections import OrderedDict
+from core.protocols import IPPROTO_TCP, IPPROTO_UDP, TCP_SYN, TCP_ACK
+
+DISTINCT_ERROR = 0.05   # relative standard error of HyperLogLog estimates (512 one-byte registers)
+VOLUME_ERROR = 0.001    # Count-Min overestimates by at most this fraction of the window's total volume...
+VOLUME_CONFIDENCE = 0.99  # ...with this probability
+TOP_ERROR = 0.001       # Space-Saving counts are off by at most this fraction of the window's total
+MAX_KEYS = 4096         # most keys (sources, conversations) a DistinctCounters tracks at once
+
+_MASK64 = (1 << 64) - 1
+
+def hash64(item):
+    """64-bit hash of any hashable: a splitmix64 finaliser over Python's hash (stable within a process)."""
+    z = (hash(item) + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+def initiates(flow_key, tcp_flags=None):
+    """
+    Whether a packet looks like the start of a conversation (what a scan sends): a TCP SYN
+    without ACK, or UDP towards a lower port than it came from. Replies of busy servers to
+    many clients and ephemeral ports therefore do not count as scanning. Other protocols
+    (ICMP) and packets of unknown flags always count.
+    """
+    proto = flow_key[4]
+    if proto == IPPROTO_TCP and tcp_flags is not None:
+        return tcp_flags & (TCP_SYN | TCP_ACK) == TCP_SYN
+    if proto == IPPROTO_UDP:
+        return flow_key[3] < flow_key[2]
+    return True
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**p one-byte registers; the estimate is kept current on every add."""
+
+    __slots__ = ("p", "registers", "inverse_sum", "zeros")
+
+    def __init__(self, p):
+        self.p = p
+        self.registers = bytearray(1 << p)
+        self.inverse_sum = float(1 << p)  # sum of 2**-register, maintained incrementally
+        self.zeros = 1 << p
+
+    @staticmethod
+    def precision(error):
+        """Register bits needed for a relative standard error of `error` (1.04 / sqrt(m))."""
+        return min(16, max(4, math.ceil(math.log2((1.04 / error) ** 2))))
+
+    def add_hash(self, h):
+        p = self.p
+        index = h >> (64 - p)
+        rank = 65 - p - (h & ((1 << (64 - p)) - 1)).bit_length()  # leading zeros of the rest, plus one
+        old = self.registers[index]
+        if rank > old:
+            self.registers[index] = rank
+            self.inverse_sum += 2.0 ** -rank - 2.0 ** -old
+            if not old:
+                self.zeros -= 1
+
+    def add(self, item):
+        self.add_hash(hash64(item))
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / self.inverse_sum
+        if raw <= 2.5 * m and self.zeros:
+            return m * math.log(m / self.zeros)  # linear counting for small cardinalities
+        return raw
+
+    def copy(self):
+        clone = HyperLogLog.__new__(HyperLogLog)
+        clone.p, clone.registers = self.p, bytearray(self.registers)
+        clone.inverse_sum, clone.zeros = self.inverse_sum, self.zeros
+        return clone
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+class CountMinSketch:
+    """Per-key volume in depth x width counters; estimates never undercount."""
+
+    def __init__(self, error=VOLUME_ERROR, confidence=VOLUME_CONFIDENCE):
+        self.width = math.ceil(math.e / error)
+        self.depth = math.ceil(math.log(1 / (1 - confidence)))
+        self.rows = [[0] * self.width for _ in range(self.depth)]
+        self.total = 0
+
+    def cells(self, item):
+        """Counter index of `item` in every row; sketches of equal size share them."""
+        h = hash64(item)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [(h1 + i * h2) % width for i in range(self.depth)]
+
+    def add(self, item, amount=1, cells=None):
+        """Count `amount` for `item` and return its new estimate."""
+        estimate = None
+        for row, cell in zip(self.rows, cells or self.cells(item)):
+            value = row[cell] = row[cell] + amount
+            if estimate is None or value < estimate:
+                estimate = value
+        self.total += amount
+        return estimate
+
+    def estimate(self, item, cells=None):
+        if not self.total:
+            return 0
+        return min([row[cell] for row, cell in zip(self.rows, cells or self.cells(item))])
+
+    def clear(self):
+        for row in self.rows:
+            row[:] = [0] * self.width
+        self.total = 0
+
+class SpaceSaving:
+    """
+    Top-k heavy hitters in ceil(1 / error) counters. A new key replaces the smallest counter and
+    inherits its count, so counts overestimate by at most error x total.
+    """
+
+    def __init__(self, error=TOP_ERROR):
+        self.capacity = math.ceil(1 / error)
+        self.counts = {}  # key -> [count, overestimate]
+        self.heap = []    # (count, sequence, key); stale entries are skipped lazily
+        self.sequence = 0
+        self.total = 0
+
+    def add(self, key, amount=1):
+        """Count `amount` for `key` and return its (over)estimated count."""
+        entry = self.counts.get(key)
+        if entry is None:
+            floor = 0
+            if len(self.counts) >= self.capacity:
+                victim, floor = self._pop_min()
+                del self.counts[victim]
+            entry = self.counts[key] = [floor, floor]
+        entry[0] += amount
+        self.total += amount
+        self.sequence += 1
+        heapq.heappush(self.heap, (entry[0], self.sequence, key))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, 0, key) for key, (count, _) in self.counts.items()]
+            heapq.heapify(self.heap)
+        return entry[0]
+
+    def _pop_min(self):
+        while True:
+            count, _, key = heapq.heappop(self.heap)
+            entry = self.counts.get(key)
+            if entry is not None and entry[0] == count:
+                return key, count
+
+    def top(self, n):
+        """The `n` heaviest keys as (key, count, overestimate), heaviest first."""
+        return [(key, count, over) for key, (count, over)
+                in heapq.nlargest(n, self.counts.items(), key=lambda item: item[1][0])]
+
+    def clear(self):
+        self.counts.clear()
+        self.heap.clear()
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+class _Generations:
+    """Half-window generation clock shared by the windowed sketches."""
+
+    def __init__(self, window):
+        self.window = window
+        self.length = max(window, 1e-6) / 2
+        self.generation = None
+
+    def advance(self, timestamp):
+        """Returns 0 within the current generation, 1 when the next one starts and 2 after a gap."""
+        generation = int(timestamp // self.length)
+        if self.generation is None:
+            self.generation = generation
+            return 0
+        if generation <= self.generation:
+            return 0  # late packets count towards the current generation
+        step = 1 if generation == self.generation + 1 else 2
+        self.generation = generation
+        return step
+
+class DistinctCounters:
+    """
+    Distinct items per key over a sliding window, one HyperLogLog per key and generation.
+    At most `capacity` keys are tracked; when full, the least recently seen key is dropped, so a
+    key that keeps sending (a scanner) stays tracked however many one-off keys pass through.
+    """
+
+    def __init__(self, window, error=DISTINCT_ERROR, capacity=MAX_KEYS):
+        self.clock = _Generations(window)
+        self.p = HyperLogLog.precision(error)
+        self.capacity = capacity
+        self.current = {}  # key -> HyperLogLog of this generation
+        self.union = OrderedDict()  # key -> HyperLogLog of this and the previous generation
+        self.evicted = 0
+
+    def add(self, key, item, timestamp):
+        """Count `item` for `key` at `timestamp`; returns the estimated distinct items in the window."""
+        step = self.clock.advance(timestamp)
+        if step:
+            # The generation that just ended becomes the base of the new window.
+            self.union = OrderedDict((k, hll.copy()) for k, hll in self.current.items()) if step == 1 else OrderedDict()
+            self.current = {}
+        union = self.union.get(key)
+        if union is None:
+            if len(self.union) >= self.capacity:
+                victim, _ = self.union.popitem(last=False)
+                self.current.pop(victim, None)
+                self.evicted += 1
+            union = self.union[key] = HyperLogLog(self.p)
+        else:
+            self.union.move_to_end(key)
+        current = self.current.get(key)
+        if current is None:
+            current = self.current[key] = HyperLogLog(self.p)
+        h = hash64(item)
+        current.add_hash(h)
+        union.add_hash(h)
+        return union.estimate()
+
+    def __len__(self):
+        return len(self.union)
+
+class VolumeCounters:
+    """Volume per key over a sliding window in two Count-Min sketches (constant memory)."""
+
+    def __init__(self, window, error=VOLUME_ERROR, confidence=VOLUME_CONFIDENCE):
+        self.clock = _Generations(window)
+        self.current = CountMinSketch(error, confidence)
+        self.previous = CountMinSketch(error, confidence)
+
+    def add(self, key, timestamp, amount):
+        """Count `amount` for `key` at `timestamp`; returns the estimated volume in the window."""
+        step = self.clock.advance(timestamp)
+        if step:
+            self.previous, self.current = self.current, self.previous
+            self.current.clear()
+            if step == 2:
+                self.previous.clear()
+        cells = self.current.cells(key)
+        return self.current.add(key, amount, cells) + self.previous.estimate(key, cells)
+
+class TopTalkers:
+    """Space-Saving heavy hitters over tumbling windows of `window` seconds."""
+
+    def __init__(self, window, error=TOP_ERROR, refresh=256):
+        self.window = max(window, 1e-6)
+        self.summary = SpaceSaving(error)
+        self.epoch = None
+        self.last_top = []    # top talkers of the previous window, for reporting
+        self.refresh = refresh  # updates between recomputations of the top-n cut-offs
+        self.updates = 0
+        self.cutoffs = {}     # n -> smallest count that is still in the top n
+
+    def add(self, key, timestamp, amount):
+        """Count `amount` for `key`; returns its estimated volume in the current window."""
+        epoch = int(timestamp // self.window)
+        if epoch != self.epoch:
+            if self.epoch is not None and epoch > self.epoch:
+                self.last_top = self.summary.top(10)
+                self.summary.clear()
+                self.cutoffs.clear()
+            self.epoch = epoch if self.epoch is None else max(epoch, self.epoch)
+        self.updates += 1
+        return self.summary.add(key, amount)
+
+    def in_top(self, count, n):
+        """Whether a key with `count` is among the `n` heaviest of the current window."""
+        if self.updates >= self.refresh or n not in self.cutoffs:
+            self.updates = 0
+            for size in set(self.cutoffs) | {n}:
+                top = self.summary.top(size)
+                self.cutoffs[size] = top[-1][1] if len(top) >= size else 0
+        return count >= self.cutoffs[n]
+
+    def top(self, n=10):
+        return self.summary.top(n)
+
+class ScanDetector:
+    """
+    Port scans (one source, many destination ports of one host) and host sweeps (one source,
+    many destination hosts) from HyperLogLog distinct counts, plus top talkers by bytes.
+    Each scanner is reported once per window.
+    """
+
+    def __init__(self, window=60, port_threshold=100, host_threshold=100, error=DISTINCT_ERROR,
+                 capacity=MAX_KEYS):
+        self.window = window
+        self.port_threshold = port_threshold
+        self.host_threshold = host_threshold
+        self.ports = DistinctCounters(window, error, capacity)  # (src, dst) -> distinct dst ports
+        self.hosts = DistinctCounters(window, error, capacity)  # src -> distinct dst hosts
+        self.talkers = TopTalkers(window)
+        self.reported = {}  # (kind, key) -> time of the last report
+        self.stats = {"port_scans": 0, "host_sweeps": 0}
+
+    def observe(self, flow_key, timestamp, size=0, tcp_flags=None):
+        """Account one packet or flow; returns (type, description) the first time a scan crosses its threshold."""
+        src_ip, dst_ip, _, dst_port, _ = flow_key
+        if size:
+            self.talkers.add(src_ip, timestamp, size)
+        if not initiates(flow_key, tcp_flags):
+            return None
+        ports = self.ports.add((src_ip, dst_ip), dst_port, timestamp)
+        hosts = self.hosts.add(src_ip, dst_ip, timestamp)
+        if ports >= self.port_threshold and self._first(("PORT_SCAN", src_ip, dst_ip), timestamp):
+            self.stats["port_scans"] += 1
+            return "PORT_SCAN", f"Port scan from {src_ip}: ~{ports:.0f} ports of {dst_ip} in {self.window}s"
+        if hosts >= self.host_threshold and self._first(("HOST_SWEEP", src_ip), timestamp):
+            self.stats["host_sweeps"] += 1
+            return "HOST_SWEEP", f"Host sweep from {src_ip}: ~{hosts:.0f} hosts in {self.window}s"
+        return None
+
+    def _first(self, key, timestamp):
+        last = self.reported.get(key)
+        if last is not None and timestamp - last < self.window:
+            return False
+        if len(self.reported) >= MAX_KEYS:
+            self.reported = {k: t for k, t in self.reported.items() if timestamp - t < self.window}
+        self.reported[key] = timestamp
+        return True
+
+    def get_stats(self):
+        return dict(self.stats, tracked_sources=len(self.hosts),
+                    top_talkers=[(key, count) for key, count, _ in self.talkers.top(5)])
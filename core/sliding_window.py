@@ -0,0 +1,68 @@
+# sliding_window.py: in-memory time-bucketed counters for rule windows.
+# A window of `window` seconds is split into `buckets` slots; each key keeps a small ring of
+# slot counts plus their running total, so adding and reading a count is O(1) and expired
+# slots are zeroed lazily as time moves forward.
+
+class WindowCounter:
+    """Packet count of one key over the last `window` seconds, at `window / buckets` resolution."""
+
+    __slots__ = ("slots", "total", "head")
+
+    def __init__(self, buckets):
+        self.slots = [0] * buckets
+        self.total = 0
+        self.head = None  # absolute index of the newest bucket
+
+    def add(self, bucket, amount):
+        """Count `amount` in absolute bucket `bucket` and return the windowed total."""
+        slots = self.slots
+        n = len(slots)
+        if self.head is None:
+            self.head = bucket
+        elif bucket > self.head:
+            # Zero every slot that fell out of the window while the key was idle.
+            if bucket - self.head >= n:
+                slots[:] = [0] * n
+                self.total = 0
+            else:
+                for b in range(self.head + 1, bucket + 1):
+                    i = b % n
+                    self.total -= slots[i]
+                    slots[i] = 0
+            self.head = bucket
+        elif bucket <= self.head - n:
+            return self.total  # older than the window (reordered packet); nothing to count
+        slots[bucket % n] += amount
+        self.total += amount
+        return self.total
+
+class WindowCounters:
+    """Sliding-window counters for many keys sharing one window length."""
+
+    def __init__(self, window, buckets=10):
+        self.window = window
+        self.buckets = buckets
+        self.width = max(window, 1e-6) / buckets
+        self.counters = {}
+        self.last_sweep = None
+
+    def add(self, key, timestamp, amount=1):
+        """Count `amount` packets for `key` at `timestamp`; returns the count over the window."""
+        bucket = int(timestamp // self.width)
+        if self.last_sweep is None:
+            self.last_sweep = bucket
+        elif bucket - self.last_sweep >= self.buckets:
+            self._sweep(bucket)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = WindowCounter(self.buckets)
+        return counter.add(bucket, amount)
+
+    def _sweep(self, bucket):
+        """Forget keys that saw nothing for a whole window, so idle keys do not pile up."""
+        self.last_sweep = bucket
+        oldest = bucket - self.buckets
+        self.counters = {key: counter for key, counter in self.counters.items() if counter.head > oldest}
+
+    def __len__(self):
+        return len(self.counters)
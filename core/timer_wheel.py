@@ -0,0 +1,78 @@
+import math
+import time
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel.
+
+    Level 0 has `slots` buckets of one tick each, level 1 has `slots` buckets of
+    `slots` ticks each, and so on. Scheduling is O(1); advancing pops one level-0
+    bucket per tick and occasionally cascades a higher-level bucket down, so the
+    cost per tick does not depend on how many timers are pending.
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=4, start=None):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.max_delta = slots ** levels - 1
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.current = int((time.time() if start is None else start) / tick)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _place(self, expire, item):
+        delta = expire - self.current
+        if delta < 0:
+            expire, delta = self.current, 0
+        # Timers beyond the wheel's range park in the top level and are re-placed on cascade.
+        slot_tick = self.current + self.max_delta if delta > self.max_delta else expire
+        level = 0
+        while level < self.levels - 1 and delta >= self.slots ** (level + 1):
+            level += 1
+        idx = (slot_tick >> (self.bits * level)) & self.mask
+        self.wheels[level][idx].append((expire, item))
+
+    def schedule(self, item, when):
+        """Fire `item` once the wheel has advanced past time `when`."""
+        expire = math.ceil(when / self.tick)
+        if not self.size and expire <= self.current:
+            # An empty wheel can re-anchor, e.g. when replaying a capture from the past.
+            self.current = expire - 1
+        expire = max(expire, self.current + 1)
+        self._place(expire, item)
+        self.size += 1
+
+    def _cascade(self, level):
+        idx = (self.current >> (self.bits * level)) & self.mask
+        bucket = self.wheels[level][idx]
+        self.wheels[level][idx] = []
+        for expire, item in bucket:
+            self._place(expire, item)
+
+    def advance(self, now=None):
+        """Move the wheel forward to `now` and return the items that expired."""
+        target = int((time.time() if now is None else now) / self.tick)
+        expired = []
+        while self.current < target:
+            self.current += 1
+            level = 1
+            while level < self.levels and self.current & ((1 << (self.bits * level)) - 1) == 0:
+                self._cascade(level)
+                level += 1
+            idx = self.current & self.mask
+            bucket = self.wheels[0][idx]
+            if bucket:
+                self.wheels[0][idx] = []
+                expired.extend(item for _, item in bucket)
+            if self.size == len(expired):
+                # Nothing pending: jump straight to the target tick.
+                self.current = target
+        self.size -= len(expired)
+        return expired
@@ -0,0 +1,189 @@
+# intel_cache.py: two-tier cache for threat-intel provider answers, keyed by (provider, indicator).
+# Tier 1 is a bounded in-process LRU; tier 2 is the `intel_cache` SQLite table, which survives
+# restarts and is shared by the sensor and the dashboard. Each provider has its own TTL, and
+# "nothing known" answers get a shorter one so a host that turns bad is noticed sooner.
+# get() and put() never touch SQLite, since they run on the enrichment event loop: on a memory
+# miss the caller reads the table through load() off the loop (ThreatIntel uses an executor), so
+# answers another process stored are picked up, and new answers are written behind by a flush
+# thread every `flush_interval` seconds, in one transaction.
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# provider -> (TTL of a positive answer, TTL of a negative answer), in seconds
+DEFAULT_TTLS = {
+    "abuseipdb": (6 * 3600, 3600),
+    "otx": (6 * 3600, 3600),
+    "misp": (3600, 900),            # our own instance; new events should show up quickly
+    "geoip": (7 * 86400, 3600),     # locations barely move
+    "whois": (86400, 3600),
+    "virustotal": (86400, 3600),
+}
+FALLBACK_TTL = (3600, 900)
+
+MISSING = object()  # get() result when nothing valid is cached (None is a cacheable answer)
+
+def prepare_intel_cache(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS intel_cache (
+        provider TEXT,
+        indicator TEXT,
+        value TEXT,
+        negative INTEGER,
+        expires REAL,
+        PRIMARY KEY (provider, indicator)
+    )''')
+
+class EnrichmentCache:
+    """
+    get(provider, indicator) returns the answer cached in memory or MISSING; load() looks the
+    table up (blocking) on a memory miss; put() stores a fresh answer. `db_path=None` keeps
+    tier 1 only. Safe to share between threads and event loops.
+    """
+    MISSING = MISSING
+
+    def __init__(self, db_path="ids_data.db", max_entries=100000, ttls=None, flush_interval=2.0):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.entries = OrderedDict()  # (provider, indicator) -> (expires, value, negative), least recent first
+        self.dirty = {}  # (provider, indicator) -> row not yet written to the table
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()  # the connection is used by load() callers and the flush thread
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "negative_hits": 0, "stored": 0,
+                      "evictions": 0, "expired": 0, "flushes": 0, "flush_failures": 0}
+        self.flush_interval = flush_interval
+        self.conn = None
+        self.stop_event = threading.Event()
+        self.flush_thread = None
+        if db_path is not None:
+            self.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL;")
+            prepare_intel_cache(self.conn)
+            self.conn.execute("DELETE FROM intel_cache WHERE expires < ?", (time.time(),))
+            self.conn.commit()
+            self.flush_thread = threading.Thread(target=self._flush_loop, name="intel-cache-flush", daemon=True)
+            self.flush_thread.start()
+
+    @property
+    def persistent(self):
+        return self.conn is not None
+
+    def ttl(self, provider, negative):
+        positive_ttl, negative_ttl = self.ttls.get(provider, FALLBACK_TTL)
+        return negative_ttl if negative else positive_ttl
+
+    def get(self, provider, indicator):
+        """The answer cached in memory, or MISSING; never blocks on the table."""
+        key = (provider, indicator)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["negative_hits"] += entry[2]
+                    return entry[1]
+                del self.entries[key]
+                self.stats["expired"] += 1
+            if self.conn is None:
+                self.stats["misses"] += 1  # with a table, load() decides between a disk hit and a miss
+            return MISSING
+
+    def load(self, provider, indicator):
+        """
+        Read-through to the table after a memory miss: the answer stored by this or another
+        process (the sensor or the dashboard), or MISSING. Blocks on SQLite; call it off the loop.
+        """
+        key = (provider, indicator)
+        with self.lock:
+            pending = self.dirty.get(key)  # evicted from memory before it was flushed
+            if pending is not None:
+                self.stats["hits"] += 1
+                return pending[2]
+        row = None
+        if self.conn is not None:
+            try:
+                with self.db_lock:
+                    row = self.conn.execute("SELECT value, negative, expires FROM intel_cache "
+                                            "WHERE provider = ? AND indicator = ?", key).fetchone()
+            except sqlite3.Error as e:
+                logging.warning(f"⚠️ Intel cache read failed: {e}")
+        with self.lock:
+            if row is None or row[2] <= time.time():
+                self.stats["misses"] += 1
+                return MISSING
+            value = json.loads(row[0])
+            self._remember(key, row[2], value, row[1])
+            self.stats["disk_hits"] += 1
+            self.stats["negative_hits"] += row[1]
+            return value
+
+    def put(self, provider, indicator, value, negative=False):
+        """Cache a provider answer; `negative` ("nothing known") answers expire sooner."""
+        key = (provider, indicator)
+        expires = time.time() + self.ttl(provider, negative)
+        with self.lock:
+            self._remember(key, expires, value, int(negative))
+            self.stats["stored"] += 1
+            if self.conn is not None:
+                self.dirty[key] = (provider, indicator, value, int(negative), expires)
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write the answers stored since the last flush in one transaction; kept for the next try on failure."""
+        with self.lock:
+            if self.conn is None or not self.dirty:
+                return True
+            batch, self.dirty = self.dirty, {}
+        try:
+            with self.db_lock:
+                self.conn.executemany("INSERT OR REPLACE INTO intel_cache (provider, indicator, value, negative, "
+                                      "expires) VALUES (?, ?, ?, ?, ?)",
+                                      [(provider, indicator, json.dumps(value, default=str), negative, expires)
+                                       for provider, indicator, value, negative, expires in batch.values()])
+                self.conn.commit()
+        except sqlite3.Error as e:
+            with self.db_lock:
+                try:
+                    self.conn.rollback()
+                except sqlite3.Error:
+                    pass
+            with self.lock:
+                # Answers stored since the batch was taken are newer; keep those.
+                self.dirty = {**batch, **self.dirty}
+                self.stats["flush_failures"] += 1
+            logging.warning(f"⚠️ Intel cache flush of {len(batch)} answers failed ({e}); retrying next flush.")
+            return False
+        with self.lock:
+            self.stats["flushes"] += 1
+        return True
+
+    def _remember(self, key, expires, value, negative):
+        self.entries[key] = (expires, value, negative)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hit_rate = (self.stats["hits"] + self.stats["disk_hits"]) / lookups if lookups else 0.0
+            return dict(self.stats, entries=len(self.entries), pending=len(self.dirty), hit_rate=round(hit_rate, 4))
+
+    def close(self):
+        """Stop the flush thread, write what is left and close the table."""
+        self.stop_event.set()
+        if self.flush_thread is not None:
+            self.flush_thread.join(timeout=5)
+        self.flush()
+        with self.lock, self.db_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
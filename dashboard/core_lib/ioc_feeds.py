@@ -0,0 +1,254 @@
+# ioc_feeds.py: offline IOC feeds for local reputation lookups without a network call.
+# Every file in the feeds directory (CSV, JSON/STIX exports from AbuseIPDB, OTX or MISP, or plain
+# text lists) is loaded into one IOCIndex: exact IPv4 addresses in a sorted integer array (binary
+# search, 8 bytes per address where a dict costs ~100), IPv6 addresses in a dict, CIDRs in the
+# longest-prefix-match trie of core.ip_trie. A feed named after a provider (abuseipdb*, otx*,
+# misp*) stands in for that provider's live lookups: an address it does not list counts as clean.
+# The directory is polled and the index rebuilt and swapped in whole when a file changes.
+import array
+import bisect
+import csv
+import json
+import logging
+import os
+import re
+from core.ip_trie import PrefixTrie, ip_to_int, parse_prefix
+from core.rule_watcher import RuleWatcher
+
+# Verdict of a listed address per provider feed, the same tags and scores as the live lookups.
+PROVIDER_VERDICTS = {
+    "abuseipdb": (("abuseipdb_high",), 40),
+    "otx": (("otx_malicious",), 30),
+    "misp": (("misp_malicious",), 30),
+}
+FEED_SCORE = 30            # score of an address in any other feed (tag: ioc_<feed name>)
+ABUSEIPDB_MIN_SCORE = 50   # AbuseIPDB rows need a confidence above this, as in the live lookup
+FEED_EXTENSIONS = (".csv", ".json", ".txt", ".lst", ".netset")
+
+IP_KEYS = ("ipAddress", "ip", "ip_address", "indicator", "value", "address", "cidr", "network")
+SCORE_KEYS = ("abuseConfidenceScore", "confidence", "score")
+IP_TYPES = {"ip", "ipv4", "ipv6", "cidr", "ip-src", "ip-dst", "ip-src|port", "ip-dst|port", "ipv4-addr",
+            "ipv6-addr", "ipaddress"}
+STIX_ADDRESS = re.compile(r"ipv[46]-addr:value\s*=\s*'([^']+)'")
+
+def feed_provider(path):
+    """Provider a feed file stands in for, from its name (abuseipdb_blacklist.csv -> "abuseipdb"), or None."""
+    name = os.path.basename(path).lower()
+    return next((provider for provider in PROVIDER_VERDICTS if name.startswith(provider)), None)
+
+def _score(row):
+    for key in SCORE_KEYS:
+        try:
+            return float(row[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+def _indicator(text):
+    """(version, network, prefix length) of an address/CIDR, tolerating MISP "ip|port" values; None if not one."""
+    try:
+        return parse_prefix(str(text).split("|", 1)[0])
+    except ValueError:
+        return None
+
+def _walk_json(node, out):
+    """Collect (prefix, score) from AbuseIPDB/OTX/MISP JSON exports and STIX 2 bundles."""
+    if isinstance(node, list):
+        for item in node:
+            _walk_json(item, out)
+        return
+    if not isinstance(node, dict):
+        return
+    if isinstance(node.get("pattern"), str):
+        for value in STIX_ADDRESS.findall(node["pattern"]):
+            out.append((_indicator(value), _score(node)))
+    kind = str(node.get("type", "")).lower()
+    if not kind or kind in IP_TYPES:
+        value = next((node[key] for key in IP_KEYS if isinstance(node.get(key), str)), None)
+        if value is not None:
+            out.append((_indicator(value), _score(node)))
+    for value in node.values():
+        if isinstance(value, (list, dict)):
+            _walk_json(value, out)
+
+def read_feed(path):
+    """[(prefix or None, score or None)] of one feed file; None prefixes are rows that did not parse."""
+    rows = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        if path.lower().endswith(".json"):
+            try:
+                _walk_json(json.load(f), rows)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSON error: {e}")
+        elif path.lower().endswith(".csv"):
+            reader = csv.DictReader(line for line in f if not line.startswith("#"))
+            key = next((key for key in IP_KEYS if key in (reader.fieldnames or ())), None)
+            if key is None:
+                raise ValueError(f"no address column (one of {', '.join(IP_KEYS)})")
+            rows = [(_indicator(row[key]), _score(row)) for row in reader]
+        else:
+            for line in f:
+                line = line.split("#", 1)[0].split(";", 1)[0].strip()
+                if line:
+                    rows.append((_indicator(line.split()[0]), None))
+    return rows
+
+class IOCIndex:
+    """
+    Immutable index of every loaded feed. lookup(ip) returns {"tags", "score", "feeds"} for a
+    listed address (merged over all feeds listing it or a CIDR containing it) or None.
+    `providers` are the live providers the loaded feeds stand in for.
+    """
+
+    def __init__(self, feeds=()):
+        self.entries = []      # entry id -> (tags, score, feed names)
+        self.providers = frozenset()
+        self.stats = {"feeds": 0, "addresses": 0, "networks": 0, "skipped": 0}
+        self.v4_keys = array.array("I")
+        self.v4_values = array.array("I")
+        self.v6 = {}           # IPv6 address int -> entry id
+        self.networks = PrefixTrie()
+        if feeds:
+            self._build(feeds)
+
+    def _build(self, feeds):
+        """`feeds` is [(feed name, provider or None, rows from read_feed)]."""
+        exact = {4: {}, 6: {}}  # version -> address int -> frozenset of (feed name, provider)
+        networks, providers = {}, set()
+        for name, provider, rows in feeds:
+            self.stats["feeds"] += 1
+            if provider:
+                providers.add(provider)
+            source = frozenset([(name, provider)])  # shared by every address the feed lists once
+            for prefix, score in rows:
+                if prefix is None:
+                    self.stats["skipped"] += 1
+                    continue
+                if provider == "abuseipdb" and score is not None and score <= ABUSEIPDB_MIN_SCORE:
+                    continue
+                version, network, prefix_len = prefix
+                target = exact[version] if prefix_len == (32 if version == 4 else 128) else networks
+                key = network if target is not networks else prefix
+                sources = target.get(key)
+                target[key] = source if sources is None or sources == source else sources | source
+        interned = {}
+
+        def entry_id(sources):
+            if sources not in interned:
+                # One verdict per provider (or per generic feed), however many of its files list the address.
+                verdicts = {provider or name: PROVIDER_VERDICTS.get(provider, ((f"ioc_{name}",), FEED_SCORE))
+                            for name, provider in sources}
+                tags = {tag for feed_tags, _ in verdicts.values() for tag in feed_tags}
+                score = sum(feed_score for _, feed_score in verdicts.values())
+                interned[sources] = len(self.entries)
+                self.entries.append((sorted(tags), min(score, 100), sorted({name for name, _ in sources})))
+            return interned[sources]
+
+        # Shortest first, so a more specific CIDR inherits the sources of the ones containing it.
+        for (version, network, prefix_len), sources in sorted(networks.items(), key=lambda item: item[0][2]):
+            inherited = self.networks.lookup(version, network)
+            if inherited is not None:
+                sources = sources | inherited[1]
+            self.networks.insert(version, network, prefix_len, (entry_id(sources), sources))
+        # Addresses also inherit from their CIDRs, so a lookup needs at most one of the two structures.
+        for version, addresses in exact.items():
+            for value in (sorted(addresses) if version == 4 else addresses):
+                sources = addresses[value]
+                inherited = self.networks.lookup(version, value) if networks else None
+                if inherited is not None:
+                    sources = sources | inherited[1]
+                if version == 4:
+                    self.v4_keys.append(value)
+                    self.v4_values.append(entry_id(sources))
+                else:
+                    self.v6[value] = entry_id(sources)
+        self.providers = frozenset(providers)
+        self.stats["addresses"] = len(exact[4]) + len(exact[6])
+        self.stats["networks"] = len(networks)
+
+    def lookup(self, ip):
+        version, value = ip_to_int(ip)
+        if not version:
+            return None
+        found = None
+        if version == 4:
+            i = bisect.bisect_left(self.v4_keys, value)
+            if i < len(self.v4_keys) and self.v4_keys[i] == value:
+                found = self.v4_values[i]
+        else:
+            found = self.v6.get(value)
+        if found is None and len(self.networks):
+            network = self.networks.lookup(version, value)
+            if network is not None:
+                found = network[0]
+        if found is None:
+            return None
+        tags, score, feeds = self.entries[found]
+        return {"tags": list(tags), "score": score, "feeds": list(feeds)}
+
+    def __len__(self):
+        return self.stats["addresses"] + self.stats["networks"]
+
+def load_feeds(path):
+    """IOCIndex of every feed file in directory `path`; unreadable files are logged and skipped."""
+    feeds = []
+    for name in sorted(os.listdir(path)):
+        file_path = os.path.join(path, name)
+        if not name.lower().endswith(FEED_EXTENSIONS) or not os.path.isfile(file_path):
+            continue
+        try:
+            feeds.append((os.path.splitext(name)[0], feed_provider(name), read_feed(file_path)))
+        except (OSError, ValueError, csv.Error) as e:
+            logging.error(f"❌ Skipping IOC feed {file_path}: {e}")
+    return IOCIndex(feeds)
+
+class FeedWatcher(RuleWatcher):
+    """RuleWatcher over a whole feeds directory: any file added, removed or changed triggers a rebuild."""
+
+    def _fingerprint(self):
+        try:
+            names = sorted(os.listdir(self.path))
+        except OSError:
+            return None
+        fingerprint = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            fingerprint.append((name, st.st_mtime_ns, st.st_ino, st.st_size))
+        return tuple(fingerprint)
+
+class IOCFeeds:
+    """
+    The active IOCIndex of a feeds directory, rebuilt on a watcher thread and swapped in with one
+    attribute assignment, so lookups never see a half-built index. A missing directory means no feeds.
+    """
+
+    def __init__(self, path="../rules/feeds", refresh_interval=30):
+        self.path = path
+        self.index = load_feeds(path) if os.path.isdir(path) else IOCIndex()
+        self.stats = {"lookups": 0, "hits": 0, "reloads": 0}
+        self.watcher = FeedWatcher(path, self.swap, interval=refresh_interval, reader=load_feeds,
+                                   kind="IOC entries").start()
+
+    def swap(self, index):
+        self.index = index
+        self.stats["reloads"] += 1
+
+    @property
+    def providers(self):
+        return self.index.providers
+
+    def lookup(self, ip):
+        self.stats["lookups"] += 1
+        listed = self.index.lookup(ip)
+        if listed is not None:
+            self.stats["hits"] += 1
+        return listed
+
+    def get_stats(self):
+        return dict(self.index.stats, **self.stats)
+
+    def close(self):
+        self.watcher.stop()
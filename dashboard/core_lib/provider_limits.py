@@ -0,0 +1,130 @@
+# provider_limits.py: per-provider guards for threat-intel lookups.
+# Each provider gets a token bucket sized to its API quota, a per-call timeout and a circuit
+# breaker: after `failure_threshold` consecutive failures the provider is skipped for a cooldown
+# (doubling while it keeps failing), then a single probe call decides whether it is back.
+# All of them read time from `clock` (time.monotonic unless a test passes its own).
+import threading
+import time
+
+# provider -> quota and timeout defaults; rate is calls per second, burst the bucket size.
+PROVIDER_LIMITS = {
+    "abuseipdb": {"rate": 1000 / 86400, "burst": 20, "timeout": 5.0},   # free plan: 1,000 checks/day
+    "otx": {"rate": 10000 / 3600, "burst": 20, "timeout": 5.0},         # 10,000 requests/hour
+    "misp": {"rate": 10.0, "burst": 20, "timeout": 5.0},                # our own instance
+    "geoip": {"rate": 45 / 60, "burst": 10, "timeout": 3.0},            # ip-api.com: 45 requests/minute
+    "whois": {"rate": 1.0, "burst": 5, "timeout": 10.0},
+    "virustotal": {"rate": 4 / 60, "burst": 4, "timeout": 10.0},        # public API: 4 requests/minute
+}
+DEFAULT_LIMITS = {"rate": 1.0, "burst": 5, "timeout": 5.0}
+
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def take(self):
+        """Spend one token if there is one; never waits."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures -> half-open (one probe) after the cooldown."""
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, max_cooldown=600.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None  # clock() time the breaker opened, None while closed
+        self.probing = False
+        self.clock = clock
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.probing or self.clock() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.probing or self.clock() - self.opened_at < self.cooldown:
+            return False
+        self.probing = True  # the one call that decides whether the provider is back
+        return True
+
+    def release(self):
+        """The admitted call was not made after all (e.g. rate limited)."""
+        self.probing = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.cooldown = self.base_cooldown
+
+    def failure(self):
+        self.failures += 1
+        if self.probing:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.probing = False
+
+class ProviderGuard:
+    """Token bucket, timeout and circuit breaker of one provider; shared by every loop using the ThreatIntel."""
+
+    def __init__(self, name, rate, burst, timeout, failure_threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.name = name
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown, clock=clock)
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "timeouts": 0, "rate_limited": 0, "short_circuited": 0}
+
+    def admit(self):
+        """None if a call may go out now, else why not: "circuit_open" or "rate_limited"."""
+        with self.lock:
+            if not self.breaker.allow():
+                self.stats["short_circuited"] += 1
+                return "circuit_open"
+            if not self.bucket.take():
+                self.breaker.release()
+                self.stats["rate_limited"] += 1
+                return "rate_limited"
+            self.stats["calls"] += 1
+            return None
+
+    def record(self, outcome):
+        """Outcome of an admitted call: "ok", "timeout", "error" or "cancelled" (no verdict)."""
+        with self.lock:
+            if outcome == "ok":
+                self.breaker.success()
+                return
+            if outcome == "cancelled":
+                self.breaker.release()
+                return
+            self.stats["timeouts" if outcome == "timeout" else "failures"] += 1
+            self.breaker.failure()
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, state=self.breaker.state)
+
+def make_guards(limits=None, failure_threshold=5, cooldown=30.0, clock=time.monotonic):
+    """ProviderGuard per provider from PROVIDER_LIMITS, with `limits` ({provider: {rate/burst/timeout}}) overriding."""
+    guards = {}
+    for name in set(PROVIDER_LIMITS) | set(limits or {}):
+        settings = {**DEFAULT_LIMITS, **PROVIDER_LIMITS.get(name, {}), **(limits or {}).get(name, {})}
+        guards[name] = ProviderGuard(name, settings["rate"], settings["burst"], settings["timeout"],
+                                     failure_threshold, cooldown, clock)
+    return guards
@@ -0,0 +1,23 @@
+# shared_intel.py: the dashboard's one ThreatIntel, shared by every page, session and rerun.
+# Pages import intel_loop() from here instead of from each other, so the pooled provider
+# connections, the enrichment cache and the IOC feed index exist once per dashboard process.
+import atexit
+import streamlit as st
+from dashboard.core_lib.intel_cache import EnrichmentCache
+from dashboard.core_lib.ioc_feeds import IOCFeeds
+from dashboard.core_lib.threat_intel import IntelLoop, ThreatIntel
+
+# Relative to the dashboard directory, where streamlit is started.
+DB_PATH = "../ids_data.db"
+FEEDS_DIR = "../rules/feeds"
+
+@st.cache_resource
+def intel_loop(db_path=DB_PATH, feeds_dir=FEEDS_DIR):
+    """
+    ThreatIntel on its own event loop thread, created on first use. Answers are cached in the
+    same `intel_cache` table the sensor fills, and the sensor's offline IOC feeds answer first.
+    The session is closed at exit.
+    """
+    loop = IntelLoop(ThreatIntel(cache=EnrichmentCache(db_path), feeds=IOCFeeds(feeds_dir)))
+    atexit.register(loop.close)
+    return loop
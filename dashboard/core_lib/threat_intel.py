@@ -1,28 +1,174 @@
 # threat_intel.py
+# Every lookup goes through one long-lived aiohttp session per event loop (pooled keep-alive
+# connections, cached DNS), so after the first call a lookup costs the provider's response time
+# instead of a fresh DNS query, TCP connect and TLS handshake. With an EnrichmentCache, answers
+# are reused per provider until their TTL runs out; failed lookups are never cached.
+# Concurrent enrichments of the same IP or domain are coalesced into one lookup (single flight),
+# and finished results are reused for a few seconds, so a burst of packets from one scanner costs
+# one set of provider calls instead of one per packet. Providers are guarded by per-provider
+# quotas, timeouts and circuit breakers (provider_limits), and an enrichment returns after at
+# most `deadline` seconds with whatever the fast providers answered, marking the rest as partial.
+# With offline IOC feeds (ioc_feeds.IOCFeeds), the feeds answer first: a provider whose feed is
+# loaded is not asked at all, and once every reputation provider has one, local_verdict() gives
+# the full reputation of an IP inline, with no network call.
 import aiohttp
 import asyncio
 import os
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
+from dashboard.core_lib.provider_limits import make_guards
 
 load_dotenv()
 
+NO_MATCH = {"tags": [], "score": 0}  # reputation answer when a provider knows nothing about the IP
+REPUTATION_PROVIDERS = frozenset({"abuseipdb", "otx", "misp"})
+_UNCACHED = object()
+
+class ProviderUnavailable(Exception):
+    """A provider gave no answer: reason is "circuit_open", "rate_limited", "timeout" or "error"."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
 class ThreatIntel:
-    def __init__(self, abuseipdb_key=None, otx_key=None, misp_url=None, misp_key=None):
+    def __init__(self, abuseipdb_key=None, otx_key=None, misp_url=None, misp_key=None,
+                 limit_per_host=16, limit=64, keepalive_timeout=60, dns_ttl=300, cache=None, recent_ttl=5,
+                 recent_size=65536, limits=None, deadline=2.0, failure_threshold=5, cooldown=30.0,
+                 feeds=None):
         self.abuseipdb_key = abuseipdb_key or os.getenv("ABUSEIPDB_KEY")
         self.otx_key = otx_key or os.getenv("OTX_KEY")
         self.misp_url = misp_url or os.getenv("MISP_URL")
         self.misp_key = misp_key or os.getenv("MISP_KEY")
+        self.limit_per_host = limit_per_host    # open connections per provider
+        self.limit = limit                      # open connections overall
+        self.keepalive_timeout = keepalive_timeout  # seconds an idle connection stays pooled
+        self.dns_ttl = dns_ttl                  # seconds a resolved provider address is reused
+        self.cache = cache                      # intel_cache.EnrichmentCache, or None to always ask
+        self.recent_ttl = recent_ttl            # seconds a finished enrich_ip/enrich_domain result is reused
+        self.recent_size = recent_size
+        self.recent = {}                        # (kind, indicator) -> (expires, result)
+        self.stats = {"lookups": 0, "recent_hits": 0, "coalesced": 0, "flights": 0, "partial": 0}
+        # Quota, timeout and circuit breaker per provider; `limits` overrides PROVIDER_LIMITS.
+        self.guards = make_guards(limits, failure_threshold, cooldown)
+        self.deadline = deadline                # seconds an enrichment waits for slow providers; None = all
+        self.feeds = feeds                      # ioc_feeds.IOCFeeds, or None to ask the providers
+        # Sessions and in-flight lookups are bound to the loop that created them: one set per
+        # loop, dropped with the loop.
+        self._sessions = weakref.WeakKeyDictionary()
+        self._inflight = weakref.WeakKeyDictionary()  # loop -> {(kind, ...): Task}
+        self._sessions_lock = threading.Lock()
+
+    async def session(self):
+        """The shared session of the running event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                                 keepalive_timeout=self.keepalive_timeout,
+                                                 ttl_dns_cache=self.dns_ttl)
+                session = self._sessions[loop] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    async def close(self):
+        """
+        Cancel the running loop's in-flight lookups and close its session; call before that loop
+        stops. The next lookup opens a new session.
+        """
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.pop(loop, None)
+            inflight = self._inflight.pop(loop, {})
+        for task in list(inflight.values()):
+            task.cancel()
+        await asyncio.gather(*inflight.values(), return_exceptions=True)
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _single_flight(self, key, lookup):
+        """
+        Result of `lookup()` for `key`: a result finished within `recent_ttl` seconds, else the
+        lookup already running for the key on this loop, else a new one. Only the first caller
+        creates a task; the rest await the same one (shielded, so one caller's cancellation
+        does not cancel it for the others).
+        """
+        self.stats["lookups"] += 1
+        now = time.monotonic()
+        recent = self.recent.get(key)
+        if recent is not None and recent[0] > now:
+            self.stats["recent_hits"] += 1
+            return recent[1]
+        inflight = self._loop_inflight()
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.get_running_loop().create_task(lookup())
+            task.add_done_callback(lambda done: self._landed(inflight, key, done))
+            self.stats["flights"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _loop_inflight(self):
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            inflight = self._inflight.get(loop)
+            if inflight is None:
+                inflight = self._inflight[loop] = {}
+        return inflight
+
+    def _landed(self, inflight, key, task):
+        inflight.pop(key, None)
+        if self.recent_ttl and not task.cancelled() and task.exception() is None:
+            if len(self.recent) >= self.recent_size:
+                now = time.monotonic()
+                self.recent = {k: v for k, v in self.recent.items() if v[0] > now}
+                if len(self.recent) >= self.recent_size:
+                    self.recent.clear()
+            self.recent[key] = (time.monotonic() + self.recent_ttl, task.result())
+
+    def get_stats(self):
+        return dict(self.stats, recent=len(self.recent),
+                    providers={name: guard.get_stats() for name, guard in sorted(self.guards.items())})
+
+    @property
+    def local_only(self):
+        """True when the loaded feeds stand in for every reputation provider."""
+        return self.feeds is not None and REPUTATION_PROVIDERS <= self.feeds.providers
+
+    def local_verdict(self, ip):
+        """{"tags", "score"} of an IP from the offline feeds alone; no I/O, safe from any thread."""
+        listed = self.feeds.lookup(ip) if self.feeds is not None else None
+        return {"tags": listed["tags"], "score": listed["score"]} if listed else dict(NO_MATCH)
 
     async def enrich_ip(self, ip):
-        results = await asyncio.gather(
-            self._abuseipdb_lookup(ip),
-            self._otx_lookup(ip),
-            self._misp_lookup(ip),
-            self._geoip_lookup(ip),
-            return_exceptions=True
-        )
+        """Reputation score, tags and location of an IP; concurrent calls for one IP share a lookup."""
+        return await self._single_flight(("ip", ip), lambda: self._enrich_ip(ip))
+
+    async def enrich_domain(self, domain):
+        return await self._single_flight(("domain", domain), lambda: self._enrich_domain(domain))
+
+    async def _enrich_ip(self, ip):
+        # Providers with a loaded feed are answered by it: an IP their feed does not list is clean.
+        local = self.feeds.providers if self.feeds is not None else frozenset()
+        providers = [provider for provider in (("abuseipdb", self._abuseipdb_fetch, NO_MATCH),
+                                               ("otx", self._otx_fetch, NO_MATCH),
+                                               ("misp", self._misp_fetch, NO_MATCH),
+                                               ("geoip", self._geoip_fetch, {}))
+                     if provider[0] not in local]
+        results, partial = await self._query(ip, providers)
+        answers = dict(zip((name for name, _, _ in providers), results))
+        geoip = answers.pop("geoip", {})
         tags, score = [], 0
-        for result in results:
+        for result in [self.local_verdict(ip)] + list(answers.values()):
             if isinstance(result, dict):
                 tags += result.get("tags", [])
                 score += result.get("score", 0)
@@ -30,94 +176,204 @@ class ThreatIntel:
             "ip": ip,
             "score": min(score, 100),
             "tags": list(set(tags)),
-            "geoip": results[3] if isinstance(results[3], dict) else {},
+            "geoip": geoip if isinstance(geoip, dict) else {},
+            "partial": partial,
         }
 
-    async def enrich_domain(self, domain):
-        whois = await self._whois_lookup(domain)
-        vt = await self._virustotal_lookup(domain)
+    async def _enrich_domain(self, domain):
+        (whois, vt), partial = await self._query(domain, (("whois", self._whois_fetch, {}),
+                                                          ("virustotal", self._virustotal_fetch, {})))
         return {
             "domain": domain,
             "whois": whois or {},
             "virustotal": vt or {},
             "tags": ["domain_checked"] if whois or vt else [],
-            "score": 40 if vt else 10
+            "score": 40 if vt else 10,
+            "partial": partial,
         }
 
-    async def _abuseipdb_lookup(self, ip):
+    async def _query(self, indicator, providers):
+        """
+        Answers of `providers` [(name, fetch, fallback)] for one indicator, and {name: reason}
+        for those that gave none (their fallback stands in). Cached answers are read inline and
+        the rest are queried concurrently for at most `deadline` seconds; providers still running
+        then are reported as "pending" and finish in the background, filling the cache.
+        """
+        results, tasks, partial = [], {}, {}
+        for i, (name, fetch, fallback) in enumerate(providers):
+            value = self._peek(name, indicator)
+            if value is _UNCACHED:
+                tasks[i] = self._provider_task(name, indicator, fetch)
+                value = dict(fallback)
+            results.append(value)
+        if tasks:
+            await asyncio.wait(set(tasks.values()), timeout=self.deadline)
+            for i, task in tasks.items():
+                name = providers[i][0]
+                if not task.done():
+                    partial[name] = "pending"
+                elif task.cancelled():
+                    partial[name] = "cancelled"
+                elif task.exception() is not None:
+                    error = task.exception()
+                    partial[name] = error.reason if isinstance(error, ProviderUnavailable) else "error"
+                else:
+                    results[i] = task.result()
+            if partial:
+                self.stats["partial"] += 1
+        return results, partial
+
+    def _provider_task(self, provider, indicator, fetch):
+        """The running call of `provider` for `indicator` on this loop, or a new one."""
+        inflight = self._loop_inflight()
+        key = ("provider", provider, indicator)
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.get_running_loop().create_task(self._fetch(provider, indicator, fetch))
+            task.add_done_callback(lambda done: self._fetched(inflight, key, done))
+        return task
+
+    @staticmethod
+    def _fetched(inflight, key, task):
+        inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here: calls that outlive their enrichment report to nobody
+
+    def _peek(self, provider, indicator):
+        """The cached answer of a provider, or _UNCACHED."""
+        if self.cache is None:
+            return _UNCACHED
+        value = self.cache.get(provider, indicator)
+        return _UNCACHED if value is self.cache.MISSING else value
+
+    async def _fetch(self, provider, indicator, fetch):
+        """
+        `fetch(indicator)` through the provider's guard, caching the answer. Raises
+        ProviderUnavailable when the guard refuses the call or it fails (timeout, network or HTTP
+        error, bad JSON); failures are not cached, and count towards the circuit breaker.
+        An answer already in the cache table (stored by this or another process) is used first;
+        the table is read in the loop's executor, never on the loop itself.
+        """
+        if self.cache is not None and self.cache.persistent:
+            value = await asyncio.get_running_loop().run_in_executor(None, self.cache.load, provider, indicator)
+            if value is not self.cache.MISSING:
+                return value
+        guard = self.guards[provider]
+        refused = guard.admit()
+        if refused:
+            raise ProviderUnavailable(refused)
+        try:
+            value = await asyncio.wait_for(fetch(indicator), guard.timeout)
+        except asyncio.TimeoutError:
+            guard.record("timeout")
+            raise ProviderUnavailable("timeout")
+        except asyncio.CancelledError:
+            guard.record("cancelled")
+            raise
+        except Exception:
+            guard.record("error")
+            raise ProviderUnavailable("error")
+        guard.record("ok")
+        if self.cache is not None:
+            self.cache.put(provider, indicator, value, negative=not value or value == NO_MATCH)
+        return value
+
+    async def _abuseipdb_fetch(self, ip):
         url = f"https://api.abuseipdb.com/api/v2/check?ipAddress={ip}&maxAgeInDays=90"
         headers = {"Key": self.abuseipdb_key, "Accept": "application/json"}
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=headers) as r:
-                    data = await r.json()
-                    if data.get("data", {}).get("abuseConfidenceScore", 0) > 50:
-                        return {"tags": ["abuseipdb_high"], "score": 40}
-            except Exception:
-                pass
-        return {"tags": [], "score": 0}
-
-    async def _otx_lookup(self, ip):
+        session = await self.session()
+        async with session.get(url, headers=headers) as r:
+            r.raise_for_status()
+            data = await r.json()
+        if data.get("data", {}).get("abuseConfidenceScore", 0) > 50:
+            return {"tags": ["abuseipdb_high"], "score": 40}
+        return dict(NO_MATCH)
+
+    async def _otx_fetch(self, ip):
         url = f"https://otx.alienvault.com/api/v1/indicators/IPv4/{ip}/general"
         headers = {"X-OTX-API-KEY": self.otx_key}
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=headers) as r:
-                    data = await r.json()
-                    if data.get("pulse_info", {}).get("count", 0) > 0:
-                        return {"tags": ["otx_malicious"], "score": 30}
-            except Exception:
-                pass
-        return {"tags": [], "score": 0}
-
-    async def _misp_lookup(self, ip):
+        session = await self.session()
+        async with session.get(url, headers=headers) as r:
+            r.raise_for_status()
+            data = await r.json()
+        if data.get("pulse_info", {}).get("count", 0) > 0:
+            return {"tags": ["otx_malicious"], "score": 30}
+        return dict(NO_MATCH)
+
+    async def _misp_fetch(self, ip):
         headers = {
             "Authorization": self.misp_key,
             "Accept": "application/json",
             "Content-type": "application/json"
         }
         payload = {"returnFormat": "json", "type": "ip-dst", "value": ip}
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(f"{self.misp_url}/attributes/restSearch", json=payload, headers=headers) as r:
-                    data = await r.json()
-                    if data.get("response"):
-                        return {"tags": ["misp_malicious"], "score": 30}
-            except Exception:
-                pass
-        return {"tags": [], "score": 0}
-
-    async def _geoip_lookup(self, ip):
-        url = f"http://ip-api.com/json/{ip}"
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url) as r:
-                    data = await r.json()
-                    return {
-                        "city": data.get("city"),
-                        "country": data.get("country"),
-                        "latitude": data.get("lat"),
-                        "longitude": data.get("lon")
-                    }
-            except Exception:
-                pass
-        return {}
-
-    async def _whois_lookup(self, domain):
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"https://api.whois.vu/?q={domain}") as r:
-                    return await r.json()
-        except Exception:
-            return {}
+        session = await self.session()
+        async with session.post(f"{self.misp_url}/attributes/restSearch", json=payload, headers=headers) as r:
+            r.raise_for_status()
+            data = await r.json()
+        if data.get("response"):
+            return {"tags": ["misp_malicious"], "score": 30}
+        return dict(NO_MATCH)
 
-    async def _virustotal_lookup(self, domain):
-        try:
-            headers = {"x-apikey": os.getenv("VT_KEY")}
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"https://www.virustotal.com/api/v3/domains/{domain}", headers=headers) as r:
-                    data = await r.json()
-                    if data.get("data"):
-                        return data["data"]
-        except Exception:
-            return {}
\ No newline at end of file
+    async def _geoip_fetch(self, ip):
+        session = await self.session()
+        async with session.get(f"http://ip-api.com/json/{ip}") as r:
+            r.raise_for_status()
+            data = await r.json()
+        return {
+            "city": data.get("city"),
+            "country": data.get("country"),
+            "latitude": data.get("lat"),
+            "longitude": data.get("lon")
+        }
+
+    async def _whois_fetch(self, domain):
+        session = await self.session()
+        async with session.get(f"https://api.whois.vu/?q={domain}") as r:
+            r.raise_for_status()
+            return await r.json()
+
+    async def _virustotal_fetch(self, domain):
+        headers = {"x-apikey": os.getenv("VT_KEY")}
+        session = await self.session()
+        async with session.get(f"https://www.virustotal.com/api/v3/domains/{domain}", headers=headers) as r:
+            r.raise_for_status()
+            data = await r.json()
+        if data.get("data"):
+            return data["data"]
+        return None
+
+class IntelLoop:
+    """
+    ThreatIntel for synchronous callers (the dashboard): lookups run on one private event loop
+    thread, so every call reuses the same pooled session instead of a fresh asyncio.run() loop.
+    """
+
+    def __init__(self, intel=None):
+        self.intel = intel or ThreatIntel()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="threat-intel-loop", daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop from any other thread and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def enrich_ip(self, ip, timeout=None):
+        return self.run(self.intel.enrich_ip(ip), timeout)
+
+    def enrich_domain(self, domain, timeout=None):
+        return self.run(self.intel.enrich_domain(domain), timeout)
+
+    def close(self):
+        """Close the session, the cache and the feeds, and stop the loop thread."""
+        if self.loop.is_closed():
+            return
+        self.run(self.intel.close(), timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
+        if self.intel.cache is not None:
+            self.intel.cache.close()
+        if self.intel.feeds is not None:
+            self.intel.feeds.close()
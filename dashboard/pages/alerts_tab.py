@@ -46,6 +46,30 @@ def load_alerts():
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s', errors='coerce')
     return df
 
+@st.cache_data(ttl=10)
+def load_rule_stats():
+    """Per-rule counters written by the SignatureEngine, keyed by rule_id (or name)."""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        df = pd.read_sql_query("SELECT * FROM rule_stats", conn)
+        conn.close()
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return {}  # the engine has not written any stats yet
+    return {row["rule_key"]: row for row in df.to_dict("records")}
+
+def rule_stat_columns(rule, stats):
+    row = stats.get(rule.get("rule_id") or rule.get("name"), {})
+    evaluations = int(row.get("evaluations", 0))
+    eval_ms = float(row.get("eval_time", 0.0)) * 1000
+    return {
+        "Evaluations": evaluations,
+        "Matches": int(row.get("matches", 0)),
+        "Alerts": int(row.get("alerts", 0)),
+        "Suppressed": int(row.get("suppressed", 0)),
+        "Eval Time (ms)": round(eval_ms, 2),
+        "µs / Eval": round(eval_ms * 1000 / evaluations, 2) if evaluations else 0.0,
+    }
+
 @st.cache_data(ttl=60)
 def load_signature_rules(path=RULE_PATH):
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -128,6 +152,7 @@ def render(alerts_df: pd.DataFrame, tab_container) -> None:
         with tab4:
             st.subheader("🚨 Rule Based Editor")
 
+            rule_stats = load_rule_stats()
             if rules:
                 df_rules = pd.DataFrame([{
                     "Rule ID": rule.get("rule_id", f"R{i+1}"),
@@ -136,9 +161,20 @@ def render(alerts_df: pd.DataFrame, tab_container) -> None:
                     "Severity": rule.get("severity", "medium"),
                     "Protocol": rule.get("conditions", {}).get("protocol", ""),
                     "Packet Threshold": rule.get("conditions", {}).get("packet_threshold", ""),
-                    "Time Window (s)": rule.get("conditions", {}).get("time_window", "")
+                    "Time Window (s)": rule.get("conditions", {}).get("time_window", ""),
+                    **rule_stat_columns(rule, rule_stats)
                 } for i, rule in enumerate(rules)])
                 st.dataframe(df_rules, use_container_width=True)
+                if rule_stats:
+                    st.caption("Evaluations: packets reaching the rule's protocol/port; Matches: packets counted; "
+                               "rules with identical conditions share one evaluation cost.")
+                    col1, col2 = st.columns(2)
+                    col1.markdown("**💸 Most expensive rules**")
+                    col1.dataframe(df_rules.nlargest(5, "Eval Time (ms)")[["Name", "Eval Time (ms)", "µs / Eval"]],
+                                   use_container_width=True, hide_index=True)
+                    col2.markdown("**📢 Noisiest rules**")
+                    col2.dataframe(df_rules.nlargest(5, "Alerts")[["Name", "Alerts", "Suppressed"]],
+                                   use_container_width=True, hide_index=True)
                 st.download_button("📥 Download Rule Set as CSV", df_rules.to_csv(index=False), "rules.csv")
             else:
                 st.info("No rules to display.")
@@ -176,6 +212,8 @@ def render(alerts_df: pd.DataFrame, tab_container) -> None:
             if rules:
                 for i, rule in enumerate(rules):
                     with st.expander(f"Rule {i+1}: {rule.get('name', 'Unnamed')}"):
+                        stats = rule_stat_columns(rule, rule_stats)
+                        st.caption(" · ".join(f"{label}: {value:,}" for label, value in stats.items()))
                         rule['name'] = st.text_input(f"Name {i}", rule['name'], key=f"name_{i}")
                         rule['description'] = st.text_input(f"Description {i}", rule['description'], key=f"desc_{i}")
                         rule['severity'] = st.selectbox(
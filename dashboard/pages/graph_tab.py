@@ -6,9 +6,8 @@ from streamlit_autorefresh import st_autorefresh
 import geoip2.database
 from functools import lru_cache
 from pyvis.network import Network                     
-import asyncio                                        
 import streamlit.components.v1 as components          
-from config.setting import intel
+from dashboard.core_lib.shared_intel import intel_loop
 import os
 # Load only once at the top level
 # GEOIP_DB_PATH = "../database/GeoLite2-City.mmdb"
@@ -79,7 +78,7 @@ def render(flows_df, alerts_df, ml_alerts_df, tab_cotainer):
                 for ip in all_ips:
                     try:
                         if ip not in enrichment_cache:
-                            enrichment_cache[ip] = asyncio.run(intel.enrich_ip(ip))
+                            enrichment_cache[ip] = intel_loop().enrich_ip(ip)
 
                         data = enrichment_cache[ip]
                         score = data.get("score", 0)
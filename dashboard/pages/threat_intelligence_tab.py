@@ -1,7 +1,6 @@
 # ultimate_threat_dashboard_live_fixed.py
 import sys
 import os
-import asyncio
 import time
 import logging
 from concurrent.futures import ThreadPoolExecutor
@@ -18,7 +17,7 @@ from streamlit_autorefresh import st_autorefresh
 
 # local imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from core_lib.threat_intel import ThreatIntel
+from dashboard.core_lib.shared_intel import intel_loop
 
 # Setup
 nest_asyncio.apply()
@@ -68,19 +67,13 @@ def threat_color(score):
 def cached_enrichment(lookup_type, query):
     """
     Synchronous wrapper stored in Streamlit cache. This function will run
-    inside a worker thread (via executor.submit). We therefore call asyncio.run()
-    to execute the async enrichment on a fresh event loop, avoiding conflicts.
+    inside a worker thread (via executor.submit) and waits for the lookup on
+    the shared intel loop.
     """
-    intel = ThreatIntel()
-
-    async def _run():
-        if lookup_type == "IP":
-            return await intel.enrich_ip(query)
-        else:
-            return await intel.enrich_domain(query)
-
     try:
-        return asyncio.run(_run())
+        if lookup_type == "IP":
+            return intel_loop().enrich_ip(query)
+        return intel_loop().enrich_domain(query)
     except Exception as e:
         logging.exception("cached_enrichment failed")
         return {"error": str(e)}
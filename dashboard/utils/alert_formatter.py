@@ -4,6 +4,8 @@ def format_alert_payload(alert_type, description, flow, timestamp, severity):
         "description": description,
         "src_ip": flow.get("src_ip"),
         "dst_ip": flow.get("dst_ip"),
+        "src_port": flow.get("src_port"),
+        "dst_port": flow.get("dst_port"),
         "protocol": flow.get("protocol"),
         "timestamp": timestamp,
         "severity": severity
@@ -1,7 +1,7 @@
 import os
 import streamlit as st
-import uuid
 import yaml
+from dashboard.utils.rule_defaults import apply_rule_defaults
 
 RULE_PATH = "rules/rules.yaml"
 
@@ -25,31 +25,14 @@ def repair_signature_rules(path=RULE_PATH):
         st.warning("Malformed rules.yaml structure. Resetting to empty list.")
         rules = []
 
-    default_rule = {
-        "rule_id": None,
-        "name": "Unnamed Rule",
-        "description": "No description provided.",
-        "severity": "medium",
-        "conditions": {
-            "protocol": "TCP",
-            "packet_threshold": 10,
-            "time_window": 60
-        }
-    }
-
     for i, rule in enumerate(rules):
         if not isinstance(rule, dict):
             continue
-        # Fill missing values
-        rule["rule_id"] = rule.get("rule_id") or str(uuid.uuid4())
-        rule["name"] = rule.get("name", default_rule["name"])
-        rule["description"] = rule.get("description", default_rule["description"])
-        rule["severity"] = rule.get("severity", default_rule["severity"]).lower()
-
-        rule["conditions"] = rule.get("conditions", {})
-        rule["conditions"]["protocol"] = rule["conditions"].get("protocol", default_rule["conditions"]["protocol"])
-        rule["conditions"]["packet_threshold"] = rule["conditions"].get("packet_threshold", default_rule["conditions"]["packet_threshold"])
-        rule["conditions"]["time_window"] = rule["conditions"].get("time_window", default_rule["conditions"]["time_window"])
+        # Fill missing values; a mistyped rule is kept as written for the user to fix.
+        try:
+            apply_rule_defaults(rule)
+        except ValueError as e:
+            st.warning(f"Rule #{i + 1} needs fixing: {e}")
 
         repaired_rules.append(rule)
 
@@ -0,0 +1,34 @@
+# Default values for signature rule fields, shared by the dashboard and the detection engine.
+# Kept free of streamlit so the capture process can import it.
+import uuid
+
+DEFAULT_RULE = {
+    "rule_id": None,
+    "name": "Unnamed Rule",
+    "description": "No description provided.",
+    "severity": "medium",
+    "conditions": {
+        "protocol": "TCP",
+        "packet_threshold": 10,
+        "time_window": 60
+    }
+}
+
+def apply_rule_defaults(rule, assign_id=True):
+    """Fill the missing fields of a rule dict in place and return it; raises ValueError for mistyped fields."""
+    severity = rule.get("severity", DEFAULT_RULE["severity"])
+    if not isinstance(severity, str):
+        raise ValueError(f"rule {rule.get('name')!r}: severity must be a string, not {severity!r}")
+    conditions = rule.get("conditions") or {}
+    if not isinstance(conditions, dict):
+        raise ValueError(f"rule {rule.get('name')!r}: conditions must be a mapping, not {conditions!r}")
+    if assign_id:
+        rule["rule_id"] = rule.get("rule_id") or str(uuid.uuid4())
+    rule["name"] = rule.get("name", DEFAULT_RULE["name"])
+    rule["description"] = rule.get("description", DEFAULT_RULE["description"])
+    rule["severity"] = severity.lower()
+
+    rule["conditions"] = conditions
+    for field, value in DEFAULT_RULE["conditions"].items():
+        rule["conditions"][field] = rule["conditions"].get(field, value)
+    return rule
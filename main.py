@@ -1,29 +1,111 @@
+import argparse
+import functools
 import logging
+import time
+from collections import Counter
 from logger_config.logger import setup_log
 setup_log() # Configure logging
-from core.packet_sniffer import start_sniffing
+from core.packet_sniffer import start_sniffing, CAPTURE_BACKENDS
+from core.sharded_runtime import ShardedRuntime, SHARD_MODES
+from core.replay import replay, print_summary
+from core.ring_buffer import OVERFLOW_POLICIES
+from core.alert_outbox import OutboxDispatcher
 from core.flow_builder import FlowBuilder
 from core.signature_engine import SignatureEngine
 from core.alert_engine import AlertEngine
+from core.rule_engine import load_ip_sets, load_rules, rescore_flows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="AI based Intrusion Detection System")
+    parser.add_argument("--backend", choices=CAPTURE_BACKENDS, default="raw",
+                        help="capture backend: raw AF_PACKET header parser (default) or scapy")
+    parser.add_argument("--iface", default=None, help="network interface to capture on (default: all)")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="raw backend only: decode frames in NumPy batches of this size (0 = per packet)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of analysis processes; flows are sharded between them by 5-tuple hash")
+    parser.add_argument("--shard-mode", choices=SHARD_MODES, default="fanout",
+                        help="fanout: kernel PACKET_FANOUT per worker (raw only); dispatch: parent hashes and forwards")
+    parser.add_argument("--pcap", default=None,
+                        help="replay a pcap/pcapng file (or a directory of them) instead of capturing live")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="with --pcap: 0 = as fast as possible (default), N = original timing x N")
+    parser.add_argument("--queue-size", type=int, default=65536,
+                        help="capacity of the capture-to-analysis ring buffer")
+    parser.add_argument("--overflow-policy", choices=OVERFLOW_POLICIES, default="drop_newest",
+                        help="what to do when the ring buffer is full")
+    parser.add_argument("--adaptive-sampling", action="store_true",
+                        help="analyse 1-in-N flows while the analysis stages are overloaded")
+    parser.add_argument("--max-sample-rate", type=int, default=64,
+                        help="with --adaptive-sampling: largest N (a power of two)")
+    parser.add_argument("--suppress-window", type=float, default=60,
+                        help="seconds to fold repeats of a (rule, src, dst) alert into one summary; 0 disables")
+    parser.add_argument("--rescore", action="store_true",
+                        help="evaluate the current rules over the stored flows table and report which would alert")
+    return parser.parse_args()
+
+def build_engines(alert_sink=None, packet_clock=False, queue_capacity=65536, overflow_policy="drop_newest",
+                  suppress_window=60):
+    flow_builder = FlowBuilder(packet_clock=packet_clock, queue_capacity=queue_capacity,
+                               overflow_policy=overflow_policy)
+    signature_engine = SignatureEngine(alert_sink=alert_sink, suppress_window=suppress_window)
+    alert_engine = AlertEngine(
+        abuseipdb_key="YOUR_ABUSEIPDB_API_KEY",
+        otx_key="YOUR_OTX_API_KEY",
+        misp_url="https://your-misp-instance.com",
+        misp_key="YOUR_MISP_API_KEY",
+        alert_sink=alert_sink
+    )
+    return flow_builder, signature_engine, alert_engine
+
+def rescore(db_path="ids_data.db"):
+    """Vectorized re-run of the signature rules over every stored flow; nothing is written."""
+    started = time.perf_counter()
+    load_ip_sets()
+    alerts = rescore_flows(db_path, load_rules())
+    logging.info(f"🔁 Re-scored stored flows in {time.perf_counter() - started:.2f}s: {len(alerts):,} alerts")
+    for name, count in Counter(alert["type"] for alert in alerts).most_common():
+        print(f"  {name}: {count:,}")
 
 def main():
+    args = parse_args()
+    if args.rescore:
+        rescore()
+        return
+    engines = functools.partial(build_engines, queue_capacity=args.queue_size, overflow_policy=args.overflow_policy,
+                                suppress_window=args.suppress_window)
+    # Delivers queued Slack/email/API notifications off the capture path.
+    outbox = OutboxDispatcher().start()
     try:
         logging.info("🔧 Initializing modules...")
-        flow_builder = FlowBuilder()
-        signature_engine = SignatureEngine()
-        alert_engine = AlertEngine(
-            abuseipdb_key="YOUR_ABUSEIPDB_API_KEY",
-            otx_key="YOUR_OTX_API_KEY",
-            misp_url="https://your-misp-instance.com",
-            misp_key="YOUR_MISP_API_KEY"
-        )
+        if args.pcap:
+            flow_builder, signature_engine, alert_engine = engines(packet_clock=True)
+            logging.info(f"📼 Replaying {args.pcap}...")
+            print_summary(replay(args.pcap, flow_builder, signature_engine, alert_engine,
+                                 speed=args.speed, batch_size=args.batch_size))
+            return
+
+        if args.workers > 1:
+            shard_mode = args.shard_mode if args.backend == "raw" else "dispatch"
+            logging.info(f"🚀 Starting sharded packet sniffing ({args.workers} workers, {shard_mode})...")
+            ShardedRuntime(engines, args.workers, mode=shard_mode, backend=args.backend,
+                           iface=args.iface, batch_size=args.batch_size,
+                           max_sample_rate=args.max_sample_rate if args.adaptive_sampling else 0).run()
+            return
+
+        flow_builder, signature_engine, alert_engine = engines()
         logging.info("🚀 Starting packet sniffing...")
-        start_sniffing(flow_builder, signature_engine, alert_engine)
+        start_sniffing(flow_builder, signature_engine, alert_engine, backend=args.backend, iface=args.iface,
+                       batch_size=args.batch_size, adaptive_sampling=args.adaptive_sampling,
+                       max_sample_rate=args.max_sample_rate)
 
     except KeyboardInterrupt:
         logging.warning("🛑 Packet sniffing interrupted by user.")
     except Exception as e:
         logging.exception(f"❌ An unexpected error occurred: {e}")
+    finally:
+        outbox.close()
+        logging.info(f"📨 Alert outbox: {outbox.get_stats()}")
 
 if __name__ == "__main__":
-    main()  
\ No newline at end of file
+    main()
@@ -14,6 +14,8 @@ class AnomalyDetector:
         self.model = joblib.load(model_path)
         self.db_path = db_path
         self.db_lock = threading.Lock()
+        self.flows_scored = 0
+        self.anomalies = 0
         self._prepare_db()
 
     def _prepare_db(self):
@@ -36,7 +38,8 @@ class AnomalyDetector:
 
     @staticmethod
     def extract_features(flow):
-        duration = max(1e-3, time.time() - flow.get("start_time", flow["timestamp"]))
+        end = flow.get("end_time") or time.time()
+        duration = max(1e-3, end - flow.get("start_time", flow["timestamp"]))
         return np.array([[ 
             flow.get("packet_count", 0),
             flow.get("total_size", 0),
@@ -44,10 +47,51 @@ class AnomalyDetector:
             flow.get("packet_count", 0) / duration
         ]])
 
+    @staticmethod
+    def extract_batch_features(columns):
+        packet_count = np.asarray(columns["packet_count"], dtype=float)
+        total_size = np.asarray(columns["total_size"], dtype=float)
+        duration = np.maximum(1e-3, np.asarray(columns["end_time"], dtype=float)
+                              - np.asarray(columns["start_time"], dtype=float))
+        return np.column_stack([packet_count, total_size, total_size / duration, packet_count / duration])
+
+    def score_batch(self, columns):
+        """Score many finished flows with one model call; `columns` maps field names to equal-length arrays."""
+        features = self.extract_batch_features(columns)
+        if not len(features):
+            return
+        scores = self.model.decision_function(features)
+        anomalies = self.model.predict(features) == -1
+        now = time.time()
+        self.flows_scored += len(features)
+        self.anomalies += int(anomalies.sum())
+
+        for i in np.flatnonzero(anomalies):
+            print(f"[ML ALERT] 🚨 {columns['src_ip'][i]} → {columns['dst_ip'][i]} | Score: {scores[i]:.4f}")
+
+        rows = [
+            (columns["src_ip"][i], columns["dst_ip"][i], columns["protocol"][i],
+             float(scores[i]), int(anomalies[i]), now)
+            for i in range(len(features))
+        ]
+        with self.db_lock:
+            try:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+                conn.executemany("""
+                    INSERT INTO ml_alerts (src_ip, dst_ip, protocol, score, anomaly, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+                conn.commit()
+                conn.close()
+            except sqlite3.OperationalError as e:
+                print(f"[ERROR] SQLite write failed: {e}")
+
     def score_flow(self, flow):
         features = self.extract_features(flow)
         score = float(self.model.decision_function(features)[0])
         is_anomaly = int(self.model.predict(features)[0] == -1)
+        self.flows_scored += 1
+        self.anomalies += is_anomaly
 
         if is_anomaly:
             print(f"[ML ALERT] 🚨 {flow['src_ip']} → {flow['dst_ip']} | Score: {score:.4f}")
@@ -0,0 +1,59 @@
+# Benchmark: payload scanning throughput (MB/s) of the content matcher for 100, 1,000 and 10,000 patterns.
+# Every payload is scanned once for all patterns; both matcher backends are measured when available.
+# Usage: python bench_content_match.py [megabytes of payload]
+import os
+import sys
+import time
+import random
+import string
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.content_matcher import ContentMatcher, ahocorasick
+
+PATTERN_COUNTS = (100, 1000, 10000)
+PAYLOAD_MB = 2
+PAYLOAD_SIZE = 1400  # bytes per packet payload
+
+# Step 1: Patterns look like signature strings (keywords, paths, shell fragments)
+def make_patterns(count):
+    alphabet = string.ascii_letters + string.digits + "/._-=%' "
+    return {"".join(random.choice(alphabet) for _ in range(random.randint(4, 16))) for _ in range(count)}
+
+# Step 2: HTTP-ish payloads with the odd planted pattern
+def make_payloads(megabytes, patterns):
+    words = ["GET", "POST", "/index.html", "Host:", "User-Agent:", "Mozilla/5.0", "Accept:", "text/html",
+             "id=", "&", "session", "Cookie:", "\r\n", "HTTP/1.1", "200", "OK", "json", "{", "}"]
+    planted = random.sample(sorted(patterns), min(10, len(patterns)))
+    payloads, total = [], 0
+    while total < megabytes * 1024 * 1024:
+        text = " ".join(random.choice(words) for _ in range(PAYLOAD_SIZE // 5))[:PAYLOAD_SIZE - 16]
+        if random.random() < 0.05:
+            text += random.choice(planted)
+        payload = text.encode()
+        payloads.append(payload)
+        total += len(payload)
+    return payloads, total
+
+def bench(backend, patterns, payloads, total):
+    started = time.perf_counter()
+    matcher = ContentMatcher(backend)
+    for i, pattern in enumerate(patterns):
+        matcher.add(pattern, i)
+    matcher.build()
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    hits = sum(bool(matcher.search(payload)) for payload in payloads)
+    elapsed = time.perf_counter() - started
+    return total / elapsed / 1e6, build, hits
+
+if __name__ == "__main__":
+    random.seed(11)
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else PAYLOAD_MB
+    backends = ["python"] + (["pyahocorasick"] if ahocorasick is not None else [])
+    print(f"[~] {megabytes:g} MB of {PAYLOAD_SIZE}-byte payloads per run; backends: {', '.join(backends)}")
+    print(f"  {'patterns':>8}  {'backend':>13}  {'MB/s':>8}  {'build s':>8}  {'payloads hit':>12}")
+    for count in PATTERN_COUNTS:
+        patterns = make_patterns(count)
+        payloads, total = make_payloads(megabytes, patterns)
+        for backend in backends:
+            mbps, build, hits = bench(backend, patterns, payloads, total)
+            print(f"  {count:>8}  {backend:>13}  {mbps:>8.2f}  {build:>8.3f}  {hits:>12,}")
@@ -0,0 +1,79 @@
+# Benchmark: outbound provider calls and enrichment latency for a stream of flows, without a
+# cache, with the in-memory tier only, and after a restart with the SQLite tier warm.
+# Hosts repeat with a Zipf-like skew, as on a real network; each provider call takes PROVIDER_MS.
+# Usage: python bench_intel_cache.py [flows]
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dashboard.core_lib.intel_cache import EnrichmentCache
+from dashboard.core_lib.threat_intel import ThreatIntel, NO_MATCH
+
+FLOWS = 20000
+HOSTS = 5000
+PROVIDER_MS = 2
+
+# Step 1: ThreatIntel with the four IP providers answered locally, counting the calls
+class CountingIntel(ThreatIntel):
+    calls = 0
+
+    def __init__(self, **kwargs):
+        # Quotas off: the bench measures the cache, not the providers' rate limits.
+        super().__init__(limits={name: {"rate": 1e9, "burst": 1e9} for name in ("abuseipdb", "otx", "misp", "geoip")},
+                         **kwargs)
+
+    async def _answer(self, ip):
+        CountingIntel.calls += 1
+        await asyncio.sleep(PROVIDER_MS / 1000)
+        return {"tags": ["bad"], "score": 30} if hash(ip) % 50 == 0 else dict(NO_MATCH)
+
+    async def _abuseipdb_fetch(self, ip):
+        return await self._answer(ip)
+
+    async def _otx_fetch(self, ip):
+        return await self._answer(ip)
+
+    async def _misp_fetch(self, ip):
+        return await self._answer(ip)
+
+    async def _geoip_fetch(self, ip):
+        await self._answer(ip)
+        return {"city": "x", "country": "y", "latitude": 0.0, "longitude": 0.0}
+
+# Step 2: Flows between a skewed set of hosts
+def make_flows(count):
+    hosts = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(HOSTS)]
+    weights = [1 / (rank + 1) for rank in range(HOSTS)]
+    return list(zip(random.choices(hosts, weights, k=count), random.choices(hosts, weights, k=count)))
+
+async def run(intel, flows):
+    CountingIntel.calls = 0
+    limit = asyncio.Semaphore(16)
+
+    async def enrich(ip):
+        async with limit:
+            return await intel.enrich_ip(ip)
+    started = time.perf_counter()
+    for i in range(0, len(flows), 256):
+        await asyncio.gather(*(enrich(ip) for flow in flows[i:i + 256] for ip in flow))
+    return CountingIntel.calls, (time.perf_counter() - started) / len(flows) * 1e6
+
+if __name__ == "__main__":
+    random.seed(22)
+    flows = make_flows(int(sys.argv[1]) if len(sys.argv) > 1 else FLOWS)
+    db_path = os.path.join(tempfile.mkdtemp(), "intel_cache.db")
+    print(f"[~] {len(flows):,} flows over {HOSTS:,} hosts, {PROVIDER_MS} ms per provider call")
+    print(f"  {'cache':>22}  {'provider calls':>14}  {'µs/flow':>9}  {'hit rate':>8}")
+    calls, us = asyncio.run(run(CountingIntel(), flows))
+    print(f"  {'none':>22}  {calls:>14,}  {us:>9.1f}  {'-':>8}")
+    # Opened one at a time: the restarted cache loads what the first one flushed on close.
+    for name, open_cache in (("memory + SQLite (cold)", lambda: EnrichmentCache(db_path)),
+                             ("SQLite after restart", lambda: EnrichmentCache(db_path)),
+                             ("memory, 1,000 entries", lambda: EnrichmentCache(None, max_entries=1000))):
+        cache = open_cache()
+        calls, us = asyncio.run(run(CountingIntel(cache=cache), flows))
+        print(f"  {name:>22}  {calls:>14,}  {us:>9.1f}  {cache.get_stats()['hit_rate']:>8.1%}")
+        cache.close()
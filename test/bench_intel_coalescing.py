@@ -0,0 +1,71 @@
+# Benchmark: a scan-like burst where many packets involving the same few IPs are enriched at once.
+# Compares one lookup per call (no coalescing) with ThreatIntel.enrich_ip's single flight plus
+# recent-results reuse: provider calls, event-loop tasks created and wall time.
+# Usage: python bench_intel_coalescing.py [calls]
+import os
+import sys
+import time
+import random
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dashboard.core_lib.threat_intel import ThreatIntel, NO_MATCH
+
+CALLS = 5000
+HOT_IPS = 20          # scanners / scanned hosts in the burst
+PROVIDER_MS = 50
+
+# Step 1: ThreatIntel with the four IP providers answered locally, counting the calls
+class CountingIntel(ThreatIntel):
+    calls = 0
+
+    def __init__(self, **kwargs):
+        # Quotas off: the bench measures coalescing, not the providers' rate limits.
+        super().__init__(limits={name: {"rate": 1e9, "burst": 1e9} for name in ("abuseipdb", "otx", "misp", "geoip")},
+                         **kwargs)
+
+    async def _answer(self, ip):
+        CountingIntel.calls += 1
+        await asyncio.sleep(PROVIDER_MS / 1000)
+        return dict(NO_MATCH)
+
+    _abuseipdb_fetch = _otx_fetch = _misp_fetch = _answer
+
+    async def _geoip_fetch(self, ip):
+        await self._answer(ip)
+        return {"city": "x", "country": "y", "latitude": 0.0, "longitude": 0.0}
+
+# Step 2: Count tasks created on the loop
+def count_tasks(loop):
+    created = [0]
+    factory = loop.get_task_factory()
+
+    def task_factory(loop, coro, **kwargs):
+        created[0] += 1
+        return factory(loop, coro, **kwargs) if factory else asyncio.Task(coro, loop=loop, **kwargs)
+    loop.set_task_factory(task_factory)
+    return created
+
+async def burst(lookup, ips):
+    created = count_tasks(asyncio.get_running_loop())
+    CountingIntel.calls = 0
+    started = time.perf_counter()
+    # Packets arrive over ~100 ms; each one enriches its IP as it comes in.
+    pending = []
+    for i, ip in enumerate(ips):
+        pending.append(asyncio.ensure_future(lookup(ip)))
+        if i % 50 == 0:
+            await asyncio.sleep(0.001)
+    await asyncio.gather(*pending)
+    return CountingIntel.calls, created[0] - len(ips), time.perf_counter() - started
+
+if __name__ == "__main__":
+    random.seed(23)
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else CALLS
+    ips = [f"198.51.100.{random.randrange(HOT_IPS)}" for _ in range(calls)]
+    print(f"[~] {calls:,} enrichments of {HOT_IPS} hot IPs, {PROVIDER_MS} ms per provider call")
+    print(f"  {'strategy':>26}  {'provider calls':>14}  {'extra tasks':>11}  {'wall s':>7}")
+    intel = CountingIntel()
+    for name, lookup in (("one lookup per call", intel._enrich_ip), ("single flight + recent", intel.enrich_ip)):
+        provider_calls, tasks, wall = asyncio.run(burst(lookup, ips))
+        print(f"  {name:>26}  {provider_calls:>14,}  {tasks:>11,}  {wall:>7.2f}")
+    print(f"  {intel.get_stats()}")
@@ -0,0 +1,70 @@
+# Benchmark: enrichment latency when one provider hangs and another has occasional slow answers.
+# Compares waiting for every provider (no timeouts, no breaker) with ThreatIntel's guards:
+# per-call timeouts, circuit breakers and a deadline after which partial results are returned.
+# Usage: python bench_intel_tail_latency.py [lookups]
+import os
+import sys
+import time
+import random
+import asyncio
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dashboard.core_lib.threat_intel import ThreatIntel, NO_MATCH
+
+LOOKUPS = 300
+CONCURRENCY = 16
+MISP_HANG_S = 2.0     # MISP is down: every call hangs this long, then fails
+OTX_SPIKE_S = 1.5     # OTX answers in ~30 ms, but 5% of calls take this long
+UNLIMITED = {name: {"rate": 1e9, "burst": 1e9} for name in ("abuseipdb", "otx", "misp", "geoip")}
+
+# Step 1: ThreatIntel with locally simulated providers
+class SimulatedIntel(ThreatIntel):
+    async def _abuseipdb_fetch(self, ip):
+        await asyncio.sleep(random.uniform(0.015, 0.03))
+        return dict(NO_MATCH)
+
+    async def _otx_fetch(self, ip):
+        await asyncio.sleep(OTX_SPIKE_S if random.random() < 0.05 else random.uniform(0.02, 0.04))
+        return dict(NO_MATCH)
+
+    async def _misp_fetch(self, ip):
+        await asyncio.sleep(MISP_HANG_S)
+        raise ConnectionError("MISP unreachable")
+
+    async def _geoip_fetch(self, ip):
+        await asyncio.sleep(random.uniform(0.005, 0.015))
+        return {"city": "x", "country": "y", "latitude": 0.0, "longitude": 0.0}
+
+# Step 2: Unique IPs (no cache hits), CONCURRENCY lookups at a time
+async def run(intel, lookups):
+    limit = asyncio.Semaphore(CONCURRENCY)
+    latencies, partial = [], 0
+
+    async def one(ip):
+        nonlocal partial
+        async with limit:
+            started = time.perf_counter()
+            result = await intel.enrich_ip(ip)
+            latencies.append(time.perf_counter() - started)
+            partial += bool(result.get("partial"))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(f"203.0.{i // 256}.{i % 256}") for i in range(lookups)))
+    wall = time.perf_counter() - started
+    await intel.close()
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    return pick(0.5), pick(0.99), latencies[-1] * 1000, wall, partial
+
+if __name__ == "__main__":
+    random.seed(24)
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else LOOKUPS
+    print(f"[~] {lookups:,} enrichments, {CONCURRENCY} concurrent; MISP hangs {MISP_HANG_S:g}s, "
+          f"5% of OTX calls take {OTX_SPIKE_S:g}s")
+    print(f"  {'strategy':>22}  {'p50 ms':>8}  {'p99 ms':>8}  {'max ms':>8}  {'wall s':>7}  {'partial':>7}")
+    unguarded = SimulatedIntel(deadline=None, failure_threshold=10**9, recent_ttl=0,
+                               limits={name: dict(limits, timeout=None) for name, limits in UNLIMITED.items()})
+    guarded = SimulatedIntel(deadline=0.5, recent_ttl=0,
+                             limits={name: dict(limits, timeout=1.0) for name, limits in UNLIMITED.items()})
+    for name, intel in (("wait for every provider", unguarded), ("timeouts + breakers", guarded)):
+        p50, p99, worst, wall, partial = asyncio.run(run(intel, lookups))
+        print(f"  {name:>22}  {p50:>8.1f}  {p99:>8.1f}  {worst:>8.1f}  {wall:>7.2f}  {partial:>7,}")
+    print(f"  breakers: { {name: stats['state'] for name, stats in guarded.get_stats()['providers'].items()} }")
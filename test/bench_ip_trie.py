@@ -0,0 +1,83 @@
+# Benchmark: cost of answering an IP-set condition as the set grows from 10 to 50,000 prefixes.
+# Compares the longest-prefix-match trie behind src_set / dst_set with a linear scan of the prefixes.
+# Usage: python bench_ip_trie.py [lookups]
+import os
+import sys
+import time
+import random
+import ipaddress
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.ip_trie import AddressFilters, address_filter, ip_to_int
+
+PREFIX_COUNTS = (10, 1000, 10000, 50000)
+LOOKUPS = 20000
+
+# Step 1: A blocklist-like set of random IPv4 prefixes (/8 to /32) plus a few IPv6 ones
+def make_prefixes(count):
+    prefixes = []
+    for _ in range(count):
+        if random.random() < 0.05:
+            net = ipaddress.ip_network(f"2001:db8:{random.randint(0, 0xffff):x}::/{random.choice([32, 48, 64])}",
+                                       strict=False)
+            prefixes.append(str(net))
+        else:
+            plen = random.choice([8, 12, 16, 20, 22, 24, 24, 24, 28, 32])
+            prefixes.append(str(ipaddress.ip_network((random.getrandbits(32), plen), strict=False)))
+    return prefixes
+
+def make_addresses(count, prefixes):
+    # Half the lookups land inside a listed prefix, the rest are random addresses.
+    addresses = []
+    for _ in range(count):
+        if random.random() < 0.5:
+            net = ipaddress.ip_network(random.choice(prefixes))
+            addresses.append(str(net.network_address + random.randrange(min(net.num_addresses, 1 << 16))))
+        else:
+            addresses.append(str(ipaddress.IPv4Address(random.getrandbits(32))))
+    return addresses
+
+# Step 2: Matching strategies
+def bench_trie(prefixes, addresses):
+    started = time.perf_counter()
+    ip_sets = {"blocklist": tuple(address_filter({"dst_cidr": prefixes}, "dst", {})[0])}
+    filters = AddressFilters(ip_sets)
+    compiled = filters.compile(address_filter({"dst_set": "blocklist"}, "dst", ip_sets))
+    filters.build()
+    build = time.perf_counter() - started
+    filters.cache = {}
+    started = time.perf_counter()
+    # Fresh labels per address (no memoization) so the trie walk itself is measured.
+    hits = sum(AddressFilters.accepts(compiled, filters.trie.lookup(*ip_to_int(ip)) or frozenset())
+               for ip in addresses)
+    return (time.perf_counter() - started) / len(addresses) * 1e6, build, hits
+
+def bench_linear(prefixes, addresses):
+    networks = []
+    for prefix in prefixes:
+        net = ipaddress.ip_network(prefix)
+        bits = net.max_prefixlen
+        networks.append((net.version, int(net.network_address), ((1 << bits) - 1) ^ ((1 << (bits - net.prefixlen)) - 1)))
+    started = time.perf_counter()
+    hits = 0
+    for ip in addresses:
+        version, value = ip_to_int(ip)
+        for net_version, net, mask in networks:
+            if version == net_version and value & mask == net:
+                hits += 1
+                break
+    return (time.perf_counter() - started) / len(addresses) * 1e6, hits
+
+if __name__ == "__main__":
+    random.seed(20)
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else LOOKUPS
+    print(f"[~] {lookups:,} lookups per run")
+    print(f"  {'prefixes':>8}  {'trie µs':>8}  {'build s':>8}  {'linear µs':>10}  {'speedup':>8}")
+    for count in PREFIX_COUNTS:
+        prefixes = make_prefixes(count)
+        addresses = make_addresses(lookups, prefixes)
+        ip_to_int.cache_clear()
+        trie_us, build, trie_hits = bench_trie(prefixes, addresses)
+        # The linear scan gets slow quickly; time it on a sample of the lookups.
+        sample = addresses[:max(200, lookups * 10 // count)]
+        linear_us, _ = bench_linear(prefixes, sample)
+        print(f"  {count:>8,}  {trie_us:>8.2f}  {build:>8.3f}  {linear_us:>10.2f}  {linear_us / trie_us:>7.1f}x")
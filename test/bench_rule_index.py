@@ -0,0 +1,66 @@
+# Benchmark: per-packet cost of signature matching as the rule set grows from 10 to 10,000 rules.
+# Compares the compiled RuleIndex with a plain loop over every rule's conditions.
+# Usage: python bench_rule_index.py [packets]
+import os
+import sys
+import time
+import random
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.protocols import protocol_number
+from core.rule_index import RuleIndex
+from core.sliding_window import WindowCounters
+
+RULE_COUNTS = (10, 100, 1000, 10000)
+PACKETS = 50000
+
+# Step 1: Random rules spread over protocols, destination ports and a few networks
+def make_rules(count):
+    rules = []
+    for i in range(count):
+        conditions = {
+            "protocol": random.choice(["TCP", "UDP", "ICMP"]),
+            "dst_port": random.randint(1, 65535),
+            "packet_threshold": 10**9,  # never fires; we only measure matching
+            "time_window": random.choice([10, 60, 300]),
+        }
+        if i % 5 == 0:
+            conditions["dst_cidr"] = f"192.168.{random.randint(0, 255)}.0/24"
+        rules.append({"name": f"rule-{i}", "description": "bench", "severity": "low", "conditions": conditions})
+    return rules
+
+def make_packets(count):
+    return [(f"10.0.{random.randint(0, 255)}.{random.randint(1, 254)}", f"192.168.1.{random.randint(1, 254)}",
+             random.randint(1024, 65535), random.choice([22, 53, 80, 443, random.randint(1, 65535)]),
+             random.choice([6, 6, 6, 17]))
+            for _ in range(count)]
+
+# Step 2: Matching strategies
+def bench_index(rules, packets):
+    index = RuleIndex(rules)
+    start = time.perf_counter()
+    for i, key in enumerate(packets):
+        for _ in index.match(key, i * 0.001):
+            pass
+    return (time.perf_counter() - start) / len(packets)
+
+def bench_linear(rules, packets):
+    windows = [WindowCounters(rule["conditions"]["time_window"]) for rule in rules]
+    start = time.perf_counter()
+    for i, key in enumerate(packets):
+        for rule, window in zip(rules, windows):
+            conditions = rule["conditions"]
+            if protocol_number(conditions["protocol"]) != key[4] or conditions["dst_port"] != key[3]:
+                continue
+            window.add((key[0], key[1], key[4]), i * 0.001)
+    return (time.perf_counter() - start) / len(packets)
+
+if __name__ == "__main__":
+    random.seed(7)
+    packets = make_packets(int(sys.argv[1]) if len(sys.argv) > 1 else PACKETS)
+    print(f"[~] {len(packets)} packets per run")
+    print(f"  {'rules':>6}  {'indexed us/pkt':>15}  {'linear us/pkt':>14}")
+    for count in RULE_COUNTS:
+        rules = make_rules(count)
+        indexed = bench_index(rules, packets) * 1e6
+        linear = bench_linear(rules, packets[:max(len(packets) * 10 // count, 100)]) * 1e6
+        print(f"  {count:>6}  {indexed:>15.2f}  {linear:>14.2f}")
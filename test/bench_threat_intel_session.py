@@ -0,0 +1,74 @@
+# Benchmark: latency of threat-intel style HTTP lookups with a new aiohttp session per call
+# versus ThreatIntel's shared pooled session, against a local provider stub.
+# The stub answers after PROVIDER_MS, so anything above that is connection overhead; real
+# providers add DNS and a TLS handshake on top, which the shared session also skips.
+# Usage: python bench_threat_intel_session.py [lookups]
+import os
+import sys
+import time
+import asyncio
+from aiohttp import ClientSession, web
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dashboard.core_lib.threat_intel import ThreatIntel
+
+LOOKUPS = 500
+CONCURRENCY = 16
+PROVIDER_MS = 5
+
+# Step 1: A provider stub answering JSON after a fixed delay
+async def start_provider():
+    async def handle(request):
+        await asyncio.sleep(PROVIDER_MS / 1000)
+        return web.json_response({"data": {"abuseConfidenceScore": 0}})
+    app = web.Application()
+    app.router.add_get("/check", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/check"
+
+# Step 2: Lookup strategies
+async def per_call_session(url):
+    async with ClientSession() as session:
+        async with session.get(url) as r:
+            return await r.json()
+
+def shared_session(intel):
+    async def lookup(url):
+        session = await intel.session()
+        async with session.get(url) as r:
+            return await r.json()
+    return lookup
+
+async def bench(lookup, url, lookups):
+    limit = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one():
+        async with limit:
+            started = time.perf_counter()
+            await lookup(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(lookups)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], lookups / elapsed
+
+async def main(lookups):
+    runner, url = await start_provider()
+    intel = ThreatIntel(limit_per_host=CONCURRENCY)
+    try:
+        print(f"[~] {lookups:,} lookups, {CONCURRENCY} concurrent, provider answers in {PROVIDER_MS} ms")
+        print(f"  {'strategy':>18}  {'p50 ms':>8}  {'p99 ms':>8}  {'lookups/s':>10}")
+        for name, lookup in (("session per call", per_call_session), ("shared session", shared_session(intel))):
+            p50, p99, rate = await bench(lookup, url, lookups)
+            print(f"  {name:>18}  {p50:>8.2f}  {p99:>8.2f}  {rate:>10,.0f}")
+    finally:
+        await intel.close()
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else LOOKUPS))
@@ -0,0 +1,83 @@
+import os
+import sys
+import sqlite3
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.alert_engine import AlertEngine
+from core.alert_outbox import prepare_outbox
+from core.signature_engine import prepare_alerts
+from dashboard.core_lib.threat_intel import ThreatIntel, NO_MATCH
+
+LISTED = "203.0.113.7"
+PACKETS = 50
+
+class ListedIntel(ThreatIntel):
+    """Providers answered locally: only LISTED has a bad reputation."""
+
+    async def _abuseipdb_fetch(self, ip):
+        return {"tags": ["abuseipdb_high"], "score": 40} if ip == LISTED else dict(NO_MATCH)
+
+    async def _otx_fetch(self, ip):
+        return dict(NO_MATCH)
+
+    async def _misp_fetch(self, ip):
+        return dict(NO_MATCH)
+
+    async def _geoip_fetch(self, ip):
+        return {}
+
+def make_db(tmp_path):
+    db_path = str(tmp_path / "ids.db")
+    conn = sqlite3.connect(db_path)
+    prepare_alerts(conn)
+    prepare_outbox(conn)
+    conn.commit()
+    conn.close()
+    return db_path
+
+def send_packets(engine):
+    for i in range(PACKETS):
+        flow = {"src_ip": LISTED, "dst_ip": "10.0.0.1", "src_port": 40000 + i, "dst_port": 443,
+                "protocol": "TCP", "timestamp": 1000.0 + i * 0.1, "packet_size": 60}
+        assert engine.submit((LISTED, "10.0.0.1", 40000 + i, 443, 6), flow)
+    engine.close()
+
+def stored(db_path):
+    conn = sqlite3.connect(db_path)
+    alerts = conn.execute("SELECT type, source_ip FROM alerts").fetchall()
+    notifications = conn.execute("SELECT COUNT(*) FROM alert_outbox").fetchone()[0]
+    conn.close()
+    return alerts, notifications
+
+def test_provider_match_from_one_ip_is_stored_once_per_window(tmp_path):
+    db_path = make_db(tmp_path)
+    engine = AlertEngine(None, None, None, None, db_path=db_path, feeds_dir=str(tmp_path / "no_feeds"))
+    engine.threat_intel = ListedIntel(cache=None)
+    send_packets(engine)
+    alerts, notifications = stored(db_path)
+    assert alerts == [("THREAT_INTEL_MATCH", LISTED)]
+    assert notifications == 2  # slack + email, once
+    assert engine.worker.get_stats()["suppressed"] == PACKETS - 1
+
+def test_feed_match_from_one_ip_is_stored_once_per_window(tmp_path):
+    db_path = make_db(tmp_path)
+    feeds = tmp_path / "feeds"
+    feeds.mkdir()
+    for provider in ("abuseipdb", "otx", "misp"):
+        (feeds / f"{provider}.txt").write_text(f"{LISTED}\n")
+    engine = AlertEngine(None, None, None, None, db_path=db_path, feeds_dir=str(feeds))
+    assert engine.threat_intel.local_only
+    send_packets(engine)
+    alerts, _ = stored(db_path)
+    assert alerts == [("THREAT_INTEL_MATCH", LISTED)]
+
+def test_notifications_are_titled_by_alert_kind(tmp_path):
+    db_path = make_db(tmp_path)
+    engine = AlertEngine(None, None, None, None, db_path=db_path, feeds_dir=str(tmp_path / "no_feeds"))
+    engine.threat_intel = ListedIntel(cache=None)
+    send_packets(engine)
+    conn = sqlite3.connect(db_path)
+    subjects = conn.execute("SELECT subject FROM alert_outbox WHERE channel = 'email'").fetchall()
+    slack = conn.execute("SELECT body FROM alert_outbox WHERE channel = 'slack'").fetchone()[0]
+    conn.close()
+    assert subjects == [("Threat Intel Alert: THREAT_INTEL_MATCH",)]
+    assert slack.startswith("[Threat Intel Alert]")
@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import sqlite3
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import core.alerting as alerting
+from core.alert_outbox import OutboxDispatcher, enqueue
+
+@pytest.fixture(autouse=True)
+def no_api_channel(monkeypatch):
+    monkeypatch.setattr(alerting, "ENABLE_API_ALERTING", False)
+
+class FakeChannel:
+    """Records every digest it is given; fails while `failing` is set."""
+
+    def __init__(self, failing=False):
+        self.failing = failing
+        self.digests = []
+
+    def send(self, items):
+        if self.failing:
+            raise ConnectionError("channel down")
+        self.digests.append([item["body"] for item in items])
+
+    def close(self):
+        pass
+
+def make_dispatcher(tmp_path, **kwargs):
+    dispatcher = OutboxDispatcher(db_path=str(tmp_path / "ids.db"), **kwargs)
+    dispatcher.channels = {"slack": FakeChannel(), "email": FakeChannel(), "api": FakeChannel()}
+    conn = sqlite3.connect(dispatcher.db_path)
+    conn.row_factory = sqlite3.Row
+    return dispatcher, conn
+
+def rows(conn):
+    return conn.execute("SELECT attempts, next_attempt, status FROM alert_outbox ORDER BY id").fetchall()
+
+def test_due_notifications_are_sent_in_digests_of_batch_size(tmp_path):
+    dispatcher, conn = make_dispatcher(tmp_path, batch_size=3)
+    for i in range(7):
+        enqueue(conn, "slack", f"alert {i}")
+    enqueue(conn, "email", "mail", subject="subject")
+    conn.commit()
+    dispatcher.drain(conn)
+    assert dispatcher.channels["slack"].digests == [["alert 0", "alert 1", "alert 2"],
+                                                    ["alert 3", "alert 4", "alert 5"], ["alert 6"]]
+    assert dispatcher.channels["email"].digests == [["mail"]]
+    assert dispatcher.stats["sent"] == 8 and dispatcher.stats["digests"] == 4
+    assert rows(conn) == []
+
+def test_failed_digest_backs_off_exponentially(tmp_path):
+    dispatcher, conn = make_dispatcher(tmp_path, base_delay=2.0, max_delay=20.0, max_attempts=10)
+    dispatcher.channels["slack"].failing = True
+    enqueue(conn, "slack", "alert")
+    conn.commit()
+    delays = []
+    for _ in range(5):
+        started = time.time()
+        dispatcher.drain(conn)
+        attempts, next_attempt, status = rows(conn)[0]
+        delays.append(next_attempt - started)
+        assert status == "pending"
+        conn.execute("UPDATE alert_outbox SET next_attempt = 0")  # due again right away
+        conn.commit()
+    assert attempts == 5
+    # 2, 4, 8, 16, then capped at 20 seconds, each with +-20% jitter.
+    for delay, expected in zip(delays, (2, 4, 8, 16, 20)):
+        assert expected * 0.8 - 0.1 <= delay <= expected * 1.2 + 0.1
+    assert dispatcher.stats["failures"] == 5 and dispatcher.stats["sent"] == 0
+
+def test_notification_not_yet_due_is_left_alone(tmp_path):
+    dispatcher, conn = make_dispatcher(tmp_path)
+    enqueue(conn, "slack", "alert")
+    conn.execute("UPDATE alert_outbox SET next_attempt = ?", (time.time() + 60,))
+    conn.commit()
+    dispatcher.drain(conn)
+    assert dispatcher.channels["slack"].digests == []
+    assert len(rows(conn)) == 1
+
+def test_notification_is_marked_failed_after_max_attempts(tmp_path):
+    dispatcher, conn = make_dispatcher(tmp_path, max_attempts=3)
+    dispatcher.channels["slack"].failing = True
+    enqueue(conn, "slack", "alert")
+    conn.commit()
+    for _ in range(5):
+        dispatcher.drain(conn)
+        conn.execute("UPDATE alert_outbox SET next_attempt = 0")
+        conn.commit()
+    assert [tuple(row)[::2] for row in rows(conn)] == [(3, "failed")]
+    assert dispatcher.stats["failed"] == 1
+    # A failed row is not retried, even once the channel recovers.
+    dispatcher.channels["slack"].failing = False
+    dispatcher.drain(conn)
+    assert dispatcher.channels["slack"].digests == []
+    assert dispatcher.queue_depth()["slack"] == 0
+
+def test_alert_reuses_one_outbox_connection(tmp_path):
+    db_path = str(tmp_path / "ids.db")
+    flow = {"src_ip": "10.0.0.1", "dst_ip": "10.0.0.2", "protocol": "TCP", "packet_count": 3,
+            "total_size": 180, "timestamp": 1000.0}
+    alerting.alert(flow, db_path=db_path)
+    conn = alerting._outbox_conns[db_path]
+    alerting.alert(flow, db_path=db_path)
+    assert alerting._outbox_conns[db_path] is conn
+    reader = sqlite3.connect(db_path)
+    assert reader.execute("SELECT channel, COUNT(*) FROM alert_outbox GROUP BY channel").fetchall() == [
+        ("email", 2), ("slack", 2)]
+    reader.close()
+    alerting._outbox_conns.pop(db_path).close()
+
+def test_alert_joins_the_callers_transaction(tmp_path):
+    dispatcher, conn = make_dispatcher(tmp_path)
+    alerting.alert({"src_ip": "10.0.0.1", "dst_ip": "10.0.0.2", "protocol": "TCP", "packet_count": 3,
+                    "total_size": 180, "timestamp": 1000.0}, conn=conn)
+    conn.rollback()
+    assert rows(conn) == []
+    assert str(tmp_path / "ids.db") not in alerting._outbox_conns
@@ -0,0 +1,65 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.alert_suppression import AlertSuppressor
+from core.signature_engine import SignatureEngine
+
+def test_first_firing_passes_and_repeats_are_held_down():
+    suppressor = AlertSuppressor(hold_down=10, sweep_interval=0)
+    assert not suppressor.suppress("a", 100.0, "first")
+    assert all(suppressor.suppress("a", 100.0 + i, f"repeat {i}") for i in range(1, 5))
+    assert suppressor.suppressed == 4
+    assert suppressor.expire(109.9) == []
+    assert suppressor.expire(110.0) == [("a", 5, 4.0, "repeat 4")]
+    assert len(suppressor) == 0
+    # The hold-down is over: the next firing is emitted again.
+    assert not suppressor.suppress("a", 111.0, "again")
+
+def test_single_firing_window_closes_without_summary():
+    suppressor = AlertSuppressor(hold_down=10, sweep_interval=0)
+    assert not suppressor.suppress("a", 100.0, None)
+    assert suppressor.expire(200.0) == []
+    assert len(suppressor) == 0
+
+def test_summary_counts_firings_per_key():
+    suppressor = AlertSuppressor(hold_down=60, sweep_interval=0)
+    for key, firings in (("a", 3), ("b", 1), ("c", 7)):
+        for i in range(firings):
+            suppressor.suppress(key, 100.0 + i, key)
+    assert sorted((key, firings) for key, firings, _, _ in suppressor.expire_all()) == [("a", 3), ("c", 7)]
+
+def test_firing_after_hold_down_reopens_the_window_and_queues_the_summary():
+    suppressor = AlertSuppressor(hold_down=10, sweep_interval=1000)
+    suppressor.suppress("a", 100.0, None)
+    suppressor.suppress("a", 105.0, None)
+    # Not swept yet (long sweep interval), but the late firing closes the old window itself.
+    assert not suppressor.suppress("a", 120.0, None)
+    assert suppressor.expire(120.0) == [("a", 2, 5.0, None)]
+
+def test_per_firing_hold_down_override_and_disable():
+    suppressor = AlertSuppressor(hold_down=60, sweep_interval=0)
+    suppressor.suppress("short", 100.0, None, hold_down=2)
+    assert suppressor.suppress("short", 101.0, None, hold_down=2)
+    assert [key for key, *_ in suppressor.expire(102.0)] == ["short"]
+    assert not any(suppressor.suppress("off", 100.0 + i, None, hold_down=0) for i in range(5))
+    assert len(suppressor) == 0
+
+def test_signature_engine_emits_one_summary_per_suppressed_key(tmp_path):
+    rules = tmp_path / "rules.yaml"
+    rules.write_text("- name: Any TCP\n  description: every TCP packet\n"
+                     "  conditions: {protocol: TCP, packet_threshold: 1, time_window: 10}\n")
+    alerts = []
+    engine = SignatureEngine(db_path=str(tmp_path / "ids.db"), rules_path=str(rules), alert_sink=alerts.append,
+                             ip_sets_path=str(tmp_path / "ip_sets.yaml"), suppress_window=30)
+    firings = {"10.0.0.1": 6, "10.0.0.2": 3, "10.0.0.3": 1}
+    for src_ip, count in firings.items():
+        for i in range(count):
+            engine.check_rules({"flow_key": (src_ip, "10.0.0.9", 40000, 80, 6), "src_ip": src_ip,
+                                "dst_ip": "10.0.0.9", "protocol": "TCP", "packet_size": 60,
+                                "timestamp": 100.0 + i})
+    first = [a["src_ip"] for a in alerts]
+    engine.close()
+    summaries = alerts[len(first):]
+    assert sorted(first) == sorted(firings)
+    assert sorted((a["src_ip"], a["occurrences"]) for a in summaries) == [("10.0.0.1", 6), ("10.0.0.2", 3)]
+    assert all("fired" in a["description"] for a in summaries)
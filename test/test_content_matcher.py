@@ -0,0 +1,54 @@
+import os
+import sys
+import random
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.content_matcher import ContentMatcher, ahocorasick
+
+BACKENDS = ["python", pytest.param("pyahocorasick", marks=pytest.mark.skipif(
+    ahocorasick is None, reason="pyahocorasick not installed"))]
+
+def naive(patterns, payload):
+    """What the automaton must find: plain substring tests, lower-casing both sides for nocase."""
+    payload = bytes(payload)
+    return {value for pattern, value, nocase in patterns
+            if (pattern.lower() in payload.lower() if nocase else pattern in payload)}
+
+def build(backend, patterns):
+    matcher = ContentMatcher(backend)
+    for pattern, value, nocase in patterns:
+        matcher.add(pattern, value, nocase=nocase)
+    return matcher.build()
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_overlapping_patterns_are_all_reported(backend):
+    patterns = [(p.encode(), p, False) for p in ("he", "she", "his", "hers", "s", "ushers!")]
+    matcher = build(backend, patterns)
+    assert matcher.search(b"ushers") == {"he", "she", "hers", "s"}
+    assert matcher.search(b"this") == {"his", "s"}
+    assert matcher.search(b"xyz") == set()
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_nocase_and_exact_patterns_together(backend):
+    patterns = [(b"GET /admin", "admin", True), (b"Cookie", "cookie", False), (b"\xff\xfeAB", "binary", True)]
+    matcher = build(backend, patterns)
+    assert matcher.search(b"get /ADMIN HTTP/1.1\r\ncookie: x") == {"admin"}
+    assert matcher.search(memoryview(b"GET /Admin\r\nCookie: x\xff\xfeab")) == {"admin", "cookie", "binary"}
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_random_patterns_match_naive_substring_search(backend):
+    rng = random.Random(16)
+    alphabet = b"abAB\x00\xff"
+    for _ in range(50):
+        patterns = []
+        for number in range(rng.randint(1, 12)):
+            pattern = bytes(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+            patterns.append((pattern, number, rng.random() < 0.4))
+        matcher = build(backend, patterns)
+        for _ in range(20):
+            payload = bytes(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            assert matcher.search(payload) == naive(patterns, payload)
+
+def test_empty_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        ContentMatcher().add("", "empty")
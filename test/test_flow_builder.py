@@ -0,0 +1,45 @@
+import os
+import sys
+import sqlite3
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.flow_builder import FlowBuilder
+
+FLOWS = 20
+
+def packet(i, size=60):
+    key = (f"10.0.0.{i}", "10.0.1.1", 40000 + i, 443, 6)
+    return {"flow_key": key, "packet_size": size, "timestamp": 1000.0 + i * 0.01, "tcp_flags": 0x02}
+
+def test_flush_keeps_flow_ids_when_another_writer_inserts_flows(tmp_path):
+    db_path = str(tmp_path / "flows.db")
+    builder = FlowBuilder(db_path=db_path, flush_interval=0.05, packet_clock=True,
+                          on_flow_closed=lambda closed: None)
+    conn = sqlite3.connect(db_path)
+    # Another writer adding its own rows to `flows` inside every flush transaction.
+    conn.execute("""
+        CREATE TRIGGER mirror_flows AFTER INSERT ON flows WHEN NEW.protocol != 'MIRROR'
+        BEGIN
+            INSERT INTO flows (src_ip, dst_ip, protocol) VALUES ('192.0.2.1', '192.0.2.2', 'MIRROR');
+        END
+    """)
+    conn.commit()
+    for i in range(FLOWS):
+        builder.update_flow(packet(i))
+    builder.drain()
+    builder.close()
+
+    records = list(builder.flows.values())
+    assert len(records) == FLOWS
+    for record in records:
+        row = conn.execute("SELECT src_ip, src_port FROM flows WHERE id = ?", (record["id"],)).fetchone()
+        assert row == (record["src_ip"], record["src_port"])
+
+    # Later flushes update those rows in place, not the mirrored ones.
+    for record in records:
+        record["packet_count"] += 1
+        builder.dirty.add((record["src_ip"], record["dst_ip"], record["src_port"], record["dst_port"], record["proto"]))
+    builder._flush(conn)
+    assert conn.execute("SELECT COUNT(*) FROM flows WHERE protocol = 'MIRROR'").fetchone()[0] == FLOWS
+    assert conn.execute("SELECT SUM(packet_count) FROM flows WHERE protocol != 'MIRROR'").fetchone()[0] == 2 * FLOWS
+    assert conn.execute("SELECT SUM(packet_count) FROM flows WHERE protocol = 'MIRROR'").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,64 @@
+import os
+import sys
+import asyncio
+import sqlite3
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dashboard.core_lib.intel_cache import EnrichmentCache
+from dashboard.core_lib.threat_intel import ThreatIntel, NO_MATCH
+
+BAD = {"tags": ["otx_malicious"], "score": 30}
+
+def test_answers_stored_by_another_process_are_read_through(tmp_path):
+    db_path = str(tmp_path / "ids.db")
+    sensor, dashboard = EnrichmentCache(db_path), EnrichmentCache(db_path)
+    try:
+        sensor.put("otx", "198.51.100.1", BAD)
+        assert sensor.flush()
+        assert dashboard.get("otx", "198.51.100.1") is EnrichmentCache.MISSING  # memory only
+        assert dashboard.load("otx", "198.51.100.1") == BAD
+        assert dashboard.get("otx", "198.51.100.1") == BAD  # now in its memory tier
+        assert dashboard.load("otx", "198.51.100.2") is EnrichmentCache.MISSING
+        assert dashboard.get_stats()["disk_hits"] == 1
+    finally:
+        sensor.close()
+        dashboard.close()
+
+def test_threat_intel_uses_the_table_before_calling_the_provider(tmp_path):
+    db_path = str(tmp_path / "ids.db")
+    calls = []
+
+    class CountingIntel(ThreatIntel):
+        async def _otx_fetch(self, ip):
+            calls.append(ip)
+            return dict(NO_MATCH)
+    other = EnrichmentCache(db_path)
+    other.put("otx", "198.51.100.1", BAD)
+    other.close()  # flushes
+    cache = EnrichmentCache(db_path)
+    try:
+        intel = CountingIntel(cache=cache)
+        for _ in range(2):
+            results, partial = asyncio.run(intel._query("198.51.100.1", (("otx", intel._otx_fetch, NO_MATCH),)))
+            assert results == [BAD] and partial == {}
+        assert calls == []
+    finally:
+        cache.close()
+
+def test_failed_flush_keeps_the_batch_for_the_next_one(tmp_path):
+    db_path = str(tmp_path / "ids.db")
+    cache = EnrichmentCache(db_path, flush_interval=3600)
+    cache.conn.execute("PRAGMA busy_timeout = 50")
+    blocker = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        cache.put("otx", "198.51.100.1", BAD)
+        blocker.execute("BEGIN EXCLUSIVE")
+        assert not cache.flush()
+        cache.put("misp", "198.51.100.1", dict(NO_MATCH), negative=True)
+        assert cache.get_stats()["pending"] == 2 and cache.get_stats()["flush_failures"] == 1
+        blocker.execute("COMMIT")
+        assert cache.flush()
+        rows = blocker.execute("SELECT provider, negative FROM intel_cache ORDER BY provider").fetchall()
+        assert rows == [("misp", 1), ("otx", 0)]
+    finally:
+        blocker.close()
+        cache.close()
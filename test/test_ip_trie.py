@@ -0,0 +1,79 @@
+import os
+import sys
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.ip_trie import AddressFilters, PrefixTrie, address_filter, ip_to_int, parse_prefix
+
+def trie_of(*prefixes):
+    trie = PrefixTrie()
+    for prefix in prefixes:
+        trie.insert(*parse_prefix(prefix), prefix)
+    return trie
+
+def lookup(trie, ip):
+    return trie.lookup(*ip_to_int(ip))
+
+@pytest.mark.parametrize("ip, expected", [
+    ("10.1.2.3", "10.1.2.0/24"),
+    ("10.1.3.3", "10.1.0.0/16"),
+    ("10.2.0.1", "10.0.0.0/8"),
+    ("10.1.2.200", "10.1.2.128/25"),
+    ("10.1.2.127", "10.1.2.0/24"),
+    ("10.1.2.5", "10.1.2.5/32"),
+    ("11.0.0.1", None),
+])
+def test_longest_prefix_wins(ip, expected):
+    # Inserted in every order: the result must not depend on it.
+    prefixes = ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "10.1.2.128/25", "10.1.2.5/32"]
+    assert lookup(trie_of(*prefixes), ip) == expected
+    assert lookup(trie_of(*reversed(prefixes)), ip) == expected
+
+@pytest.mark.parametrize("prefixes", [("192.168.0.0/22", "192.168.2.0/23"), ("192.168.2.0/23", "192.168.0.0/22")])
+def test_prefixes_ending_in_the_same_byte(prefixes):
+    # Both expand over byte values of the third byte; the /23 must keep its two.
+    trie = trie_of(*prefixes)
+    assert lookup(trie, "192.168.1.9") == "192.168.0.0/22"
+    assert lookup(trie, "192.168.3.9") == "192.168.2.0/23"
+    assert lookup(trie, "192.168.4.9") is None
+
+def test_default_route_and_ipv6_are_kept_apart():
+    trie = trie_of("0.0.0.0/0", "2001:db8::/32", "2001:db8:1::/48")
+    assert lookup(trie, "8.8.8.8") == "0.0.0.0/0"
+    assert lookup(trie, "2001:db8:1::7") == "2001:db8:1::/48"
+    assert lookup(trie, "2001:db8:2::7") == "2001:db8::/32"
+    assert lookup(trie, "2001:db9::1") is None
+    assert lookup(trie, "not an ip") is None
+
+def compiled(filters, conditions, side="src"):
+    return filters.compile(address_filter(conditions, side, filters.ip_sets))
+
+def test_labels_are_inherited_from_overlapping_prefixes():
+    ip_sets = {"internal": (parse_prefix("10.0.0.0/8"),), "lab": (parse_prefix("10.1.2.0/24"),)}
+    filters = AddressFilters(ip_sets)
+    wide = compiled(filters, {"src_set": "internal"})
+    narrow = compiled(filters, {"src_cidr": "10.1.0.0/16"})
+    lab_only = compiled(filters, {"src_set": "lab"})
+    not_lab = compiled(filters, {"src_set": "internal", "src_not_set": "lab"})
+    filters.build()
+    # 10.1.2.3 sits in all three prefixes, so it carries the labels of each, not just the /24's.
+    labels = filters.lookup("10.1.2.3")
+    assert all(AddressFilters.accepts(spec, labels) for spec in (wide, narrow, lab_only))
+    assert not AddressFilters.accepts(not_lab, labels)
+    labels = filters.lookup("10.1.9.9")
+    assert AddressFilters.accepts(wide, labels) and AddressFilters.accepts(narrow, labels)
+    assert AddressFilters.accepts(not_lab, labels)
+    assert not AddressFilters.accepts(lab_only, labels)
+    assert filters.lookup("172.16.0.1") == frozenset()
+
+def test_rule_needing_a_cidr_and_a_set_needs_both():
+    filters = AddressFilters({"dmz": (parse_prefix("192.0.2.0/24"),)})
+    both = compiled(filters, {"dst_cidr": ["192.0.2.0/25"], "dst_set": "dmz"}, side="dst")
+    filters.build()
+    assert AddressFilters.accepts(both, filters.lookup("192.0.2.10"))
+    assert not AddressFilters.accepts(both, filters.lookup("192.0.2.200"))
+
+def test_unknown_set_and_bad_cidr_are_rejected():
+    with pytest.raises(ValueError):
+        address_filter({"src_set": "nope"}, "src", {})
+    with pytest.raises(ValueError):
+        address_filter({"src_cidr": "10.0.0.0/33"}, "src", {})
@@ -0,0 +1,100 @@
+import os
+import sys
+import struct
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.pcap_reader import (PCAP_MAGIC_NSEC, PCAP_MAGIC_USEC, PCAPNG_EPB, PCAPNG_IDB, PCAPNG_SHB, PCAPNG_SPB,
+                              PcapNgReader, PcapReader, open_capture)
+
+FRAMES = [bytes(range(60)), b"\xaa" * 1514, b"\x01\x02\x03"]
+TIMESTAMPS = [1700000000.25, 1700000001.5, 1700000002.000125]
+
+def read_all(reader):
+    with reader:
+        return [(ts, bytes(frame)) for ts, frame in reader], reader.linktype
+
+# Step 1: Classic pcap, either byte order and either timestamp resolution
+def write_pcap(path, endian="<", nsec=False, snaplen=65535, linktype=1, trailing=b""):
+    magic = PCAP_MAGIC_NSEC if nsec else PCAP_MAGIC_USEC
+    scale = 10 ** 9 if nsec else 10 ** 6
+    data = struct.pack(endian + "IHHiIII", magic, 2, 4, 0, 0, snaplen, linktype)
+    for ts, frame in zip(TIMESTAMPS, FRAMES):
+        captured = frame[:snaplen]
+        seconds = int(ts)
+        data += struct.pack(endian + "IIII", seconds, round((ts - seconds) * scale), len(captured), len(frame))
+        data += captured
+    path.write_bytes(data + trailing)
+    return str(path)
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+@pytest.mark.parametrize("nsec", [False, True])
+def test_pcap_frames_and_timestamps(tmp_path, endian, nsec):
+    records, linktype = read_all(open_capture(write_pcap(tmp_path / "a.pcap", endian, nsec)))
+    assert linktype == 1
+    assert [frame for _, frame in records] == FRAMES
+    assert [ts for ts, _ in records] == pytest.approx(TIMESTAMPS, abs=1e-6)
+
+def test_pcap_snaplen_truncates_frames(tmp_path):
+    reader = PcapReader(write_pcap(tmp_path / "a.pcap", snaplen=64, linktype=101))
+    assert reader.snaplen == 64
+    records, linktype = read_all(reader)
+    assert linktype == 101
+    assert [len(frame) for _, frame in records] == [60, 64, 3]
+
+@pytest.mark.parametrize("trailing", [b"\x00" * 10, struct.pack("<IIII", 1, 0, 100, 100) + b"\x00" * 40])
+def test_pcap_truncated_trailing_record_is_dropped(tmp_path, trailing):
+    records, _ = read_all(PcapReader(write_pcap(tmp_path / "a.pcap", trailing=trailing)))
+    assert [frame for _, frame in records] == FRAMES
+
+def test_unknown_magic_is_rejected(tmp_path):
+    path = tmp_path / "a.pcap"
+    path.write_bytes(b"\x00" * 24)
+    with pytest.raises(ValueError):
+        PcapReader(str(path))
+
+# Step 2: pcapng with an EPB per frame, plus SPBs and options
+def block(endian, block_type, body):
+    body += b"\x00" * (-len(body) % 4)
+    length = 12 + len(body)
+    return struct.pack(endian + "II", block_type, length) + body + struct.pack(endian + "I", length)
+
+def write_pcapng(path, endian="<", tsresol=None, snaplen=0, linktype=1, simple=False, trailing=b""):
+    data = block(endian, PCAPNG_SHB, struct.pack(endian + "IHHq", 0x1A2B3C4D, 1, 0, -1))
+    options = b""
+    if tsresol is not None:
+        options = struct.pack(endian + "HHB3x", 9, 1, tsresol) + struct.pack(endian + "HH", 0, 0)
+    data += block(endian, PCAPNG_IDB, struct.pack(endian + "HHI", linktype, 0, snaplen) + options)
+    units = 10 ** (tsresol or 6)
+    for ts, frame in zip(TIMESTAMPS, FRAMES):
+        if simple:
+            data += block(endian, PCAPNG_SPB, struct.pack(endian + "I", len(frame)) + frame)
+            continue
+        ticks = round(ts * units)
+        captured = frame[:snaplen] if snaplen else frame
+        data += block(endian, PCAPNG_EPB, struct.pack(endian + "IIIII", 0, ticks >> 32, ticks & 0xFFFFFFFF,
+                                                      len(captured), len(frame)) + captured)
+    path.write_bytes(data + trailing)
+    return str(path)
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+@pytest.mark.parametrize("tsresol", [None, 9])
+def test_pcapng_frames_and_timestamps(tmp_path, endian, tsresol):
+    reader = open_capture(write_pcapng(tmp_path / "a.pcapng", endian, tsresol, linktype=113))
+    assert isinstance(reader, PcapNgReader)
+    records, linktype = read_all(reader)
+    assert linktype == 113
+    assert [frame for _, frame in records] == FRAMES
+    assert [ts for ts, _ in records] == pytest.approx(TIMESTAMPS, abs=1e-6)
+
+def test_pcapng_snaplen_truncates_frames(tmp_path):
+    records, _ = read_all(PcapNgReader(write_pcapng(tmp_path / "a.pcapng", snaplen=64)))
+    assert [len(frame) for _, frame in records] == [60, 64, 3]
+
+def test_pcapng_simple_packet_blocks_honour_snaplen(tmp_path):
+    records, _ = read_all(PcapNgReader(write_pcapng(tmp_path / "a.pcapng", snaplen=64, simple=True)))
+    assert [frame for _, frame in records] == [FRAMES[0], FRAMES[1][:64], FRAMES[2]]
+
+def test_pcapng_truncated_trailing_block_is_dropped(tmp_path):
+    whole = block("<", PCAPNG_EPB, struct.pack("<IIIII", 0, 0, 0, 100, 100) + b"\x00" * 100)
+    records, _ = read_all(PcapNgReader(write_pcapng(tmp_path / "a.pcapng", trailing=whole[:-30])))
+    assert [frame for _, frame in records] == FRAMES
@@ -0,0 +1,103 @@
+import os
+import sys
+import asyncio
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from dashboard.core_lib.provider_limits import CircuitBreaker, ProviderGuard, TokenBucket, make_guards
+from dashboard.core_lib.threat_intel import ProviderUnavailable, ThreatIntel
+
+class FakeClock:
+    """Monotonic clock that only moves when the test says so."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+def test_token_bucket_spends_the_burst_then_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=3, clock=clock)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+    clock.advance(0.4)
+    assert not bucket.take()  # 0.8 of a token
+    clock.advance(0.1)
+    assert bucket.take()
+    clock.advance(3600)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]  # never more than the burst
+
+def test_breaker_opens_then_half_opens_then_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30.0, clock=clock)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    clock.advance(29.9)
+    assert not breaker.allow()
+    clock.advance(0.1)
+    assert breaker.state == "half-open"
+    assert breaker.allow()        # the probe
+    assert not breaker.allow()    # only one at a time
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_failed_probe_doubles_the_cooldown_up_to_the_cap():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10.0, max_cooldown=35.0, clock=clock)
+    breaker.failure()
+    for cooldown in (20.0, 35.0, 35.0):
+        clock.advance(breaker.cooldown)
+        assert breaker.allow()
+        breaker.failure()
+        assert breaker.cooldown == cooldown and breaker.state == "open"
+    clock.advance(35.0)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.cooldown == 10.0
+
+def test_guard_releases_the_probe_when_rate_limited():
+    clock = FakeClock()
+    guard = ProviderGuard("otx", rate=0.1, burst=1, timeout=1.0, failure_threshold=1, cooldown=5.0, clock=clock)
+    assert guard.admit() is None
+    guard.record("error")
+    assert guard.admit() == "circuit_open"
+    clock.advance(5.0)
+    assert guard.admit() == "rate_limited"  # breaker would allow the probe, but no token (0.5 refilled)
+    assert guard.get_stats()["state"] == "half-open"
+    clock.advance(5.0)
+    assert guard.admit() is None            # the probe was given back, so it can go now
+    guard.record("ok")
+    assert guard.get_stats() == {"calls": 2, "failures": 1, "timeouts": 0, "rate_limited": 1,
+                                 "short_circuited": 1, "state": "closed"}
+
+def test_timeouts_trip_the_breaker_of_a_provider():
+    clock = FakeClock()
+    intel = ThreatIntel(cache=None)
+    intel.guards = make_guards({"otx": {"timeout": 0.01, "burst": 100, "rate": 100}}, failure_threshold=2,
+                               cooldown=30.0, clock=clock)
+    calls = []
+
+    async def slow(indicator):
+        calls.append(indicator)
+        await asyncio.sleep(1)
+
+    async def lookups():
+        reasons = []
+        for _ in range(3):
+            with pytest.raises(ProviderUnavailable) as refused:
+                await intel._fetch("otx", "203.0.113.7", slow)
+            reasons.append(refused.value.reason)
+        return reasons
+
+    assert asyncio.run(lookups()) == ["timeout", "timeout", "circuit_open"]
+    assert len(calls) == 2
+    stats = intel.guards["otx"].get_stats()
+    assert stats["timeouts"] == 2 and stats["short_circuited"] == 1 and stats["state"] == "open"
+    clock.advance(30.0)
+    assert intel.guards["otx"].get_stats()["state"] == "half-open"
@@ -0,0 +1,70 @@
+import os
+import sys
+import queue
+import threading
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.ring_buffer import RingBuffer
+
+def fill(buffer, items):
+    return [buffer.put(item, timeout=0.01) for item in items]
+
+def drain(buffer):
+    items = []
+    while buffer.qsize():
+        items.append(buffer.get(timeout=0))
+    return items
+
+def test_fifo_order_survives_wraparound():
+    buffer = RingBuffer(capacity=3)
+    fill(buffer, [1, 2])
+    assert buffer.get() == 1
+    fill(buffer, [3, 4])  # wraps past the end of the slot array
+    assert drain(buffer) == [2, 3, 4]
+
+def test_drop_newest_keeps_the_queued_items():
+    buffer = RingBuffer(capacity=3, policy="drop_newest")
+    assert fill(buffer, [1, 2, 3, 4, 5]) == [True, True, True, False, False]
+    assert drain(buffer) == [1, 2, 3]
+    assert buffer.get_stats()["dropped"] == 2
+
+def test_drop_oldest_overwrites_the_head():
+    buffer = RingBuffer(capacity=3, policy="drop_oldest")
+    assert fill(buffer, [1, 2, 3, 4, 5]) == [True] * 5
+    assert drain(buffer) == [3, 4, 5]
+    assert buffer.get_stats()["dropped"] == 2
+
+def test_drop_oldest_keeps_join_balanced():
+    buffer = RingBuffer(capacity=2, policy="drop_oldest")
+    fill(buffer, [1, 2, 3])
+    for _ in drain(buffer):
+        buffer.task_done()
+    joined = threading.Thread(target=buffer.join)
+    joined.start()
+    joined.join(timeout=1)
+    assert not joined.is_alive()
+
+def test_block_times_out_when_full_and_resumes_when_space_frees():
+    buffer = RingBuffer(capacity=2, policy="block")
+    assert fill(buffer, [1, 2, 3]) == [True, True, False]
+    threading.Timer(0.05, buffer.get).start()
+    assert buffer.put(4, timeout=1)
+    assert drain(buffer) == [2, 4]
+
+def test_sample_admits_every_nth_item_above_the_threshold():
+    buffer = RingBuffer(capacity=8, policy="sample", sample_threshold=0.5, sample_every=2)
+    admitted = fill(buffer, range(12))
+    # Items 0-3 fill to the mark; above it only every 2nd is admitted, until the buffer is full.
+    assert admitted == [True] * 4 + [False, True] * 4
+    assert buffer.qsize() == 8
+    assert fill(buffer, [98, 99]) == [False, False]  # full: discarded on a sampled tick too
+    assert buffer.get_stats()["dropped"] == 6
+    assert drain(buffer) == [0, 1, 2, 3, 5, 7, 9, 11]
+
+def test_get_times_out_on_an_empty_buffer():
+    with pytest.raises(queue.Empty):
+        RingBuffer(capacity=2).get(timeout=0.01)
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        RingBuffer(policy="spill")
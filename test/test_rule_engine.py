@@ -0,0 +1,64 @@
+import os
+import sys
+import random
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.rule_engine import BatchRules, evaluate_batch
+from core.rule_index import RuleIndex
+from dashboard.utils.rule_defaults import apply_rule_defaults
+
+RULES = [apply_rule_defaults(rule, assign_id=False) for rule in (
+    {"name": "TCP burst", "conditions": {"protocol": "TCP", "packet_threshold": 5, "time_window": 10}},
+    {"name": "TCP flood", "conditions": {"protocol": "TCP", "packet_threshold": 12, "time_window": 10}},
+    {"name": "SSH tries", "conditions": {"protocol": "TCP", "dst_port": [22, 2222], "packet_threshold": 3,
+                                         "time_window": 4}},
+    {"name": "Internal DNS", "conditions": {"protocol": "UDP", "dst_port": 53, "src_cidr": "10.0.0.0/8",
+                                            "packet_threshold": 4, "time_window": 20}},
+    {"name": "Anything", "conditions": {"packet_threshold": 8, "time_window": 5}},
+)]
+
+def stream(flows, rules):
+    """Feed the flows in time order to a live RuleIndex; returns the (rule, row) pairs that fired."""
+    index = RuleIndex(rules)
+    fired = set()
+    for row, (src_ip, dst_ip, proto, dst_port, packets, timestamp) in enumerate(flows):
+        for rule in index.match((src_ip, dst_ip, 40000, dst_port, proto), timestamp, packets):
+            fired.add((rule["name"], row))
+    return fired
+
+def batch(flows, rules):
+    src_ip, dst_ip, proto, dst_port, packets, timestamp = zip(*flows)
+    columns = {"src_ip": np.array(src_ip), "dst_ip": np.array(dst_ip), "protocol": np.array(proto),
+               "dst_port": np.array(dst_port), "packet_count": np.array(packets), "timestamp": np.array(timestamp)}
+    return {(rule["name"], row) for rule, rows in evaluate_batch(columns, BatchRules(rules)) for row in rows.tolist()}
+
+def test_threshold_is_reached_at_exactly_the_threshold():
+    flows = [("10.0.0.1", "10.0.0.2", 6, 80, 1, float(t)) for t in range(5)]
+    expected = {("TCP burst", 4)}
+    assert stream(flows, RULES[:1]) == batch(flows, RULES[:1]) == expected
+
+def test_window_edges():
+    # Window 10s: a packet 10s old has left the window, one 9s old is still in it.
+    rules = RULES[:1]
+    outside = [("10.0.0.1", "10.0.0.2", 6, 80, 4, 100.0), ("10.0.0.1", "10.0.0.2", 6, 80, 1, 110.0)]
+    inside = [("10.0.0.1", "10.0.0.2", 6, 80, 4, 100.0), ("10.0.0.1", "10.0.0.2", 6, 80, 1, 109.0)]
+    assert stream(outside, rules) == batch(outside, rules) == set()
+    assert stream(inside, rules) == batch(inside, rules) == {("TCP burst", 1)}
+
+def test_conversations_and_groups_count_separately():
+    flows = [("10.0.0.1", "10.0.0.2", 6, 22, 2, 0.0), ("10.0.0.3", "10.0.0.2", 6, 22, 2, 1.0),
+             ("10.0.0.1", "10.0.0.2", 6, 2222, 1, 2.0), ("10.0.0.1", "10.0.0.2", 17, 22, 5, 3.0),
+             ("192.168.0.1", "8.8.8.8", 17, 53, 4, 3.0), ("10.1.2.3", "8.8.8.8", 17, 53, 4, 3.0)]
+    expected = {("SSH tries", 2), ("Internal DNS", 5)}
+    assert stream(flows, RULES) == batch(flows, RULES) == expected
+
+def test_random_flows_fire_the_same_rules_as_the_live_index():
+    rng = random.Random(17)
+    hosts = ["10.0.0.1", "10.0.0.2", "192.168.1.5", "172.16.0.9"]
+    for _ in range(30):
+        flows, now = [], 0
+        for _ in range(rng.randint(1, 60)):
+            now += rng.choice((0, 0, 1, 1, 2, 3, 5))  # whole seconds, i.e. on the live index's bucket edges
+            flows.append((rng.choice(hosts), rng.choice(hosts), rng.choice((6, 17)), rng.choice((22, 53, 80, 2222)),
+                          rng.randint(1, 4), float(now)))
+        assert stream(flows, RULES) == batch(flows, RULES)
@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.rule_watcher import read_rules
+from core.signature_engine import SignatureEngine
+
+GOOD = "- name: Good A\n  severity: high\n  conditions: {protocol: TCP, packet_threshold: 5, time_window: 10}\n"
+GOOD_B = "- name: Good B\n  conditions: {protocol: UDP, packet_threshold: 5, time_window: 10}\n"
+BAD_SEVERITY = "- name: Bad severity\n  severity: 5\n"
+BAD_CONDITIONS = "- name: Bad conditions\n  conditions: [1, 2]\n"
+
+def names(rules):
+    return sorted(rule["name"] for rule in rules)
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_read_rules_skips_only_the_mistyped_rules(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text(GOOD + BAD_SEVERITY + GOOD_B + BAD_CONDITIONS)
+    assert names(read_rules(str(path))) == ["Good A", "Good B"]
+
+def test_bad_rule_at_startup_and_on_hot_reload_keeps_the_good_ones(tmp_path):
+    rules_path = tmp_path / "rules.yaml"
+    rules_path.write_text(GOOD + BAD_SEVERITY)
+    engine = SignatureEngine(db_path=str(tmp_path / "ids.db"), rules_path=str(rules_path), reload_interval=0.05,
+                             ip_sets_path=str(tmp_path / "ip_sets.yaml"))
+    try:
+        assert names(engine.rules) == ["Good A"]
+        rules_path.write_text(GOOD_B + BAD_CONDITIONS + GOOD)
+        assert wait_for(lambda: names(engine.rules) == ["Good A", "Good B"])
+        assert engine.watcher.thread.is_alive()
+    finally:
+        engine.close()
@@ -0,0 +1,91 @@
+import os
+import sys
+import random
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.sketches import CountMinSketch, DistinctCounters, HyperLogLog, SpaceSaving, VolumeCounters
+
+# Items are ints: Python hashes them deterministically, so these tests do not depend on PYTHONHASHSEED.
+
+@pytest.mark.parametrize("error", [0.05, 0.02])
+def test_hyperloglog_stays_within_its_error_bound(error):
+    errors = []
+    for trial, distinct in enumerate((50, 500, 5000, 50000) * 3):
+        hll = HyperLogLog(HyperLogLog.precision(error))
+        base = trial * 10 ** 7
+        for item in range(base, base + distinct):
+            hll.add(item)
+            hll.add(item)  # repeats never change the estimate
+        errors.append(abs(hll.estimate() - distinct) / distinct)
+    assert max(errors) < 3 * error
+    assert sum(errors) / len(errors) < 1.5 * error
+
+def test_count_min_never_undercounts_and_overcounts_within_bound():
+    rng = random.Random(18)
+    sketch = CountMinSketch(error=0.01, confidence=0.99)
+    true = {}
+    for _ in range(50000):
+        key = int(rng.paretovariate(1.2)) * 7919
+        amount = rng.randint(1, 1500)
+        true[key] = true.get(key, 0) + amount
+        sketch.add(key, amount)
+    assert sketch.total == sum(true.values())
+    over = [sketch.estimate(key) - count for key, count in true.items()]
+    assert min(over) >= 0
+    assert sum(o > 0.01 * sketch.total for o in over) <= 0.01 * len(over)
+
+def test_space_saving_counts_are_bounded_and_keeps_heavy_hitters():
+    rng = random.Random(18)
+    summary = SpaceSaving(error=0.01)
+    true = {}
+    heavy = {1: 0.08, 2: 0.05, 3: 0.03, 4: 0.02}
+    for _ in range(100000):
+        r, key = rng.random(), None
+        for candidate, share in heavy.items():
+            if r < share:
+                key = candidate
+                break
+            r -= share
+        key = key or rng.randint(100, 100000)
+        true[key] = true.get(key, 0) + 1
+        summary.add(key)
+    bound = 0.01 * summary.total
+    assert len(summary) <= summary.capacity
+    for key, (count, overestimate) in summary.counts.items():
+        assert true[key] <= count <= true[key] + bound
+        assert count - overestimate <= true[key]
+    # Every key heavier than the bound is tracked, and the top four come out in order.
+    assert all(key in summary.counts for key, count in true.items() if count > bound)
+    assert [key for key, _, _ in summary.top(4)] == [1, 2, 3, 4]
+
+def test_distinct_counters_evict_the_least_recently_seen_key():
+    counters = DistinctCounters(window=60, capacity=3)
+    for key in ("a", "b", "c"):
+        counters.add(key, 1, 0.0)
+    counters.add("a", 2, 1.0)  # "a" is now the most recently seen
+    counters.add("d", 1, 2.0)
+    assert set(counters.union) == {"a", "c", "d"}
+    assert counters.evicted == 1
+    assert round(counters.add("a", 3, 3.0)) == 3  # "a" kept its history
+
+def test_persistent_scanner_survives_a_stream_of_one_off_keys():
+    counters = DistinctCounters(window=60, capacity=10)
+    estimate = 0
+    for i in range(300):
+        estimate = counters.add("scanner", i, i * 0.01)
+        counters.add(f"one-off {i}", 1, i * 0.01)
+    assert "scanner" in counters.union
+    assert abs(estimate - 300) < 0.15 * 300
+    assert counters.evicted == 300 - 9
+
+def test_windowed_sketches_forget_after_the_window():
+    distinct = DistinctCounters(window=10)
+    volume = VolumeCounters(window=10)
+    for i in range(100):
+        distinct.add("src", i, 1.0)
+        volume.add("conv", 1.0, 10)
+    # The next half-window still sees the previous one; after a gap the counts start over.
+    assert round(distinct.add("src", 1000, 6.0)) == pytest.approx(101, rel=0.1)
+    assert volume.add("conv", 6.0, 10) == 1010
+    assert round(distinct.add("src", 1001, 30.0)) == 1
+    assert volume.add("conv", 30.0, 10) == 10
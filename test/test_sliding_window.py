@@ -0,0 +1,43 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.sliding_window import WindowCounters
+
+def test_counts_accumulate_within_the_window():
+    counters = WindowCounters(window=10, buckets=10)
+    assert [counters.add("k", t) for t in (0, 1, 2.5, 9.9)] == [1, 2, 3, 4]
+
+def test_bucket_expires_exactly_at_the_window_edge():
+    counters = WindowCounters(window=10, buckets=10)  # 1 s buckets
+    counters.add("k", 0.0, amount=5)
+    counters.add("k", 3.0, amount=2)
+    assert counters.add("k", 9.99, amount=0) == 7    # bucket 0 is still inside
+    assert counters.add("k", 10.0, amount=0) == 2    # bucket 0 falls out when bucket 10 starts
+    assert counters.add("k", 13.0, amount=0) == 0    # and bucket 3 when bucket 13 starts
+
+def test_idle_gap_longer_than_the_window_resets_the_count():
+    counters = WindowCounters(window=10, buckets=10)
+    for t in range(5):
+        counters.add("k", t)
+    assert counters.add("k", 100) == 1
+
+def test_packet_older_than_the_window_is_not_counted():
+    counters = WindowCounters(window=10, buckets=10)
+    counters.add("k", 20)
+    assert counters.add("k", 10.5) == 1   # reordered, but bucket 10 already left the window
+    assert counters.add("k", 11.5) == 2   # bucket 11 is the oldest one still inside
+
+def test_keys_are_counted_separately():
+    counters = WindowCounters(window=10, buckets=10)
+    counters.add("a", 1, amount=3)
+    assert counters.add("b", 1) == 1
+    assert counters.add("a", 2) == 4
+
+def test_idle_keys_are_swept_after_a_window():
+    counters = WindowCounters(window=10, buckets=10)
+    counters.add("idle", 0)
+    counters.add("busy", 0)
+    counters.add("busy", 9)
+    counters.add("busy", 15)  # ten buckets since the last sweep: sweep runs
+    assert len(counters) == 1
+    assert counters.add("idle", 15) == 1
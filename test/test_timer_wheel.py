@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.timer_wheel import TimerWheel
+
+def fire_times(wheel, until):
+    """{item: tick it fired at}, advancing one tick at a time."""
+    fired = {}
+    for now in range(1, until + 1):
+        for item in wheel.advance(now):
+            fired[item] = now
+    return fired
+
+def test_timers_fire_at_their_tick_across_level_rollovers():
+    # 4 slots x 3 levels: level 1 covers 4-15 ticks ahead, level 2 covers 16-63.
+    wheel = TimerWheel(tick=1.0, slots=4, levels=3, start=0)
+    deadlines = {f"t{when}": when for when in (1, 3, 4, 5, 15, 16, 17, 31, 32, 63)}
+    for item, when in deadlines.items():
+        wheel.schedule(item, when)
+    assert len(wheel) == len(deadlines)
+    assert fire_times(wheel, 70) == deadlines
+    assert len(wheel) == 0
+
+def test_fractional_deadline_fires_on_the_next_tick():
+    wheel = TimerWheel(tick=1.0, slots=4, levels=3, start=0)
+    wheel.schedule("a", 4.2)
+    assert wheel.advance(4) == []
+    assert wheel.advance(5) == ["a"]
+
+def test_timer_beyond_the_wheel_range_is_parked_and_fires_on_time():
+    wheel = TimerWheel(tick=1.0, slots=4, levels=2, start=0)  # range: 15 ticks
+    wheel.schedule("far", 40)
+    wheel.schedule("near", 2)
+    assert fire_times(wheel, 50) == {"near": 2, "far": 40}
+
+def test_rescheduling_from_an_expiry_fires_again_at_the_new_deadline():
+    # As FlowBuilder does for a flow that saw packets since its timer was set.
+    wheel = TimerWheel(tick=1.0, slots=4, levels=3, start=0)
+    wheel.schedule("flow", 3)
+    fired = []
+    for now in range(1, 40):
+        for item in wheel.advance(now):
+            fired.append(now)
+            if now < 30:
+                wheel.schedule(item, now + 9)  # lands in level 1, across a level rollover
+    assert fired == [3, 12, 21, 30]
+    assert len(wheel) == 0
+
+def test_jump_over_many_ticks_returns_everything_due():
+    wheel = TimerWheel(tick=1.0, slots=4, levels=3, start=0)
+    for when in (2, 7, 20, 50):
+        wheel.schedule(when, when)
+    assert sorted(wheel.advance(25)) == [2, 7, 20]
+    assert wheel.advance(50) == [50]
+
+def test_empty_wheel_re_anchors_to_past_timestamps():
+    wheel = TimerWheel(tick=1.0, slots=4, levels=3, start=1000)
+    wheel.schedule("replayed", 10)
+    assert wheel.advance(9) == []
+    assert wheel.advance(10) == ["replayed"]